@@ -0,0 +1,544 @@
+// --- Sheet Layout (V6) ---
+// Order: [Timestamp, Model, PartNo, PartName, Type, Weight, Length, Material, ChangePoint, ActionTaken, Status, Comment, Result, Image]
+var NUM_COLS = 14;
+
+// --- Change Log (Incremental Sync) ---
+// Every in-place edit (e.g. update_status) bumps CHANGE_REV and records the edited sheet row,
+// so clients can pull "rows appended after my cursor + rows edited after my revision".
+var CHANGE_LOG_MAX = 400; // Keep under the 9KB Script Property value limit
+
+function rowToRecord(row, rowNumber) {
+    return {
+        'row': rowNumber, // Sheet row number (1-based, header = 1)
+        'timestamp': row[0],
+        'model': row[1],
+        'part_no': row[2],
+        'part_name': row[3],
+        'inspection_type': row[4],
+        'weight': row[5],
+        'length': row[6],
+        'material_ok': row[7],
+        'change_point': row[8],
+        'action_taken': row[9],
+        'status': row[10],
+        'manager_comment': row[11],
+        'result': row[12],
+        'image': row[13]
+    };
+}
+
+function getChangeState() {
+    var props = PropertiesService.getScriptProperties();
+    var rev = parseInt(props.getProperty("CHANGE_REV") || "0", 10);
+    var log = JSON.parse(props.getProperty("CHANGE_LOG") || "[]"); // [[rev, row], ...]
+    return { rev: rev, log: log };
+}
+
+function recordChanges(rowNumbers) {
+    if (rowNumbers.length == 0) return;
+    var props = PropertiesService.getScriptProperties();
+    var state = getChangeState();
+    for (var i = 0; i < rowNumbers.length; i++) {
+        state.rev++;
+        state.log.push([state.rev, rowNumbers[i]]);
+    }
+    if (state.log.length > CHANGE_LOG_MAX) {
+        state.log = state.log.slice(state.log.length - CHANGE_LOG_MAX);
+    }
+    props.setProperties({
+        "CHANGE_REV": String(state.rev),
+        "CHANGE_LOG": JSON.stringify(state.log)
+    });
+}
+
+// Saves a base64 JPEG to Drive and returns its share link ("" if no image)
+function saveImage(imageBase64, filename, folderId) {
+    if (!imageBase64 || imageBase64.length == 0) return "";
+    var decoded = Utilities.base64Decode(imageBase64);
+    var blob = Utilities.newBlob(decoded, "image/jpeg", filename);
+    var folder = DriveApp.getFolderById(folderId);
+    var file = folder.createFile(blob);
+    file.setSharing(DriveApp.Access.ANYONE_WITH_LINK, DriveApp.Permission.VIEW);
+    return "https://drive.google.com/file/d/" + file.getId() + "/view?usp=sharing"; // Save full link
+}
+
+// One sheet row in V6 column order
+function buildRowValues(data, imageUrl) {
+    // [Crucial Fix] If Python sends strict status (e.g. "結案"), use it. Otherwise default to "未審核".
+    var status = data.status || "未審核";
+    return [
+        data.timestamp,
+        data.model,
+        data.part_no,
+        data.part_name,    // Index 3
+        data.inspection_type,
+        data.weight,
+        data.length,
+        data.material_ok,
+        data.change_point,
+        data.action_taken, // Index 9 / Column J
+        status,            // Index 10
+        "",                // Manager Comment (Index 11, Empty initially)
+        data.result,       // Index 12
+        imageUrl           // Index 13
+    ];
+}
+
+// --- Idempotent Replay (batch_append dedupe) ---
+// Key = timestamp + part_no. Timestamps are reduced to their numeric fields so
+// "2025-02-04 09:00:00" and a sheet display of "2025/2/4 9:00:00" compare equal.
+var DEDUPE_WINDOW = 2000; // Only the most recent rows can be a replay of a queued submission
+
+function rowKey(timestamp, partNo) {
+    var nums = String(timestamp).match(/\d+/g) || [];
+    for (var i = 0; i < nums.length; i++) nums[i] = String(parseInt(nums[i], 10));
+    return nums.join("-") + "|" + String(partNo).trim();
+}
+
+// Map of rowKey -> sheet row number for the last DEDUPE_WINDOW rows
+function recentRowKeys(sheet) {
+    var keys = {};
+    var lastRow = sheet.getLastRow();
+    if (lastRow < 2) return keys;
+    var firstRow = Math.max(2, lastRow - DEDUPE_WINDOW + 1);
+    var vals = sheet.getRange(firstRow, 1, lastRow - firstRow + 1, 3).getDisplayValues(); // Timestamp, Model, PartNo
+    for (var i = 0; i < vals.length; i++) {
+        keys[rowKey(vals[i][0], vals[i][2])] = firstRow + i;
+    }
+    return keys;
+}
+
+// --- get_all_data Filters (all optional, same meaning as the client's local mirror query) ---
+// start / end: 'YYYY-MM-DD' (inclusive), model, part_nos: [...], statuses: [...], has_change_point: true
+function hasQueryFilter(q) {
+    return !!(q.start || q.end || q.model || (q.part_nos && q.part_nos.length) ||
+              (q.statuses && q.statuses.length) || q.has_change_point);
+}
+
+// 'YYYY-MM-DD' of a displayed timestamp ("2025/2/4 9:00:00" and "2025-02-04 09:00:00" alike)
+function recordDate(timestamp) {
+    var nums = String(timestamp).match(/\d+/g) || [];
+    if (nums.length < 3) return "";
+    return nums[0] + "-" + ("0" + nums[1]).slice(-2) + "-" + ("0" + nums[2]).slice(-2);
+}
+
+function toLookup(values) {
+    var lookup = {};
+    for (var i = 0; i < values.length; i++) lookup[String(values[i])] = true;
+    return lookup;
+}
+
+// Predicate over a sheet row (V6 column order)
+function queryFilter(q) {
+    var parts = q.part_nos && q.part_nos.length ? toLookup(q.part_nos) : null;
+    var statuses = q.statuses && q.statuses.length ? toLookup(q.statuses) : null;
+    return function (row) {
+        if (q.start || q.end) {
+            var date = recordDate(row[0]);
+            if (!date || (q.start && date < q.start) || (q.end && date > q.end)) return false;
+        }
+        if (q.model && row[1] != q.model) return false;
+        if (parts && !parts[row[2]]) return false;
+        if (statuses && !statuses[row[10]]) return false;
+        if (q.has_change_point && row[8] === "") return false;
+        return true;
+    };
+}
+
+// Only the requested fields of a record (all of them without a projection)
+function projectRecord(record, columns) {
+    if (!columns || columns.length == 0) return record;
+    var out = {};
+    for (var i = 0; i < columns.length; i++) {
+        if (record.hasOwnProperty(columns[i])) out[columns[i]] = record[columns[i]];
+    }
+    return out;
+}
+
+// --- Bulk Read Encoding (get_all_data / get_rows_since) ---
+// format: "records" (default): data = [{timestamp: ..., model: ...}, ...]
+//         "columnar": data = {columns: [...], values: [[...column 0...], [...column 1...], ...]}
+//                     (no key repeated per row: about half the JSON to send and parse)
+// gzip: true -> data is the JSON above, gzip-compressed and base64-encoded ("encoding": "gzip")
+function encodeBulk(response, records, format, gzip, columns) {
+    var data = records;
+    if (format == "columnar") {
+        var names = columns && columns.length ? columns : (records.length > 0 ? Object.keys(records[0]) : []);
+        var values = [];
+        for (var c = 0; c < names.length; c++) {
+            var col = new Array(records.length);
+            for (var r = 0; r < records.length; r++) col[r] = records[r][names[c]];
+            values.push(col);
+        }
+        data = { "columns": names, "values": values };
+        response.format = "columnar";
+    }
+    if (gzip) {
+        var blob = Utilities.gzip(Utilities.newBlob(JSON.stringify(data), "application/json"));
+        data = Utilities.base64Encode(blob.getBytes());
+        response.encoding = "gzip";
+    }
+    response.data = data;
+    return jsonOutput(response);
+}
+
+// --- Status Updates (update_status / update_status_bulk) ---
+// Rows are matched on one read of Timestamp..PartNo. Writes are grouped by column and value and
+// go out as one RangeList.setValue() per group, instead of a setValue() round trip per cell.
+var COL_CHANGE_POINT = 9;  // Col I
+var COL_STATUS = 11;       // Col K
+var COL_COMMENT = 12;      // Col L
+
+function columnLetter(col) {
+    return String.fromCharCode(64 + col); // A-Z covers the V6 layout
+}
+
+// updates: [{timestamp, part_no, apply_all, status, manager_comment?, change_point?}, ...]
+// Omitted optional fields leave the sheet value as it is.
+// Returns one result per update: {index, status: "Success"|"Error", rows: [sheet rows], message?}
+function applyStatusUpdates(sheet, updates) {
+    var lastRow = sheet.getLastRow();
+    var keys = lastRow >= 2 ? sheet.getRange(2, 1, lastRow - 1, 3).getDisplayValues() : []; // Timestamp, Model, PartNo
+    var byTimestamp = {}; // display timestamp -> [[sheet row, part_no], ...]
+    for (var i = 0; i < keys.length; i++) {
+        if (!byTimestamp[keys[i][0]]) byTimestamp[keys[i][0]] = [];
+        byTimestamp[keys[i][0]].push([i + 2, keys[i][2]]);
+    }
+
+    var cells = {}; // "column|row" -> value (a later update of the same cell wins)
+    var results = [];
+    var editedRows = [];
+    var seenRows = {};
+    for (var u = 0; u < updates.length; u++) {
+        var upd = updates[u] || {};
+        var candidates = byTimestamp[upd.timestamp] || [];
+        var rows = [];
+        for (var c = 0; c < candidates.length; c++) {
+            if (upd.apply_all || candidates[c][1] == upd.part_no) {
+                rows.push(candidates[c][0]);
+                if (!upd.apply_all) break; // Stop if strictly one
+            }
+        }
+        if (rows.length == 0) {
+            results.push({ "index": u, "status": "Error", "rows": [], "message": "Row not found" });
+            continue;
+        }
+        for (var r = 0; r < rows.length; r++) {
+            if (upd.change_point !== undefined) cells[COL_CHANGE_POINT + "|" + rows[r]] = upd.change_point;
+            cells[COL_STATUS + "|" + rows[r]] = upd.status;
+            if (upd.manager_comment !== undefined) cells[COL_COMMENT + "|" + rows[r]] = upd.manager_comment;
+        }
+        for (var e = 0; e < rows.length; e++) {
+            if (!seenRows[rows[e]]) editedRows.push(rows[e]);
+            seenRows[rows[e]] = true;
+        }
+        results.push({ "index": u, "status": "Success", "rows": rows });
+    }
+
+    var groups = {}; // "column|value" -> {value, a1: [...]}
+    for (var cell in cells) {
+        var parts = cell.split("|");
+        var groupKey = parts[0] + "|" + cells[cell];
+        if (!groups[groupKey]) groups[groupKey] = { "value": cells[cell], "a1": [] };
+        groups[groupKey].a1.push(columnLetter(parseInt(parts[0], 10)) + parts[1]);
+    }
+    for (var g in groups) {
+        sheet.getRangeList(groups[g].a1).setValue(groups[g].value);
+    }
+
+    recordChanges(editedRows);
+    return results;
+}
+
+function jsonOutput(obj) {
+    return ContentService.createTextOutput(JSON.stringify(obj)).setMimeType(ContentService.MimeType.JSON);
+}
+
+function doPost(e) {
+    var lock = LockService.getScriptLock();
+    lock.tryLock(10000);
+
+    try {
+        var sheet = SpreadsheetApp.getActiveSpreadsheet().getActiveSheet();
+        var jsonData = JSON.parse(e.postData.contents);
+        var action = jsonData.action || "upload"; // Default to upload if not specified
+
+        // --- Action 1: Upload Data & Image ---
+        if (action == "upload") {
+            var folderId = jsonData.folder_id || "root"; // Use provided ID or default to root
+
+            // 1. Handle Image Upload (if exists)
+            var imageUrl = saveImage(jsonData.image_base64, jsonData.filename, folderId);
+
+            // 2. Append to Sheet
+            sheet.appendRow(buildRowValues(jsonData, imageUrl));
+
+            return ContentService.createTextOutput(JSON.stringify({
+                "status": "Success",
+                "message": "Data uploaded successfully",
+                "image_url": imageUrl,
+                "row": sheet.getLastRow() // Lets the client patch its mirror without a sync
+            })).setMimeType(ContentService.MimeType.JSON);
+        }
+
+        // --- Action 6: Batch Append (All cavities of one inspection in one round trip) ---
+        // rows: [{timestamp, model, part_no, ...}, ...], optional shared image (written to every row),
+        // either as image_base64 or as image_urls (photos already uploaded, one link per line in the cell).
+        // Valid rows are written with a single setValues() on a contiguous range.
+        // dedupe=true makes the call idempotent for offline replay: rows whose timestamp + part_no
+        // already exist in the last DEDUPE_WINDOW sheet rows are reported as "Duplicate" instead.
+        else if (action == "batch_append") {
+            var folderId = jsonData.folder_id || "root";
+            var inputRows = jsonData.rows || [];
+            var existing = jsonData.dedupe ? recentRowKeys(sheet) : {};
+
+            var accepted = [];
+            var results = [];
+            for (var i = 0; i < inputRows.length; i++) {
+                var r = inputRows[i];
+                if (!r || !r.timestamp || !r.part_no) {
+                    results.push({ "index": i, "status": "Error", "message": "Missing timestamp or part_no" });
+                    continue;
+                }
+                var key = rowKey(r.timestamp, r.part_no);
+                if (existing[key]) {
+                    results.push({ "index": i, "status": "Duplicate", "row": existing[key] });
+                    continue;
+                }
+                results.push({ "index": i, "status": "Success" });
+                accepted.push(r);
+            }
+
+            // Only upload the image if at least one row is new (a replay must not create a second file)
+            var imageUrl = "";
+            if (accepted.length > 0) {
+                var imageUrls = jsonData.image_urls || [];
+                imageUrl = imageUrls.length > 0 ? imageUrls.join("\n") : saveImage(jsonData.image_base64, jsonData.filename, folderId);
+            }
+            var values = [];
+            for (var v = 0; v < accepted.length; v++) {
+                values.push(buildRowValues(accepted[v], imageUrl));
+            }
+
+            if (values.length > 0) {
+                var startRow = sheet.getLastRow() + 1;
+                sheet.getRange(startRow, 1, values.length, NUM_COLS).setValues(values);
+                var k = 0;
+                for (var j = 0; j < results.length; j++) {
+                    if (results[j].status == "Success") results[j].row = startRow + k++;
+                }
+            }
+
+            var errorCount = 0;
+            for (var m = 0; m < results.length; m++) {
+                if (results[m].status == "Error") errorCount++;
+            }
+
+            return jsonOutput({
+                "status": errorCount == 0 ? "Success" : "Partial",
+                "message": "Appended " + values.length + " of " + inputRows.length + " rows",
+                "image_url": imageUrl,
+                "results": results
+            });
+        }
+
+        // --- Action 7: Upload Image (photo only; the rows follow in batch_append with image_urls) ---
+        else if (action == "upload_image") {
+            var imageUrl = saveImage(jsonData.image_base64, jsonData.filename, jsonData.folder_id || "root");
+            if (imageUrl == "") {
+                return jsonOutput({ "status": "Error", "message": "No image data" });
+            }
+            return jsonOutput({ "status": "Success", "image_url": imageUrl });
+        }
+
+        // --- Action 2: Get All Data ---
+        // Optional filters (see queryFilter), column projection, paging and encoding (see encodeBulk):
+        // columns: [...] fields to return, page (1-based) + limit rows per page (0 / missing = all).
+        // Without filters only the requested page range is read from the sheet.
+        else if (action == "get_all_data") {
+            var limit = Math.max(0, parseInt(jsonData.limit, 10) || 0);
+            var page = Math.max(1, parseInt(jsonData.page, 10) || 1);
+            var offset = (page - 1) * limit;
+            var columns = jsonData.columns || null;
+            var lastRow = sheet.getLastRow();
+            var data = [];
+            var total = 0;
+
+            if (!hasQueryFilter(jsonData)) {
+                total = Math.max(0, lastRow - 1);
+                var firstRow = 2 + offset;
+                var count = Math.min(limit || total, lastRow - firstRow + 1);
+                if (count > 0) {
+                    var pageRows = sheet.getRange(firstRow, 1, count, NUM_COLS).getDisplayValues(); // Use getDisplayValues for strings
+                    for (var i = 0; i < pageRows.length; i++) {
+                        data.push(projectRecord(rowToRecord(pageRows[i], firstRow + i), columns));
+                    }
+                }
+            } else {
+                var rows = lastRow >= 2 ? sheet.getRange(2, 1, lastRow - 1, NUM_COLS).getDisplayValues() : [];
+                var matches = queryFilter(jsonData);
+                for (var i = 0; i < rows.length; i++) {
+                    if (!matches(rows[i])) continue;
+                    if (total >= offset && (!limit || data.length < limit)) {
+                        data.push(projectRecord(rowToRecord(rows[i], i + 2), columns));
+                    }
+                    total++;
+                }
+            }
+
+            return encodeBulk({
+                "status": "Success",
+                "total": total, // Matching rows over all pages
+                "page": page,
+                "has_more": limit > 0 && offset + data.length < total
+            }, data, jsonData.format, jsonData.gzip, columns);
+        }
+
+
+        // --- Action 5: Get Rows Since (Incremental Sync) ---
+        // Client sends its row cursor (last synced sheet row), its change revision and the
+        // timestamp it holds for the cursor row. Returns only appended + edited rows.
+        // If the cursor no longer lines up (rows deleted/sorted) or the change log was
+        // truncated past the client's revision, falls back to a full snapshot with reset=true.
+        // format / gzip: response encoding, see encodeBulk.
+        else if (action == "get_rows_since") {
+            var sinceRow = parseInt(jsonData.since_row || 1, 10);
+            var sinceRev = parseInt(jsonData.since_rev || 0, 10);
+            var anchorTs = jsonData.anchor_ts || "";
+            var lastRow = sheet.getLastRow();
+            var state = getChangeState();
+
+            var reset = false;
+            if (sinceRow < 1 || sinceRow > lastRow) reset = true;
+            if (!reset && sinceRow > 1 && anchorTs !== "") {
+                var cursorTs = sheet.getRange(sinceRow, 1).getDisplayValue();
+                if (cursorTs != anchorTs) reset = true;
+            }
+            if (!reset && sinceRev < state.rev) {
+                var oldestRev = state.log.length > 0 ? state.log[0][0] : state.rev + 1;
+                if (sinceRev + 1 < oldestRev) reset = true;
+            }
+            if (reset) {
+                sinceRow = 1;
+                sinceRev = state.rev;
+            }
+
+            var data = [];
+            // 1. Appended rows (single contiguous read, no full-sheet scan)
+            if (lastRow > sinceRow) {
+                var newRows = sheet.getRange(sinceRow + 1, 1, lastRow - sinceRow, NUM_COLS).getDisplayValues();
+                for (var i = 0; i < newRows.length; i++) {
+                    data.push(rowToRecord(newRows[i], sinceRow + 1 + i));
+                }
+            }
+
+            // 2. Edited rows (only those at or before the client's cursor, the rest are already in data)
+            var changed = {};
+            for (var j = 0; j < state.log.length; j++) {
+                var entry = state.log[j];
+                if (entry[0] > sinceRev && entry[1] <= sinceRow && entry[1] <= lastRow) changed[entry[1]] = true;
+            }
+            for (var changedRow in changed) {
+                var rn = parseInt(changedRow, 10);
+                var vals = sheet.getRange(rn, 1, 1, NUM_COLS).getDisplayValues()[0];
+                data.push(rowToRecord(vals, rn));
+            }
+
+            return encodeBulk({
+                "status": "Success",
+                "reset": reset,
+                "last_row": lastRow,
+                "rev": state.rev
+            }, data, jsonData.format, jsonData.gzip);
+        }
+
+        // --- Action 4: Get History (Filtered by Part No) ---
+        else if (action == "get_history") {
+            var targetPart = jsonData.part_no;
+            var rows = sheet.getDataRange().getDisplayValues(); // Use DisplayValues for consistency
+            var data = [];
+
+            for (var i = 1; i < rows.length; i++) {
+                var row = rows[i];
+                // Check Part No match (Column Index 2)
+                if (row[2] == targetPart) {
+                    var record = {};
+                    record['timestamp'] = row[0];
+                    record['model'] = row[1];
+                    record['part_no'] = row[2];
+                    // Skip PartName (row[3]) for local history object unless needed
+                    record['inspection_type'] = row[4];
+                    record['weight'] = row[5];
+                    record['length'] = row[6];
+                    record['change_point'] = row[8];
+                    record['action_taken'] = row[9]; // [New]
+                    record['status'] = row[10];
+                    record['manager_comment'] = row[11];
+                    record['result'] = row[12];
+                    record['image'] = row[13];
+                    data.push(record);
+                }
+            }
+
+            return ContentService.createTextOutput(JSON.stringify({
+                "status": "Success",
+                "data": data
+            })).setMimeType(ContentService.MimeType.JSON);
+        }
+
+        // --- Action 3: Update Status ---
+        // timestamp + part_no; apply_all=true updates every row of that timestamp (all cavities).
+        // Optional change_point. Edited sheet rows are returned so the client can patch its mirror.
+        else if (action == "update_status") {
+            var result = applyStatusUpdates(sheet, [jsonData])[0];
+
+            if (result.status == "Success") {
+                return ContentService.createTextOutput(JSON.stringify({
+                    "status": "Success",
+                    "message": "Updated " + result.rows.length + " rows",
+                    "rows": result.rows // Sheet rows edited (client patches its mirror in place)
+                })).setMimeType(ContentService.MimeType.JSON);
+            } else {
+                return ContentService.createTextOutput(JSON.stringify({
+                    "status": "Error",
+                    "message": "Row not found"
+                })).setMimeType(ContentService.MimeType.JSON);
+            }
+        }
+
+        // --- Action 8: Bulk Status Update (e.g. close every open event of a part in one request) ---
+        // updates: [{timestamp, part_no, apply_all, status, manager_comment?, change_point?}, ...]
+        else if (action == "update_status_bulk") {
+            var updates = jsonData.updates || [];
+            var results = applyStatusUpdates(sheet, updates);
+
+            var rowCount = 0;
+            var errorCount = 0;
+            for (var m = 0; m < results.length; m++) {
+                if (results[m].status == "Error") errorCount++;
+                rowCount += results[m].rows.length;
+            }
+
+            return jsonOutput({
+                "status": errorCount == 0 ? "Success" : "Partial",
+                "message": "Updated " + rowCount + " rows for " + (updates.length - errorCount) + " of " + updates.length + " updates",
+                "results": results
+            });
+        }
+
+        else {
+            return jsonOutput({
+                "status": "Error",
+                "message": "Unknown action: " + action
+            });
+        }
+
+    } catch (e) {
+        return ContentService.createTextOutput(JSON.stringify({
+            "status": "Error",
+            "message": e.toString()
+        })).setMimeType(ContentService.MimeType.JSON);
+    } finally {
+        lock.releaseLock();
+    }
+}
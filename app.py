@@ -1,14 +1,20 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import utils as data_manager
 import datetime
 import altair as alt
 import json
 import drive_integration
+import upload_queue
+import thumbnails
+import judgement
+import spc
+import downsample
 import streamlit.components.v1 as components
 import os
+import threading
 import time
-from PIL import Image, ImageOps
 
 # --- Helper: Image Integrity Check ---
 # Helper: Image Integrity Check
@@ -33,52 +39,6 @@ def check_image_availability(image_path):
         
     return image_path
 
-# [Feature] Helper to resize/crop images for consistent grid layout
-@st.cache_data(show_spinner=False)
-def load_and_resize_image_v2(image_path, target_size=(800, 600)):
-    """
-    Loads an image and pads it to fit the target size (Maintain Aspect Ratio).
-    Returns a PIL Image object of exactly target_size.
-    Renamed to v2 to force cache invalidation.
-    """
-    try:
-        if not os.path.exists(image_path):
-            print(f"[Debug] Image not found: {image_path}")
-            return None
-        print(f"[Debug] Loading image: {image_path}")
-        img = Image.open(image_path)
-        
-        # Handle Orientation (EXIF)
-        try:
-             img = ImageOps.exif_transpose(img)
-        except:
-             pass
-
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Calculate aspect ratios
-        target_w, target_h = target_size
-        img_w, img_h = img.size
-        
-        scale = min(target_w / img_w, target_h / img_h)
-        new_w = int(img_w * scale)
-        new_h = int(img_h * scale)
-        
-        img_resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-        
-        # Create new background image
-        new_img = Image.new("RGB", target_size, (0, 0, 0)) # Black background
-        paste_x = (target_w - new_w) // 2
-        paste_y = (target_h - new_h) // 2
-        
-        new_img.paste(img_resized, (paste_x, paste_y))
-        
-        return new_img
-    except Exception as e:
-        print(f"Error processing image {image_path}: {e}")
-        return None
-
 # --- Page Config ---
 st.set_page_config(
     page_title="瑞全智慧巡檢",
@@ -298,8 +258,241 @@ components.html("""
 </script>
 """, height=0)
 
+# --- Background Sync (Local Sheet Mirror) ---
+@st.cache_resource
+def start_sheet_sync():
+    return drive_integration.start_background_sync()
+
+start_sheet_sync()
+
+# --- Thumbnail Cache (pre-sized product images, see thumbnails.py) ---
+@st.cache_resource
+def start_thumbnail_build():
+    return thumbnails.start_background_build()
+
+start_thumbnail_build()
+
+# --- Background Upload Queue (Operators never wait on the network) ---
+@st.cache_resource
+def get_upload_queue():
+    queue = upload_queue.UploadQueue()
+    upload_queue.start_worker(queue)
+    return queue
+
+# --- Dashboard Data (one normalized frame shared across sessions and reruns; treat as read-only) ---
+DASH_CATEGORY_COLS = ['model', 'part_no', 'status', 'result']
+DASH_CHANGE_LOG = 64 # Mirror versions whose changed part numbers are kept (SPC patching)
+
+def _normalize_dashboard_rows(df_dash):
+    # --- Timezone Fix ---
+    if 'timestamp' in df_dash.columns:
+        # [Fix] Keep raw timestamp string for API matching (GAS string comparison is strict)
+        df_dash['timestamp_orig'] = df_dash['timestamp']
+
+        df_dash['timestamp'] = pd.to_datetime(df_dash['timestamp'], errors='coerce')
+        # Fix: Assume string is already in Local Time, so just localize to Taipei directly
+        if df_dash['timestamp'].dt.tz is None:
+             df_dash['timestamp'] = df_dash['timestamp'].dt.tz_localize('Asia/Taipei')
+        else:
+             df_dash['timestamp'] = df_dash['timestamp'].dt.tz_convert('Asia/Taipei')
+
+    # --- Schema Safety Check (Fix for Cache/Legacy Data) ---
+    if 'status' not in df_dash.columns: df_dash['status'] = "未審核"
+    if 'manager_comment' not in df_dash.columns: df_dash['manager_comment'] = ""
+    df_dash['status'] = df_dash['status'].fillna("未審核")
+    df_dash['manager_comment'] = df_dash['manager_comment'].fillna("")
+    if 'change_point' not in df_dash.columns: df_dash['change_point'] = ""
+
+    # Typed columns: numeric measurements (CP rows -> NaN), categoricals for the filter columns
+    for col in ('weight', 'length'):
+        if col in df_dash.columns:
+            df_dash[col] = pd.to_numeric(df_dash[col], errors='coerce')
+    for col in DASH_CATEGORY_COLS:
+        if col in df_dash.columns:
+            df_dash[col] = df_dash[col].astype('category')
+    return df_dash
+
+@st.cache_resource
+def _dashboard_cache():
+    # frame + sheet row of each frame row, at mirror 'version'; log = [(version, changed part_nos or None)]
+    # part_index = (frame, {part_no: positions}) for part_history, rebuilt when the frame changes
+    return {'lock': threading.Lock(), 'version': None, 'frame': pd.DataFrame(), 'rows': None, 'log': [],
+            'part_index': None}
+
+def _splice_dashboard_rows(cache, records):
+    """
+    [Perf] Normalizes only the changed rows and splices them into a new frame by sheet row
+    (edited rows are replaced, new rows inserted). The old frame is never modified: other
+    sessions may still be rendering it. Returns: part numbers whose history changed.
+    """
+    old, old_rows = cache['frame'], cache['rows']
+    delta = pd.DataFrame(records)
+    new_rows = delta.pop('row').to_numpy()
+    delta = _normalize_dashboard_rows(delta)
+    replaced = np.isin(old_rows, new_rows)
+    changed = set(old['part_no'][replaced].astype(str)) | set(delta['part_no'].astype(str))
+
+    kept = old[~replaced]
+    for col in DASH_CATEGORY_COLS:
+        # Same categories on both sides so concat keeps the categorical dtype
+        cats = kept[col].cat.categories.union(delta[col].cat.categories)
+        kept = kept.assign(**{col: kept[col].cat.set_categories(cats)})
+        delta[col] = delta[col].cat.set_categories(cats)
+    frame = pd.concat([kept, delta[kept.columns]], ignore_index=True)
+    rows = np.concatenate([old_rows[~replaced], new_rows])
+    order = np.argsort(rows, kind='stable') # Sheet order, like a full rebuild
+    frame = frame.iloc[order].reset_index(drop=True)
+    for col in DASH_CATEGORY_COLS:
+        frame[col] = frame[col].cat.remove_unused_categories()
+    cache.update(frame=frame, rows=rows[order])
+    return changed
+
+def _dashboard_snapshot(data_version):
+    """
+    (frame, version, change log) of the shared dashboard cache, brought up to data_version.
+    """
+    cache = _dashboard_cache()
+    with cache['lock']:
+        if cache['version'] is None or cache['version'] < data_version:
+            records, version = drive_integration.changes_since(cache['version'])
+            if records is None or cache['frame'].empty:
+                # First use, or rows were replaced/deleted: full rebuild
+                with st.spinner("正在整理戰情室數據..."):
+                    full = pd.DataFrame(drive_integration.query_rows(with_row=True))
+                    rows = full.pop('row').to_numpy() if not full.empty else None
+                    frame = _normalize_dashboard_rows(full) if not full.empty else full
+                cache.update(frame=frame, rows=rows, log=[(version, None)])
+            elif records:
+                changed = _splice_dashboard_rows(cache, records)
+                cache['log'] = (cache['log'] + [(version, changed)])[-DASH_CHANGE_LOG:]
+            cache['version'] = version
+        return cache['frame'], cache['version'], list(cache['log'])
+
+def load_dashboard_frame(data_version):
+    """
+    All inspections as one normalized frame (sheet order), shared by every session.
+    [Perf] A new data version patches the frame with just the rows the mirror reports as
+    changed (a submit or status edit touches a handful) instead of rebuilding it.
+    """
+    return _dashboard_snapshot(data_version)[0]
+
+_NO_ROWS = np.array([], dtype=np.intp)
+
+def part_history(part_no):
+    """
+    Inspections of one sheet part number (e.g. 'XXX_R'), in sheet order, as a slice of the
+    shared dashboard frame. [Perf] Positions come from a part_no index built once per frame,
+    so switching tabs / cavities never goes back to the mirror or GAS (cold start: see
+    drive_integration._ensure_mirror). Returns a copy with plain (non-categorical) columns.
+    """
+    frame = load_dashboard_frame(drive_integration.data_version())
+    if frame.empty or 'part_no' not in frame.columns:
+        return pd.DataFrame()
+    cache = _dashboard_cache()
+    with cache['lock']:
+        if cache['part_index'] is None or cache['part_index'][0] is not frame:
+            cache['part_index'] = (frame, frame.groupby('part_no', observed=True, sort=False).indices)
+        positions = cache['part_index'][1].get(part_no, _NO_ROWS)
+    rows = frame.iloc[positions]
+    return rows.astype({col: object for col in DASH_CATEGORY_COLS if col in rows.columns})
+
+def _changed_parts(log, since):
+    """
+    Part numbers changed after version `since` according to the dashboard change log,
+    or None if the log cannot tell (rebuild, or `since` older than the log).
+    """
+    if since is None or not log or log[0][0] > since:
+        return None
+    parts = set()
+    for version, changed in log:
+        if version <= since:
+            continue
+        if changed is None:
+            return None
+        parts |= changed
+    return parts
+
+# --- SPC (computed for all parts at once, patched per changed part, see spc.py) ---
+@st.cache_resource
+def _spc_cache():
+    return {'lock': threading.Lock(), 'version': None, 'parts_version': None, 'result': None}
+
+def load_spc(data_version, parts_version):
+    frame, version, log = _dashboard_snapshot(data_version)
+    cache = _spc_cache()
+    with cache['lock']:
+        same_specs = cache['result'] is not None and cache['parts_version'] == parts_version
+        if same_specs and cache['version'] >= version:
+            return cache['result'] # Up to date (or another session already went further)
+        records = frame
+        if records.empty or not {'part_no', 'weight', 'timestamp'}.issubset(records.columns):
+            records = pd.DataFrame(columns=['part_no', 'timestamp', 'weight'])
+        registry = data_manager.load_part_specs()
+        parts = _changed_parts(log, cache['version']) if same_specs else None
+        if parts is None:
+            with st.spinner("計算 SPC 統計中..."):
+                result = spc.compute(records, registry)
+        else:
+            result = spc.update(cache['result'], records, registry, parts)
+        cache.update(version=version, parts_version=parts_version, result=result)
+        return result
+
+# --- Change-Point Events (one row per inspection event, cached per data version + filters) ---
+CP_PAGE_SIZE = 10
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_cp_events(data_version, start, end, model, part_no, statuses):
+    """
+    Change-point rows from the indexed mirror query, grouped into events (multi-cavity rows
+    share a timestamp): first row per timestamp + cavity_count, newest first.
+    """
+    cp_rows = drive_integration.query_rows(
+        has_change_point=True, start=start, end=end,
+        model=model, part_no=part_no, statuses=list(statuses)
+    )
+    df_cp = pd.DataFrame(cp_rows)
+    if df_cp.empty:
+        return df_cp
+    # [Fix] Keep raw timestamp string for API matching (GAS string comparison is strict)
+    df_cp['timestamp_orig'] = df_cp['timestamp']
+    df_cp['timestamp'] = pd.to_datetime(df_cp['timestamp'], errors='coerce')
+    if df_cp['timestamp'].dt.tz is None:
+         df_cp['timestamp'] = df_cp['timestamp'].dt.tz_localize('Asia/Taipei')
+    else:
+         df_cp['timestamp'] = df_cp['timestamp'].dt.tz_convert('Asia/Taipei')
+    df_cp = df_cp.sort_values(by='timestamp', ascending=False)
+    df_cp['cavity_count'] = df_cp.groupby('timestamp')['timestamp'].transform('size')
+    return df_cp.drop_duplicates(subset=['timestamp']).reset_index(drop=True)
+
+@st.fragment(run_every=5)
+def render_upload_status(job_ids):
+    """
+    Pending / sent status of this session's submissions (refreshes on its own).
+    """
+    jobs = get_upload_queue().jobs(job_ids)[:5]
+    if not jobs:
+        return
+    st.markdown("##### 📤 上傳狀態")
+    for job in jobs:
+        if job['status'] == upload_queue.STATUS_SENT:
+            st.caption(f"✅ 已上傳 | {job['label']}")
+        elif job['status'] == upload_queue.STATUS_FAILED:
+            c1, c2 = st.columns([4, 1])
+            with c1:
+                st.error(f"❌ 上傳失敗 | {job['label']} ({job['last_error']})")
+            with c2:
+                if st.button("重試", key=f"retry_{job['id']}"):
+                    get_upload_queue().retry(job['id'])
+                    st.rerun(scope="fragment")
+        elif job.get('offline'):
+            st.caption(f"📴 網路中斷，已離線暫存 (恢復連線後自動上傳) | {job['label']}")
+        else:
+            retry_note = f" (重試 {job['attempts']} 次)" if job['attempts'] else ""
+            st.caption(f"⏳ 上傳中{retry_note} | {job['label']}")
+
 # --- Load Data ---
 df = data_manager.load_data()
+part_index = data_manager.load_part_index() # 車型/品番 -> row positions (O(1) part lookups)
 
 if df.empty:
     st.error("No data found. Please check parts_data.csv.")
@@ -315,6 +508,1196 @@ mode = st.sidebar.radio("功能選擇", ["📝 巡檢輸入", "📊 數據戰情
 
 
 
+# --- Page Sections (st.fragment: a widget interaction reruns only its own section, not the whole script) ---
+@st.fragment
+def render_inspection_form(selected_model, selected_part_no, current_part_data, specs):
+    """
+    Tab 1: measurement inputs + submit. Typing a value reruns only this form.
+    """
+    # [Design] Removed spacer for cleaner/tighter layout "盡量簡單"
+
+    # [1] Inputs & Operation
+    # [Feature] Work Mode Selector
+    mode_cols = st.columns([2, 1])
+    with mode_cols[0]:
+         work_mode = st.radio("作業模式", ["📏 標準巡檢 (量測+異常)", "⚡ 僅記錄變化點"], horizontal=True)
+    quick_log_mode = (work_mode == "⚡ 僅記錄變化點")
+
+    if quick_log_mode:
+        st.info("ℹ️ 快速模式：將自動填入標準值，僅需記錄異常。")
+        inspection_type = "變更點 (CP)"
+    else:
+        inspection_type = st.radio("巡檢階段", ["首件", "中件", "末件"], horizontal=True)
+
+    # --- Material Check (Moved to Top) ---
+    if not quick_log_mode:
+        mat_name = current_part_data.get('原料名稱')
+        if pd.isna(mat_name) or str(mat_name).strip() == "":
+            mat_name = current_part_data.get('原料編號', 'N/A')
+
+        # Combined Label (No Header)
+        material_check = st.radio(f"原料確認 (標準: {mat_name})", ["OK", "NG"], horizontal=True, index=0, key=f"mat_check_radio_{st.session_state['uploader_id']}")
+
+        # Validation Logic handled at Submit
+        material_ok = (material_check == "OK")
+    else:
+        material_ok = True # Auto pass in Quick Mode
+
+    st.divider()
+
+    user_inputs = {}
+    # Input Loop
+    for idx, sp in enumerate(specs):
+        # [UI Polish] Clean Input Layout
+        with st.container():
+            # Header for the specific cavity
+            # [UI Polish] Hide header if single cavity (User Request: "單穴" is ugly)
+            if sp.suffix:
+                # [User Request] Header: PartNo + " " + Suffix (Map _1/_2 to R/L or #1/#2)
+                display_suffix = sp.header or sp.suffix
+                if not display_suffix: # Fallback
+                     display_suffix = "R" if sp.suffix == "_1" else "L"
+
+                st.markdown(f"#### {selected_part_no} {display_suffix}")
+
+            # Check if Length Spec exists (Robust)
+            len_std_val = sp.len_std
+            has_len_spec = (len_std_val is not None) and (str(len_std_val).lower() != 'nan') and (str(len_std_val).strip() != '')
+
+            if has_len_spec:
+                c1, c2 = st.columns(2)
+            else:
+                c1 = st.container()
+                c2 = None
+
+            # Helper for robust formatting
+            def safe_fmt(val):
+                if isinstance(val, (list, tuple)):
+                    val = val[0] if len(val) > 0 else None
+
+                if isinstance(val, (float, int)):
+                    return f"{val:g}"
+                return str(val)
+
+            with c1:
+                # Weight Input
+                w_std_val = sp.std if sp.std is not None else '-'
+                w_min = sp.min if sp.min is not None else '-'
+                w_max = sp.max if sp.max is not None else '-'
+
+                w_label_extra = ""
+                if w_std_val != '-':
+                     w_str = safe_fmt(w_std_val)
+                     w_label_extra += f" [Std: {w_str}"
+                     if w_min != '-' and w_max != '-':
+                         w_label_extra += f" | {safe_fmt(w_min)}~{safe_fmt(w_max)}"
+                     w_label_extra += "]"
+
+                w_label = f"重量 (g){w_label_extra}"
+
+                if quick_log_mode:
+                     w_input = 0.0
+                else:
+                     w_input = st.number_input(
+                        w_label,
+                        min_value=0.0,
+                        max_value=10000.0,
+                        step=0.01,
+                        format="%.2f",
+                        key=f"w_in_{idx}_{st.session_state['uploader_id']}",
+                        value=None  # [Fix] Default to Empty
+                    )
+
+            l_input = None
+            if has_len_spec and c2:
+                with c2:
+                    # Length Input
+                    l_label = "長度 (mm)"
+                    l_min = sp.len_min
+                    l_max = sp.len_max
+
+                    l_str = safe_fmt(len_std_val)
+                    l_extra = f" [Std: {l_str}"
+                    if l_min is not None and l_max is not None:
+                          l_extra += f" | {safe_fmt(l_min)}~{safe_fmt(l_max)}"
+                    l_extra += "]"
+                    l_label += l_extra
+
+                    if quick_log_mode:
+                        l_input = 0.0
+                    else:
+                        l_input = st.number_input(
+                            l_label,
+                            min_value=0.0,
+                            max_value=5000.0,
+                            step=0.01,
+                            format="%.2f",
+                            key=f"l_in_{idx}_{st.session_state['uploader_id']}",
+                            value=None
+                        )
+
+            user_inputs[idx] = {'weight': w_input, 'length': l_input}
+
+            # Validation Msg
+            if w_input is not None and w_input > 0:
+                 if sp.min is not None and sp.max is not None:
+                     if not (sp.min <= w_input <= sp.max):
+                         st.error(f"⚠️ 重量 NG")
+                     else:
+                         st.success("重量 OK")
+
+            if l_input is not None and l_input > 0 and has_len_spec:
+                  if sp.len_min is not None and sp.len_max is not None:
+                       if not (sp.len_min <= l_input <= sp.len_max):
+                           st.error(f"⚠️ 長度 NG")
+                       else:
+                           st.success("長度 OK")
+
+            st.divider()
+
+    # Material Check (Moved to Top)
+    # Placeholder for deleted block
+
+    st.markdown("##### 📝 變化點說明")
+
+    # [Design] Simplified to Checkbox
+    is_issue = st.checkbox("⚠️ 回報異常 (Report Issue)", value=quick_log_mode, key=f"issue_checkbox_{st.session_state['uploader_id']}")
+
+    change_point = ""
+    action_taken = "" # [Feature] New Field
+    if is_issue:
+        change_point = st.text_area("請輸入異常說明", placeholder="例如: 模具損傷、原料更換...", height=100, key=f"cp_input_{st.session_state['uploader_id']}")
+        action_taken = st.text_area("執行對策說明 (Action Taken)", placeholder="例如: 已更換模具、調整參數...", height=100, key=f"action_input_{st.session_state['uploader_id']}")
+        if not change_point.strip():
+            st.caption("⚠️ 請輸入說明，若空白將視為無異常")
+    else:
+        if not quick_log_mode:
+            st.markdown("<span style='color: #888; font-size: 0.9em;'>✅ 無變化點 (Standard)</span>", unsafe_allow_html=True)
+
+    # Photo Input
+    input_method = st.radio("影像輸入", ["📸 網頁相機", "📂 上傳照片"], index=1, horizontal=True)
+    img_files = []
+    if input_method == "📸 網頁相機":
+        cam_file = st.camera_input("拍照", key=f"cam_input_{st.session_state['uploader_id']}")
+        if cam_file: img_files = [cam_file]
+    else:
+        uploaded_files = st.file_uploader("上傳照片", type=["jpg", "png", "heic", "heif"], accept_multiple_files=True, key=f"file_uploader_{st.session_state['uploader_id']}")
+        if uploaded_files: img_files = uploaded_files
+
+    # --- Submit Button ---
+    submit_btn = st.button("🚀 提交巡檢報告", use_container_width=True)
+    render_upload_status(st.session_state.get('my_upload_jobs', []))
+
+    if submit_btn:
+        any_missing_weight = False
+        if not quick_log_mode:
+             any_missing_weight = any(user_inputs[i]['weight'] is None for i in user_inputs)
+
+        if (any_missing_weight) and not quick_log_mode:
+            st.warning("⚠️ 請填寫所有重量數據 (Quick Mode 可跳過)")
+        elif not material_ok:
+            st.error("❌ 原料狀態異常，請復歸後再提交")
+        else:
+            with st.spinner("資料儲存中..."):
+                try:
+                    # [Fix] Force Asia/Taipei Time for Upload
+                    import pytz
+                    tz_tw = pytz.timezone('Asia/Taipei')
+                    timestamp_str = datetime.datetime.now(tz_tw).strftime("%Y-%m-%d %H:%M:%S")
+                    # Log Logic: One row per spec (L/R), sent together in one batch
+                    batch_rows = []
+                    for idx, sp in enumerate(specs):
+                        u_in = user_inputs[idx]
+
+                        # Prepare inputs
+                        final_weight = u_in['weight'] if u_in['weight'] is not None else 0.0 # Convert None to 0.0 for backend if needed, or handle as None?
+                        # GAS expects a value. If None, send empty string or 0? 
+                        # Current logic: weight column in sheet is number. 
+                        # If quick mode, weight is 0. If normal mode, we ensured it is not None.
+                        if final_weight is None: final_weight = 0.0
+
+                        final_len = u_in['length'] if u_in['length'] is not None else ""
+
+                        # Status Determination
+                        if quick_log_mode:
+                             final_res = judgement.CP # Change Point
+                        else:
+                             # Weight + Length Check (same engine as the dashboard re-judging)
+                             final_res = judgement.judge_cavity(sp, final_weight, final_len)
+
+                        # CP Status for Manager
+                        initial_status = "未審核" if change_point.strip() else "無異常"
+
+                        row_data = {
+                            "timestamp": timestamp_str,
+                            "model": selected_model,
+                            "part_no": f"{selected_part_no}{sp.suffix}",
+                            "part_name": current_part_data.get('品名', ''),
+                            "inspection_type": inspection_type,
+                            "material_ok": "OK" if material_ok else "NG", # Fix: Key must match GAS expectation
+                            "weight": final_weight,
+                            "width": "", 
+                            "length": final_len,
+                            "result": final_res,
+                            "change_point": change_point, # [Fix] Log CP for ALL parts in batch, not just the first one
+                            "action_taken": action_taken, # [Feature] New Field
+                            "status": initial_status,
+                            "manager_comment": ""
+                        }
+                        batch_rows.append(row_data)
+
+                    # All attached photos, shared by the whole batch
+                    # Safe filename: PartNo_Timestamp.jpg (PartNo_Timestamp_2.jpg, ... for extra photos)
+                    safe_ts = timestamp_str.replace(":", "").replace(" ", "_")
+                    images = []
+                    for n, f in enumerate(img_files, start=1):
+                        name_suffix = f"_{n}" if n > 1 else ""
+                        images.append((f.getvalue(), f"{batch_rows[0]['part_no']}_{safe_ts}{name_suffix}.jpg"))
+
+                    # Persist locally and return; the upload worker compresses (in parallel) + sends in the background
+                    job_id = get_upload_queue().enqueue(
+                        batch_rows, images,
+                        folder_id=st.secrets["gcp_service_account"]["drive_folder_id"]
+                    )
+                    st.session_state.setdefault('my_upload_jobs', []).append(job_id)
+
+                    st.toast("✅ 已提交，背景上傳中", icon="📤")
+
+                    # [Fix] Stay on page (User Request) and Clear Inputs
+                    # 1. Clear OLD keys to prevent session state bloat (Optional but good)
+                    # Since we increment uploader_id, the new widgets will have new keys.
+                    # We can just delete keys ending with the CURRENT ID before incrementing.
+                    current_uid_suffix = f"_{st.session_state['uploader_id']}"
+                    keys_to_clear = [k for k in st.session_state.keys() if str(k).endswith(current_uid_suffix)]
+                    for k in keys_to_clear:
+                        del st.session_state[k]
+
+                    # 2. Reset Uploaders by incrementing dynamic ID
+                    st.session_state['uploader_id'] += 1
+
+                    # st.session_state['inspection_started'] = False # Removed to stay on page
+                    st.session_state['inspection_started'] = True
+                    st.rerun()
+
+                except Exception as e:
+                    st.error(f"系統錯誤: {str(e)}")
+
+
+@st.fragment
+def render_part_change_points(selected_part_no, specs):
+    """
+    Tab 2: change-point history of the selected part (open / closed).
+    """
+    st.subheader(f"🛡️ {selected_part_no} - 變化點記錄")
+
+    # Fetch and Organize History (indexed slices of the shared dashboard frame)
+    all_cp_rows = []
+
+    for s in specs:
+        h_target = f"{selected_part_no}{s.suffix}"
+        h_data = part_history(h_target)
+
+        # [Debug] Show query status
+        # st.caption(f"🔍 Debug: Querying '{h_target}'... Found {len(h_data)} records")
+
+        if not h_data.empty:
+            all_cp_rows.append(h_data)
+
+    if all_cp_rows:
+        df_local_cp = pd.concat(all_cp_rows)
+
+        # Filter useful CP
+        if 'change_point' in df_local_cp.columns:
+            df_local_cp = df_local_cp[df_local_cp['change_point'].ne("") & df_local_cp['change_point'].notna()]
+
+        if 'timestamp' in df_local_cp.columns:
+            # [Fix] Force conversion to Taipei Time
+            if pd.api.types.is_datetime64_any_dtype(df_local_cp['timestamp']):
+                 df_local_cp['timestamp'] = df_local_cp['timestamp'].dt.tz_localize('Asia/Taipei') if df_local_cp['timestamp'].dt.tz is None else df_local_cp['timestamp'].dt.tz_convert('Asia/Taipei')
+            else:
+                 df_local_cp['timestamp'] = pd.to_datetime(df_local_cp['timestamp'], errors='coerce')
+                 if df_local_cp['timestamp'].dt.tz is None:
+                      df_local_cp['timestamp'] = df_local_cp['timestamp'].dt.tz_localize('Asia/Taipei')
+                 else:
+                      df_local_cp['timestamp'] = df_local_cp['timestamp'].dt.tz_convert('Asia/Taipei')
+            df_local_cp = df_local_cp.sort_values(by='timestamp', ascending=False)
+
+        # Split Open / Closed
+        if 'status' not in df_local_cp.columns: df_local_cp['status'] = '未審核'
+        df_local_cp['status'] = df_local_cp['status'].fillna("未審核")
+
+        open_issues = df_local_cp[~df_local_cp['status'].isin(["結案", "Closed", "無異常"])]
+        closed_issues = df_local_cp[df_local_cp['status'].isin(["結案", "Closed", "無異常"])]
+
+        # 1. Open Issues Section
+        if not open_issues.empty:
+            # Group by timestamp AND change_point to deduplicate same event on multiple cavities
+            grouped_open = open_issues.groupby(['timestamp', 'change_point'], sort=False)
+            unique_open_count = len(grouped_open)
+
+            st.error(f"⚠️ 尚有 {unique_open_count} 筆未結案異常！")
+
+            for (ts, cp), group in grouped_open:
+                cavity_count = len(group)
+
+                # Find best row
+                best_row = group.iloc[0]
+                rows_with_cmt = group[group['manager_comment'].astype(str).str.strip() != ""]
+                if not rows_with_cmt.empty:
+                    best_row = rows_with_cmt.iloc[0]
+
+                row = best_row
+                stat = row.get('status', '未審核')
+                s_icon = "🔴" if stat == "未審核" else "🟡"
+                ts_str = row['timestamp'].strftime('%Y-%m-%d %H:%M') if pd.notna(row['timestamp']) else "N/A"
+
+                part_display = row.get('part_no')
+                if cavity_count > 1:
+                    part_display = f"{str(part_display).split('_')[0]} (共{cavity_count}穴)"
+
+                st.markdown(f"#### {s_icon} [{stat}] {cp}")
+                st.caption(f"📅 {ts_str} | Part: {part_display}")
+
+                # Manager Comment
+                # [Feature] Show Action Taken
+                act_taken = row.get('action_taken')
+                if pd.notna(act_taken) and str(act_taken).strip():
+                     st.info(f"🔧 對策: {str(act_taken).strip()}")
+
+                # Manager Comment
+                mgr_cmt = row.get('manager_comment')
+                if pd.notna(mgr_cmt) and str(mgr_cmt).strip():
+                    st.caption(f"👨‍💼 主管: {str(mgr_cmt).strip()}")
+
+                # [Feature] Image Link(s)
+                img_links = []
+                if 'image' in group.columns:
+                    valid_imgs = group['image'].dropna()
+                    valid_imgs = valid_imgs[valid_imgs != ""]
+                    if not valid_imgs.empty:
+                        img_links = drive_integration.image_links(valid_imgs.iloc[0])
+
+                if img_links:
+                    st.markdown(" ".join(f"[📸 查看照片{n if len(img_links) > 1 else ''}]({link})" for n, link in enumerate(img_links, start=1)))
+
+                st.divider()
+        else:
+            st.success("✅ 目前無未結案異常")
+
+        # 2. History Section
+        st.subheader("📜 歷史記錄 (已結案)")
+        if not closed_issues.empty:
+            with st.expander("查看已結案記錄", expanded=False):
+                grouped_closed = closed_issues.groupby(['timestamp', 'change_point'], sort=False)
+                for (ts, cp), group in grouped_closed:
+                    row = group.iloc[0]
+                    cavity_count = len(group)
+
+                    stat = row.get('status', '結案')
+                    ts_str = row['timestamp'].strftime('%Y-%m-%d') if pd.notna(row['timestamp']) else "N/A"
+
+                    part_display = row.get('part_no')
+                    if cavity_count > 1:
+                        part_display = f"{str(part_display).split('_')[0]} (共{cavity_count}穴)"
+
+                    st.markdown(f"🟢 **{cp}**")
+                    st.caption(f"[{stat}] {ts_str} | {part_display}")
+
+                    # [Feature] Show Action Taken
+                    act_taken = row.get('action_taken')
+                    if pd.notna(act_taken) and str(act_taken).strip():
+                         st.caption(f"🔧 對策: {str(act_taken).strip()}")
+
+                    mgr_cmt = row.get('manager_comment')
+                    if pd.notna(mgr_cmt) and str(mgr_cmt).strip():
+                        st.caption(f"👨‍💼 主管: {str(mgr_cmt).strip()}")
+
+                    # [Feature] Image Link(s)
+                    img_links = []
+                    if 'image' in group.columns:
+                        valid_imgs = group['image'].dropna()
+                        valid_imgs = valid_imgs[valid_imgs != ""]
+                        if not valid_imgs.empty:
+                            img_links = drive_integration.image_links(valid_imgs.iloc[0])
+
+                    if img_links:
+                        st.caption(" ".join(f"[📸 查看照片{n if len(img_links) > 1 else ''}]({link})" for n, link in enumerate(img_links, start=1)))
+
+                    st.divider()
+        else:
+            st.caption("無已結案記錄")
+    else:
+        st.info("無歷史記錄")
+
+
+@st.fragment
+def render_part_trends(selected_part_no, specs, current_part_data):
+    """
+    Tab 3: weight/length trend charts and defect history photos.
+    """
+    st.subheader(f"📊 {selected_part_no} - 趨勢與履歷")
+
+    # [Trend Chart Logic]
+    chart_cols = st.columns(len(specs))
+
+    for idx, sp in enumerate(specs):
+        with chart_cols[idx]:
+            chart_title = f"{selected_part_no}{sp.label}"
+            suffix = sp.suffix
+            history_target_no = f"{selected_part_no}{suffix}"
+
+            st.markdown(f"**{chart_title}**")
+
+            # Fetch (indexed slice of the shared dashboard frame)
+            history_data = part_history(history_target_no)
+
+            # [Debug] Check data
+            valid_chart_data = False
+            if not history_data.empty:
+                chart_df = history_data.copy()
+
+                # Data Cleaning
+                if 'weight' in chart_df.columns and 'timestamp' in chart_df.columns:
+                    chart_df['weight'] = pd.to_numeric(chart_df['weight'], errors='coerce')
+                    chart_df['timestamp'] = pd.to_datetime(chart_df['timestamp'], errors='coerce')
+                    chart_df = chart_df.dropna(subset=['weight', 'timestamp'])
+
+                    # Filter: Only show real measurements (>0)
+                    chart_df = chart_df[chart_df['weight'] > 0]
+
+                    if not chart_df.empty:
+                        valid_chart_data = True
+
+                        # Add Limits
+                        w_max_limit = sp.max
+                        w_min_limit = sp.min
+
+                        y_cols = ['weight']
+                        if w_max_limit is not None:
+                            chart_df['Limit H'] = w_max_limit
+                            y_cols.append('Limit H')
+                        if w_min_limit is not None:
+                            chart_df['Limit L'] = w_min_limit
+                            y_cols.append('Limit L')
+
+                        # Convert to Local Time for Display
+                        # [Fix] Source is Taipei Time string -> Localize to Taipei directly
+                        # Convert to Local Time for Display
+                        # [Fix] Source is Taipei Time string -> Localize to Taipei directly
+                        if chart_df['timestamp'].dt.tz is None:
+                             chart_df['timestamp'] = chart_df['timestamp'].dt.tz_localize('Asia/Taipei')
+                        else:
+                             chart_df['timestamp'] = chart_df['timestamp'].dt.tz_convert('Asia/Taipei')
+
+                        # [Fix] Sort Newest -> Oldest for Data View
+                        chart_df = chart_df.sort_values(by='timestamp', ascending=False)
+                        # [Perf] Point budget for the browser (out-of-spec / NG points always kept)
+                        chart_df = downsample.downsample(chart_df, 'timestamp', 'weight', low=w_min_limit, high=w_max_limit, keep=chart_df['result'].eq(judgement.NG) if 'result' in chart_df.columns else None)
+
+                        chart_long = chart_df.melt('timestamp', value_vars=y_cols, var_name='MetricType', value_name='Value')
+
+                        # Scaling
+                        y_min_val = chart_long['Value'].min()
+                        y_max_val = chart_long['Value'].max()
+                        padding = (y_max_val - y_min_val) * 0.2 if y_max_val != y_min_val else 1.0
+
+                        color_domain = ['Limit H', 'Limit L', 'weight']
+                        color_range = ['#FF6C6C', '#FF6C6C', '#457B9D'] 
+
+                        base = alt.Chart(chart_long).encode(
+                            x=alt.X('timestamp', title=None, axis=alt.Axis(format='%m/%d', ticks=False)),
+                            y=alt.Y('Value', title='g', scale=alt.Scale(domain=[y_min_val - padding, y_max_val + padding])),
+                            color=alt.Color('MetricType', legend=None, scale=alt.Scale(domain=color_domain, range=color_range)),
+                            order='timestamp', # [Fix] Ensure lines connect chronologically even if data is sorted Descending
+                            tooltip=['timestamp', 'Value', 'MetricType']
+                        )
+
+                        line_w = base.transform_filter(alt.datum.MetricType == 'weight').mark_line(strokeWidth=3, point=True)
+                        line_limits = base.transform_filter((alt.datum.MetricType == 'Limit H') | (alt.datum.MetricType == 'Limit L')).mark_line(strokeDash=[5, 5], opacity=0.8)
+
+                        st.altair_chart((line_w + line_limits).interactive(), use_container_width=True)
+
+            # [Feature] Length Chart for Inspection Page
+            if not history_data.empty:
+                chart_df_len = history_data.copy()
+                if 'length' in chart_df_len.columns:
+                     # Convert
+                     chart_df_len['length'] = pd.to_numeric(chart_df_len['length'], errors='coerce')
+                     chart_df_len['timestamp'] = pd.to_datetime(chart_df_len['timestamp'], errors='coerce')
+                     chart_df_len = chart_df_len.dropna(subset=['length', 'timestamp'])
+                     chart_df_len = chart_df_len[chart_df_len['length'] > 0]
+
+                     if not chart_df_len.empty:
+                         # Convert Time
+                         if chart_df_len['timestamp'].dt.tz is None:
+                             chart_df_len['timestamp'] = chart_df_len['timestamp'].dt.tz_localize('Asia/Taipei')
+                         else:
+                             chart_df_len['timestamp'] = chart_df_len['timestamp'].dt.tz_convert('Asia/Taipei')
+
+                         # Limits
+                         l_max_limit = sp.len_max
+                         l_min_limit = sp.len_min
+                         y_cols_l = ['length']
+                         if l_max_limit is not None:
+                             chart_df_len['Limit H'] = float(l_max_limit)
+                             y_cols_l.append('Limit H')
+                         if l_min_limit is not None:
+                             chart_df_len['Limit L'] = float(l_min_limit)
+                             y_cols_l.append('Limit L')
+
+                         st.markdown(f"**📏 長度 ({suffix})**")
+                         chart_df_len = downsample.downsample(chart_df_len, 'timestamp', 'length', low=l_min_limit, high=l_max_limit)
+                         chart_long_l = chart_df_len.melt('timestamp', value_vars=y_cols_l, var_name='MetricType', value_name='Value')
+
+                         y_min_l = chart_long_l['Value'].min()
+                         y_max_l = chart_long_l['Value'].max()
+                         pad_l = (y_max_l - y_min_l) * 0.1 if y_max_l != y_min_l else 1.0
+
+                         color_domain_l = ['Limit H', 'Limit L', 'length']
+                         color_range_l = ['#FF6C6C', '#FF6C6C', '#2A9D8F']
+
+                         base_l = alt.Chart(chart_long_l).encode(
+                            x=alt.X('timestamp', title=None, axis=alt.Axis(format='%m/%d', ticks=False)),
+                            y=alt.Y('Value', title='mm', scale=alt.Scale(domain=[y_min_l - pad_l, y_max_l + pad_l])),
+                            color=alt.Color('MetricType', legend=None, scale=alt.Scale(domain=color_domain_l, range=color_range_l)),
+                            tooltip=['timestamp', 'Value', 'MetricType']
+                         )
+                         line_l = base_l.transform_filter(alt.datum.MetricType == 'length').mark_line(strokeWidth=3, point=True)
+                         line_limits_l = base_l.transform_filter((alt.datum.MetricType == 'Limit H') | (alt.datum.MetricType == 'Limit L')).mark_line(strokeDash=[5, 5], opacity=0.8)
+                         st.altair_chart((line_l + line_limits_l).interactive(), use_container_width=True)
+
+            if not valid_chart_data and history_data.empty: # Update info msg criteria
+                 st.info("尚無有效量測數據 (僅顯示重量 > 0 之記錄)")
+
+    st.divider()
+
+    # [Defect Images Logic]
+    st.subheader("⚠️ 過去異常履歷 (Reference)")
+    defect_images = []
+    d1 = current_part_data.get('異常履歷寫真')
+    if pd.notna(d1) and str(d1).strip(): defect_images.append(("1", str(d1).strip()))
+    for i in range(2, 4):
+        col = f"異常履歷寫真{i}"
+        val = current_part_data.get(col)
+        if pd.notna(val) and str(val).strip():
+            defect_images.append((str(i), str(val).strip()))
+
+    if defect_images:
+        dh_cols = st.columns(5)
+        for idx, (label, fname) in enumerate(defect_images):
+            col_idx = idx % 5
+            img_path = os.path.join("quality_images", fname)
+            valid_img_path = check_image_availability(img_path)
+
+            with dh_cols[col_idx]:
+                if valid_img_path:
+                    st.image(valid_img_path, caption=f"履歷-{label}", use_container_width=True)
+                else:
+                    st.caption(f"履歷{label} 讀取失敗")
+    else:
+        st.caption("無異常履歷照片")
+
+
+@st.fragment
+def render_weight_trend():
+    """
+    Dashboard: filters, data table and trend/SPC charts. Filter changes and row clicks rerun only this panel.
+    """
+    df_dash = load_dashboard_frame(drive_integration.data_version()) # Cache hit unless a sync brought new rows
+    # --- Filters ---
+    col_d1, col_d2, col_d3 = st.columns(3)
+    with col_d1:
+        models_dash = ["全部"] + list(df_dash['model'].unique())
+        filter_model = st.selectbox("篩選車型", models_dash)
+    with col_d2:
+         if filter_model != "全部":
+             parts_dash = ["全部"] + list(df_dash[df_dash['model'] == filter_model]['part_no'].unique())
+         else:
+             parts_dash = ["全部"] + list(df_dash['part_no'].unique())
+
+         # [Fix] Decoupled State for Interaction
+         # [Fix] Decoupled State for Interaction
+         if 'dash_target_part' not in st.session_state:
+             st.session_state['dash_target_part'] = "全部"
+
+         # [Fix] Dynamic Key for Sidebar Widget
+         if 'dash_ui_rev' not in st.session_state:
+             st.session_state['dash_ui_rev'] = 0
+
+         # Calculate Index
+         current_target = st.session_state['dash_target_part']
+         try:
+             f_index = parts_dash.index(current_target)
+         except ValueError:
+             f_index = 0
+
+         # Render Widget with Dynamic Key
+         # This forces widget to reset when dash_ui_rev changes
+         dynamic_key = f"dash_part_ui_{st.session_state['dash_ui_rev']}"
+
+         # [Feature] Show Part Name
+         part_name_map_dash = {}
+         if 'part_no' in df_dash.columns and 'part_name' in df_dash.columns:
+             part_name_map_dash = dict(zip(df_dash['part_no'], df_dash['part_name']))
+
+         def format_func_dash(option):
+             if option == "全部": return "全部 (All)"
+             name = part_name_map_dash.get(option, "")
+             # Fallback to Master Data if available
+             if pd.isna(name) or not str(name).strip():
+                 name = part_index.part_name(option)
+
+             if pd.notna(name) and str(name).strip():
+                 return f"{option} | {name}"
+             return option
+
+         filter_part_ui = st.selectbox("篩選品番", parts_dash, index=f_index, key=dynamic_key, format_func=format_func_dash)
+
+         # Sync UI -> State (Only if User Changed Sidebar directly)
+         if filter_part_ui != st.session_state['dash_target_part']:
+             # Check if change came from user (rev matches) or just init mismatch
+             # Actually, if user changes manually, we should update state
+             st.session_state['dash_target_part'] = filter_part_ui
+             st.rerun(scope="fragment")
+
+         filter_part = filter_part_ui # Local var for legacy use below
+
+         # Show small product image if filtered
+         # [User Request] Remove Image Display
+         # if filter_part != "全部":
+         #     img_path = f"quality_images/{filter_part}_main.jpg"
+         #     if check_image_availability(img_path):
+         #         st.image(img_path, width=200, caption=filter_part)
+    with col_d3:
+         results_dash = ["全部"] + list(df_dash['result'].unique())
+         filter_result = st.selectbox("篩選結果", results_dash)
+
+    # Apply filters (on the shared cached frame: filter first, never modify df_dash in place)
+    df_view = df_dash
+    if filter_model != "全部": df_view = df_view[df_view['model'] == filter_model]
+    if filter_part != "全部": df_view = df_view[df_view['part_no'] == filter_part]
+    df_scope = df_view # Model/part scope (before the result filter) for NG rates
+    if filter_result != "全部": df_view = df_view[df_view['result'] == filter_result]
+
+    # [Filter] Hide Change Point records (Pure CP has weight=0)
+    # [Refactor] Don't filter global view, only filter for Chart
+    # (weight is already numeric in the cached frame)
+    # df_view = df_view[df_view['weight'] > 0] <--- Removed to show CP in Table
+
+    # [Double Check] Explicitly hide 'CP' result if any leaked
+    if 'result' in df_view.columns:
+         # df_view = df_view[df_view['result'] != 'CP'] <--- Removed to show CP in Table
+         pass
+
+    # Sort by Newest
+    if 'timestamp' in df_view.columns:
+         df_view = df_view.sort_values(by='timestamp', ascending=False)
+
+    # Process Image Links
+    if 'image' in df_view.columns:
+        def make_drive_link(val):
+            # Table cell links the first photo (a record may hold several, one per line)
+            links = drive_integration.image_links(val)
+            return links[0] if links else None
+        df_view = df_view.assign(image=df_view['image'].apply(make_drive_link))
+
+    # [View] Revert to showing all columns (User Request)
+    # [View] Interactive Table with Click-to-Filter
+    st.caption(f"📊 搜尋結果：共 {len(df_view)} 筆資料")
+    event = st.dataframe(
+        df_view, 
+        use_container_width=True,
+        column_config={
+            "image": st.column_config.LinkColumn("巡檢照片", display_text="📸 查看"),
+            "timestamp": st.column_config.DatetimeColumn("時間", format="MM/DD HH:mm"),
+            "part_name": st.column_config.TextColumn("品名", width="medium"), # [Feature] Part Name
+            "part_no": st.column_config.TextColumn("品番", width="medium"),
+            "weight": st.column_config.NumberColumn("重量 (g)", format="%.2f")
+        },
+        on_select="rerun",
+        selection_mode="single-row",
+        key="dash_table_v42" # [Fix] Bump key to force re-render
+    )
+
+    # [Interaction] Click Row to View Chart (WITHOUT Filtering Table)
+    if len(event.selection.rows) > 0:
+        s_idx = event.selection.rows[0]
+        if s_idx < len(df_view):
+            target_p = df_view.iloc[s_idx]['part_no']
+            # Only update the CHART target, not the FILTER target
+            if target_p != st.session_state.get('dash_chart_target'):
+                 st.session_state['dash_chart_target'] = target_p
+                 st.rerun(scope="fragment")
+
+    # [Feature] NG rate per month: stored result vs. re-judged against current parts_data.csv limits
+    if {'result', 'part_no', 'weight'}.issubset(df_scope.columns):
+        with st.expander("📉 月別 NG 率 (依現行規格重新判定)", expanded=False):
+            rates = judgement.ng_rates(df_scope, data_manager.load_part_specs())
+            if rates.empty:
+                st.caption("無可判定的巡檢數據")
+            else:
+                rates.index = rates.index.strftime('%Y-%m')
+                rates[['ng_rate_stored', 'ng_rate_rejudged']] *= 100
+                st.dataframe(
+                    rates,
+                    use_container_width=True,
+                    column_config={
+                        "inspections": st.column_config.NumberColumn("巡檢筆數"),
+                        "ng_stored": st.column_config.NumberColumn("NG (原判定)"),
+                        "ng_rejudged": st.column_config.NumberColumn("NG (現行規格)"),
+                        "ng_rate_stored": st.column_config.NumberColumn("NG 率 (原判定)", format="%.1f%%"),
+                        "ng_rate_rejudged": st.column_config.NumberColumn("NG 率 (現行規格)", format="%.1f%%")
+                    }
+                )
+
+    if not df_view.empty:
+        st.subheader("📈 重量趨勢圖")
+
+        # Determine which part to show in chart
+        # Priority: 1. Clicked Row (dash_chart_target) 2. Sidebar Filter (dash_target_part)
+        chart_part = st.session_state.get('dash_chart_target')
+        filter_part_global = st.session_state.get('dash_target_part', '全部')
+
+        # If sidebar filter changes, it should override/reset the chart selection
+        # (Logic: If I explicitly filter for Part A, I expect to see Part A's chart)
+        if filter_part_global != "全部" and filter_part_global != chart_part:
+             chart_part = filter_part_global
+             st.session_state['dash_chart_target'] = chart_part
+
+        if not chart_part or chart_part == "全部":
+            st.info("👈 請在左側選單選擇單一品番，或在下方表格點選，以查看趨勢圖。")
+            chart_df = pd.DataFrame()
+        else:
+            st.caption(f"📊 目前顯示: **{chart_part}** 的趨勢")
+            chart_df = df_dash[df_dash['part_no'] == chart_part].copy()
+            # Filter for Chart Only (Hide 0 weight)
+            if 'weight' in chart_df.columns:
+                # [Fix] Ensure weight is numeric (float) to avoid TypeError
+                chart_df['weight'] = pd.to_numeric(chart_df['weight'], errors='coerce')
+                chart_df = chart_df.dropna(subset=['weight'])
+                chart_df = chart_df[chart_df['weight'] > 0]
+
+        if not chart_df.empty:
+            y_cols = ['weight']
+            # [Fix] Fuzzy Match for Suffixes (e.g., Part_1, Part_2) -> cavity limits
+            _, cavity = data_manager.load_part_specs().resolve(chart_part)
+            if cavity is not None:
+                if cavity.max is not None:
+                    chart_df['Limit H'] = cavity.max
+                    y_cols.append('Limit H')
+                if cavity.min is not None:
+                     chart_df['Limit L'] = cavity.min
+                     y_cols.append('Limit L')
+
+            # [Perf] Point budget for the browser (out-of-spec / NG points always kept)
+            chart_df = downsample.downsample(
+                chart_df, 'timestamp', 'weight',
+                low=cavity.min if cavity is not None else None, high=cavity.max if cavity is not None else None,
+                keep=chart_df['result'].eq(judgement.NG) if 'result' in chart_df.columns else None
+            )
+            chart_long = chart_df.melt('timestamp', value_vars=y_cols, var_name='MetricType', value_name='Value')
+            y_min_val = chart_long['Value'].min(); y_max_val = chart_long['Value'].max()
+            padding = (y_max_val - y_min_val) * 0.1 if y_max_val != y_min_val else 5
+
+            color_domain = ['Limit H', 'Limit L', 'weight']
+            color_range = ['#FF6C6C', '#FF6C6C', '#457B9D'] 
+
+            base = alt.Chart(chart_long).encode(
+                x=alt.X('timestamp', title='時間', axis=alt.Axis(format='%m/%d %H:%M')),
+                y=alt.Y('Value', title='重量 (g)', scale=alt.Scale(domain=[y_min_val - padding, y_max_val + padding])),
+                color=alt.Color('MetricType', legend=None, scale=alt.Scale(domain=color_domain, range=color_range)),
+                tooltip=['timestamp', 'Value', 'MetricType']
+            )
+
+            line_w = base.transform_filter(alt.datum.MetricType == 'weight').mark_line(point=True)
+            line_limits = base.transform_filter((alt.datum.MetricType == 'Limit H') | (alt.datum.MetricType == 'Limit L')).mark_line(strokeDash=[5, 5], opacity=0.8)
+
+            st.altair_chart((line_w + line_limits).interactive(), use_container_width=True)
+
+            # [Feature] SPC: capability + control charts (full history, precomputed for all parts)
+            spc_result = load_spc(drive_integration.data_version(), data_manager.parts_version())
+            spc_points, spc_summary, spc_subgroups = spc_result.part(chart_part)
+            if spc_summary is not None:
+                with st.expander("🧪 SPC 製程能力 / 管制圖", expanded=False):
+                    fmt_idx = lambda v: "-" if pd.isna(v) else f"{v:.2f}"
+                    m1, m2, m3, m4, m5 = st.columns(5)
+                    m1.metric("Cp", fmt_idx(spc_summary['cp']))
+                    m2.metric("Cpk", fmt_idx(spc_summary['cpk']))
+                    m3.metric("Pp", fmt_idx(spc_summary['pp']))
+                    m4.metric("Ppk", fmt_idx(spc_summary['ppk']))
+                    m5.metric("異常點 (Nelson)", int(spc_summary['violations']))
+                    st.caption(f"樣本數 {int(spc_summary['n'])} | 平均 {spc_summary['mean']:.2f} g | σ(組內) {fmt_idx(spc_summary['sigma_within'])} | σ(整體) {fmt_idx(spc_summary['sigma_overall'])}")
+
+                    # Individuals chart: CL / UCL / LCL, rolling mean, rule violations in red
+                    i_chart = spc_points[['timestamp', 'weight', 'cl', 'ucl', 'lcl', 'roll_mean', 'rules']].copy()
+                    i_chart = downsample.downsample(i_chart, 'timestamp', 'weight', low=spc_summary['lsl'], high=spc_summary['usl'], keep=i_chart['rules'] > 0)
+                    i_chart['rule'] = i_chart['rules'].map(lambda m: "、".join(spc.rule_names(m)))
+                    i_base = alt.Chart(i_chart).encode(x=alt.X('timestamp', title='時間', axis=alt.Axis(format='%m/%d %H:%M')))
+                    i_layers = [
+                        i_base.mark_line(point=True, color='#457B9D').encode(y=alt.Y('weight', title='重量 (g)', scale=alt.Scale(zero=False)), tooltip=['timestamp', 'weight']),
+                        i_base.mark_line(color='#2A9D8F', opacity=0.7).encode(y='roll_mean'),
+                        i_base.mark_line(color='grey').encode(y='cl'),
+                        i_base.mark_line(color='#E76F51', strokeDash=[4, 4]).encode(y='ucl'),
+                        i_base.mark_line(color='#E76F51', strokeDash=[4, 4]).encode(y='lcl'),
+                        i_base.transform_filter(alt.datum.rules > 0).mark_point(color='red', size=80, filled=True).encode(y='weight', tooltip=['timestamp', 'weight', 'rule'])
+                    ]
+                    st.markdown("**I 管制圖 (個別值)**")
+                    st.altair_chart(alt.layer(*i_layers).interactive(), use_container_width=True)
+
+                    if not spc_subgroups.empty:
+                        st.markdown(f"**X̄-R 管制圖 (每 {spc.SUBGROUP_SIZE} 筆一組)**")
+                        spc_subgroups = downsample.downsample(spc_subgroups, 'timestamp', 'xbar', keep=spc_subgroups['out_of_control'])
+                        sg_base = alt.Chart(spc_subgroups).encode(x=alt.X('timestamp', title='時間', axis=alt.Axis(format='%m/%d %H:%M')))
+                        xbar_chart = alt.layer(
+                            sg_base.mark_line(point=True, color='#457B9D').encode(y=alt.Y('xbar', title='X̄', scale=alt.Scale(zero=False))),
+                            sg_base.mark_line(color='grey').encode(y='xbar_cl'),
+                            sg_base.mark_line(color='#E76F51', strokeDash=[4, 4]).encode(y='xbar_ucl'),
+                            sg_base.mark_line(color='#E76F51', strokeDash=[4, 4]).encode(y='xbar_lcl')
+                        ).properties(height=200)
+                        r_chart = alt.layer(
+                            sg_base.mark_line(point=True, color='#457B9D').encode(y=alt.Y('range', title='R')),
+                            sg_base.mark_line(color='grey').encode(y='r_cl'),
+                            sg_base.mark_line(color='#E76F51', strokeDash=[4, 4]).encode(y='r_ucl')
+                        ).properties(height=150)
+                        st.altair_chart(alt.vconcat(xbar_chart, r_chart), use_container_width=True)
+
+                    flagged = i_chart[i_chart['rules'] > 0]
+                    if not flagged.empty:
+                        st.dataframe(
+                            flagged[['timestamp', 'weight', 'rule']].sort_values('timestamp', ascending=False),
+                            use_container_width=True,
+                            hide_index=True,
+                            column_config={
+                                "timestamp": st.column_config.DatetimeColumn("時間", format="MM/DD HH:mm"),
+                                "weight": st.column_config.NumberColumn("重量 (g)", format="%.2f"),
+                                "rule": st.column_config.TextColumn("違反規則", width="large")
+                            }
+                        )
+        else:
+            if filter_part != "全部":
+                st.info(f"ℹ️ 產品 [{filter_part}] 目前無「重量數據」。(記錄可能均為快速模式/CP，重量=0)")
+            else:
+                pass
+
+        # [Feature] Length Trend Chart (User Request)
+        # Re-use df_view but filter for Length
+        if filter_part != "全部" and not df_view.empty and 'length' in df_view.columns:
+             chart_df_len = df_view.copy()
+             # Convert to numeric
+             chart_df_len['length'] = pd.to_numeric(chart_df_len['length'], errors='coerce')
+             chart_df_len = chart_df_len[chart_df_len['length'] > 0]
+
+             if not chart_df_len.empty:
+                  st.subheader("📏 長度趨勢圖")
+                  y_cols_len = ['length']
+
+                  # Spec Limits for Length
+                  if filter_part != "全部":
+                        _, cavity = data_manager.load_part_specs().resolve(filter_part)
+                        if cavity is not None:
+                            if cavity.len_max is not None:
+                                chart_df_len['Limit H'] = cavity.len_max
+                                y_cols_len.append('Limit H')
+                            if cavity.len_min is not None:
+                                chart_df_len['Limit L'] = cavity.len_min
+                                y_cols_len.append('Limit L')
+
+                  # Timezone
+                  if chart_df_len['timestamp'].dt.tz is None:
+                       chart_df_len['timestamp'] = chart_df_len['timestamp'].dt.tz_localize('Asia/Taipei')
+                  else:
+                       chart_df_len['timestamp'] = chart_df_len['timestamp'].dt.tz_convert('Asia/Taipei')
+
+                  # [Fix] Sort Newest -> Oldest
+                  chart_df_len = chart_df_len.sort_values(by='timestamp', ascending=False)
+                  chart_df_len = downsample.downsample(
+                      chart_df_len, 'timestamp', 'length',
+                      low=chart_df_len['Limit L'].iloc[0] if 'Limit L' in chart_df_len.columns else None,
+                      high=chart_df_len['Limit H'].iloc[0] if 'Limit H' in chart_df_len.columns else None
+                  )
+
+                  chart_long_len = chart_df_len.melt('timestamp', value_vars=y_cols_len, var_name='MetricType', value_name='Value')
+
+                  y_min_l = chart_long_len['Value'].min()
+                  y_max_l = chart_long_len['Value'].max()
+                  pad_l = (y_max_l - y_min_l) * 0.1 if y_max_l != y_min_l else 1.0
+
+                  color_domain_l = ['Limit H', 'Limit L', 'length']
+                  color_range_l = ['#FF6C6C', '#FF6C6C', '#2A9D8F'] # Green for Length
+
+                  base_l = alt.Chart(chart_long_len).encode(
+                        x=alt.X('timestamp', title=None, axis=alt.Axis(format='%m/%d', ticks=False)),
+                        y=alt.Y('Value', title='mm', scale=alt.Scale(domain=[y_min_l - pad_l, y_max_l + pad_l])),
+                        color=alt.Color('MetricType', legend=None, scale=alt.Scale(domain=color_domain_l, range=color_range_l)),
+                        order='timestamp', # [Fix] Ensure chronological lines
+                        tooltip=['timestamp', 'Value', 'MetricType']
+                  )
+
+                  line_l = base_l.transform_filter(alt.datum.MetricType == 'length').mark_line(strokeWidth=3, point=True)
+                  line_limits_l = base_l.transform_filter((alt.datum.MetricType == 'Limit H') | (alt.datum.MetricType == 'Limit L')).mark_line(strokeDash=[5, 5], opacity=0.8)
+
+                  st.altair_chart((line_l + line_limits_l).interactive(), use_container_width=True)
+
+        # [Feature] History Table (Sorted Newest First)
+        # Fix NameError: Define history_data and suffix
+        history_data = df_view.to_dict('records') if 'df_view' in locals() and not df_view.empty else []
+        suffix = filter_part if 'filter_part' in locals() and filter_part != "全部" else "全部"
+
+        if history_data and suffix != "全部":
+            st.subheader(f"📋 {suffix} 歷史數據列表")
+            df_hist_table = pd.DataFrame(history_data)
+
+            # Timezone
+            if 'timestamp' in df_hist_table.columns:
+                df_hist_table['timestamp'] = pd.to_datetime(df_hist_table['timestamp'], errors='coerce')
+                if pd.api.types.is_datetime64_any_dtype(df_hist_table['timestamp']):
+                    if df_hist_table['timestamp'].dt.tz is None:
+                        df_hist_table['timestamp'] = df_hist_table['timestamp'].dt.tz_localize('Asia/Taipei')
+                    else:
+                        df_hist_table['timestamp'] = df_hist_table['timestamp'].dt.tz_convert('Asia/Taipei')
+                    df_hist_table = df_hist_table.sort_values(by='timestamp', ascending=False).reset_index(drop=True)
+
+            # Columns to Show
+            cols_to_show = ['timestamp', 'weight', 'result']
+            if 'length' in df_hist_table.columns: cols_to_show.append('length')
+            if 'change_point' in df_hist_table.columns: cols_to_show.append('change_point')
+            if 'action_taken' in df_hist_table.columns: cols_to_show.append('action_taken') # [Feature] Show Action Taken
+            if 'manager_comment' in df_hist_table.columns: cols_to_show.append('manager_comment')
+
+            # Filter existing cols
+            cols_to_show = [c for c in cols_to_show if c in df_hist_table.columns]
+
+            st.dataframe(
+                df_hist_table[cols_to_show],
+                use_container_width=True,
+                column_config={
+                    "timestamp": st.column_config.DatetimeColumn("時間", format="MM/DD HH:mm"),
+                    "weight": st.column_config.NumberColumn("重量", format="%.2f"),
+                    "length": st.column_config.NumberColumn("長度", format="%.2f"),
+                    "result": "結果",
+                    "change_point": "變化點",
+                    "action_taken": "執行對策說明", # [Feature] Column Config
+                    "manager_comment": "主管備註"
+                },
+                hide_index=True
+            )
+
+
+@st.fragment
+def render_change_point_center():
+    """
+    Dashboard: change-point management center (filters, paged events, status updates).
+    """
+    df_dash = load_dashboard_frame(drive_integration.data_version())
+    st.subheader("🛡️ 變化點管理中心")
+
+    # --- Filters ---
+    st.markdown("##### 🔍 篩選條件")
+    f_col1, f_col2, f_col3, f_col4 = st.columns(4)
+    with f_col1:
+        today = datetime.date.today()
+        start_date = st.date_input("開始日期", today - datetime.timedelta(days=30))
+        end_date = st.date_input("結束日期", today)
+    with f_col2:
+        # Options come from the local mirror (indexed), not a scan of df_dash
+        models_cp = ["全部"] + drive_integration.distinct_values('model', has_change_point=True)
+        filter_cp_model = st.selectbox("車型 (Model)", models_cp, key="cp_model_filter")
+    with f_col3:
+        parts_cp = ["全部"] + drive_integration.distinct_values(
+            'part_no', has_change_point=True,
+            model=filter_cp_model if filter_cp_model != "全部" else None
+        )
+        # [Fix] Added key for dashboard interaction
+        # [Feature] Show Part Name
+        part_name_map_cp = {}
+        if 'part_no' in df_dash.columns and 'part_name' in df_dash.columns:
+             part_name_map_cp = dict(zip(df_dash['part_no'], df_dash['part_name']))
+
+        def format_func_cp(option):
+             if option == "全部": return "全部 (All)"
+             name = part_name_map_cp.get(option, "")
+             # Fallback
+             if pd.isna(name) or not str(name).strip():
+                 name = part_index.part_name(option)
+
+             if pd.notna(name) and str(name).strip():
+                 return f"{option} | {name}"
+             return option
+
+        filter_cp_part = st.selectbox("品番 (Part No)", parts_cp, key="cp_part_filter", format_func=format_func_cp)
+    with f_col4:
+        status_opts = ["未審核", "審核中", "結案", "Closed", "無異常"]
+        filter_cp_status = st.multiselect("狀態 (Status)", status_opts, default=["未審核", "審核中"])
+
+    # Apply Filters (Indexed query on the local mirror, grouped into events once per data version)
+    df_display = pd.DataFrame()
+    if filter_cp_status:
+        df_display = load_cp_events(
+            drive_integration.data_version(), start_date, end_date,
+            filter_cp_model if filter_cp_model != "全部" else None,
+            filter_cp_part if filter_cp_part != "全部" else None,
+            tuple(filter_cp_status)
+        )
+    else:
+        st.warning("請選擇至少一種狀態")
+
+    # [Perf] Server-side pagination: only the visible page of events is rendered
+    page_rows = df_display
+    if not df_display.empty:
+        n_pages = (len(df_display) - 1) // CP_PAGE_SIZE + 1
+        p_col1, p_col2 = st.columns([3, 1])
+        with p_col2:
+            # Key follows the filters, so a new filter starts again at page 1
+            page_key = f"cp_page_{filter_cp_model}_{filter_cp_part}_{start_date}_{end_date}_{'|'.join(filter_cp_status)}"
+            page = st.number_input(f"頁次 (共 {n_pages} 頁)", min_value=1, max_value=n_pages, value=1, step=1, key=page_key)
+        with p_col1:
+            st.info(f"共發現 {len(df_display)} 筆異常事件 (已合併多穴資料)")
+        page_rows = df_display.iloc[(page - 1) * CP_PAGE_SIZE:page * CP_PAGE_SIZE]
+
+        # [Feature] Bulk status update: every event matching the filters (all pages) in one request
+        with st.expander(f"📦 批次更新 (目前篩選的 {len(df_display)} 筆事件)", expanded=False):
+            b_col1, b_col2, b_col3 = st.columns([1, 2, 1])
+            with b_col1:
+                bulk_status = st.selectbox("審核狀態", ["結案", "審核中", "無異常", "未審核"], key="cp_bulk_status")
+            with b_col2:
+                bulk_comment = st.text_input("👨‍💼 主管留言 (留空則保留原留言)", key="cp_bulk_comment")
+            with b_col3:
+                st.write("")
+                if st.button("💾 全部更新", key="cp_bulk_update", use_container_width=True):
+                    updates = []
+                    for ev in df_display.to_dict('records'):
+                        update = {
+                            # [Fix] ORIGINAL string from GAS for an exact timestamp match
+                            'timestamp': ev.get('timestamp_orig', ev['timestamp'].strftime('%Y-%m-%d %H:%M:%S')),
+                            'part_no': ev['part_no'],
+                            'apply_all': True, # Whole event (all cavities)
+                            'status': bulk_status
+                        }
+                        if bulk_comment:
+                            # [Fix] Only a typed comment is sent; GAS keeps each row's own comment otherwise
+                            update['manager_comment'] = bulk_comment
+                        updates.append(update)
+                    with st.spinner(f"更新 {len(updates)} 筆事件中..."):
+                        success, results = drive_integration.update_status_bulk(updates)
+                    if success:
+                        st.success(f"已更新 {len(updates)} 筆事件!")
+                        time.sleep(1)
+                        st.rerun(scope="fragment")
+                    elif isinstance(results, str):
+                        st.error(f"更新失敗: {results}")
+                    else:
+                        failed = sum(r.get('status') != "Success" for r in results)
+                        st.warning(f"{failed} 筆事件更新失敗 (找不到資料列)，其餘已更新")
+
+    for row in page_rows.to_dict('records'):
+        # Multi-cavity group (precomputed in the event table)
+        cavity_count = int(row['cavity_count'])
+        is_multi = cavity_count > 1
+
+        stat_color = "red"; stat_icon = "🔴"
+        if row['status'] == "審核中": stat_color = "orange"; stat_icon = "🟡"
+        elif row['status'] in ["結案", "Closed", "無異常"]: stat_color = "green"; stat_icon = "🟢"
+
+        # Display Title
+        part_display = row['part_no']
+        # [Feature] Show Part Name in Title
+        part_name_cp = part_name_map_cp.get(row['part_no'], "")
+        if not part_name_cp:
+             part_name_cp = part_index.part_name(row['part_no'])
+
+        if part_name_cp:
+             part_display = f"{part_display} | {part_name_cp}"
+
+        if is_multi:
+            base_part = row['part_no'].split('_')[0]
+            part_display = f"{base_part} (共{cavity_count}穴) | {part_name_cp}"
+
+        u_key = f"{row['timestamp']}_{row['part_no']}"
+        # [Perf] Lazy expansion: the event body (and its form widgets) is only built while open
+        event_box = st.expander(
+            f"{stat_icon} :{stat_color}[{row['status']}] {row['timestamp'].strftime('%Y-%m-%d %H:%M')} - {row['model']} {part_display}",
+            key=f"cp_open_{u_key}", on_change="rerun"
+        )
+        if not event_box.open:
+            continue
+        with event_box:
+            c1, c2 = st.columns([2, 1])
+            with c1:
+
+                st.markdown(f"**變化點內容:**")
+                st.error(row['change_point'])
+
+                # [Feature] Show Action Taken
+                st.markdown(f"**執行對策說明:**")
+                act_taken = row.get('action_taken')
+                if act_taken and str(act_taken).strip():
+                     st.info(act_taken)
+                else:
+                     st.caption("無對策說明")
+
+                st.caption(f"巡檢結果: {row['result']}")
+            with c2:
+                # [User Request] Removed Product Schematic Image
+                # prod_img_path = f"quality_images/{row['part_no']}_main.jpg"
+                # if check_image_availability(prod_img_path): st.image(prod_img_path, width=120, caption="產品示意圖")
+
+                img_urls = drive_integration.image_links(row.get('image', ''))
+                for n, img_url in enumerate(img_urls, start=1):
+                     st.markdown(f"📸 [查看巡檢照片{n if len(img_urls) > 1 else ''}]({img_url})")
+
+            st.divider()
+
+            # Manager Actions
+            m_col1, m_col2, m_col3 = st.columns([1, 2, 1])
+
+            with m_col1:
+                current_stat = row.get('status', '未審核')
+                if not current_stat: current_stat = '未審核'
+                target_index = 0
+                opts = ["未審核", "審核中", "結案", "無異常"]
+                if current_stat in opts: target_index = opts.index(current_stat)
+                new_status = st.selectbox("審核狀態", opts, index=target_index, key=f"stat_{u_key}")
+
+            with m_col2:
+                 # [Feature] Change Point Description (Editable) - REMOVED per user request
+                 current_cp_desc = row.get('change_point', '')
+                 if pd.isna(current_cp_desc): current_cp_desc = ""
+                 # new_cp_desc = st.text_input("異常內容 / 變化點", value=str(current_cp_desc), key=f"cp_{u_key}")
+
+                 # [Feature] Manager Comment
+                 current_comment = row.get('manager_comment', '')
+                 if pd.isna(current_comment): current_comment = ""
+                 new_comment = st.text_area("👨‍💼 主管留言 / 處理對策", value=str(current_comment), height=100, key=f"comm_{u_key}")
+
+                 # [Feature] Batch Update Checkbox
+                 batch_label = "同步更新同批次 (一模多穴)"
+                 if is_multi: batch_label += f" [偵測到 {cavity_count} 筆關聯資料]"
+
+                 apply_batch = st.checkbox(batch_label, value=True, key=f"batch_{u_key}")
+
+            with m_col3:
+                st.write("") 
+                if st.button("💾 更新", key=f"btn_upd_{u_key}", use_container_width=True):
+                    # [Fix] Use ORIGINAL string from GAS to ensure exact match (handle '9:00' vs '09:00')
+                    ts_str_for_api = row.get('timestamp_orig', row['timestamp'].strftime('%Y-%m-%d %H:%M:%S'))
+                    target_part = row['part_no']
+                    with st.spinner("更新中..."):
+                        success, msg = drive_integration.update_status_v2(
+                            ts_str_for_api, 
+                            new_status, 
+                            new_comment, 
+                            target_part, 
+                            apply_batch,
+                            current_cp_desc # Pass UNCHANGED Content
+                        )
+                        if success:
+                            st.success("更新成功!")
+                            time.sleep(1)
+                            st.rerun(scope="fragment")
+                        else:
+                            st.error(f"更新失敗: {msg}")
+
+
 if mode == "📝 巡檢輸入":
     # --- Session State Management ---
     if 'inspection_started' not in st.session_state:
@@ -376,7 +1759,7 @@ if mode == "📝 巡檢輸入":
 
         # Apply Part Filter to Grid Data
         if selected_part_filter != "全部":
-            filtered_df = model_filtered_df[model_filtered_df['品番'] == selected_part_filter]
+            filtered_df = data_manager.get_filtered_data(df, car_model=selected_model_landing, part_number=selected_part_filter)
         else:
             filtered_df = model_filtered_df
         
@@ -406,8 +1789,8 @@ if mode == "📝 巡檢輸入":
                     if pd.notna(img_name) and str(img_name).strip():
                         img_path = os.path.join("quality_images", str(img_name).strip())
                         # [Fix] Resize image to prevent vertical images from taking too much space
-                        # Use 4:3 ratio (e.g. 800x600) to keep size consistent with landscape
-                        display_img = load_and_resize_image_v2(img_path, target_size=(800, 600))
+                        # Use 4:3 ratio to keep size consistent with landscape (pre-sized thumbnail from disk cache)
+                        display_img = thumbnails.get_thumbnail(img_path, thumbnails.GRID_SIZE)
                         
                         if display_img:
                             st.image(display_img, use_container_width=True)
@@ -451,77 +1834,15 @@ if mode == "📝 巡檢輸入":
             st.markdown(f"### 巡檢: {selected_model} - {selected_part_no}")
 
         # --- Re-fetch Data for Form ---
-        filtered_df = data_manager.get_filtered_data(df, car_model=selected_model)
         # Ensure we get the specific part
-        current_part_data = filtered_df[filtered_df['品番'] == selected_part_no].iloc[0]
-
-        # --- Pre-process Dual Mode Logic ---
-        # [Feature] Custom Cavity Labeling & Dual Mode Enforcement
-        cavity_config = str(current_part_data.get('穴號顯示', '')).strip()
-        force_dual = cavity_config in ['1/2', '1,2', '#1/#2']
-
-        raw_weight_clean = current_part_data['clean_重量']
-        is_dual = isinstance(raw_weight_clean, list) or force_dual
-
-        # If forced dual but weight is scalar, duplicate it for both cavities
-        if is_dual and not isinstance(raw_weight_clean, list):
-             raw_weight_clean = [raw_weight_clean, raw_weight_clean]
-
-        # Helper to get specific limit (Left/Right) or shared limit
-        def get_spec_val(col_name, idx):
-            val = current_part_data.get(col_name)
-            if isinstance(val, list):
-                return val[idx] if idx < len(val) else None
-            return val
-
-        # Prepare Specifications for 1 or 2 items
-        specs = [] # List of dicts: {suffix, label, std, max, min, len_std, len_max, len_min ...}
-        
-        label_1, label_2 = " (右/R)", " (左/L)" # Default
-        header_1, header_2 = "R", "L" # Default headers
-        suffix_1, suffix_2 = "_R", "_L" # Default suffixes for R/L
-
-        if cavity_config in ['1/2', '1,2', '#1/#2']:
-             label_1, label_2 = " (#1)", " (#2)"
-             header_1, header_2 = "#1", "#2"
-             suffix_1, suffix_2 = "_1", "_2"
-
-        if is_dual:
-            specs.append({
-                "suffix": suffix_1, 
-                "label": label_1,
-                "header": header_1,
-                "std": raw_weight_clean[0], 
-                "max": get_spec_val('clean_重量上限', 0),
-                "min": get_spec_val('clean_重量下限', 0),
-                "len_std": get_spec_val('clean_標準長度', 0),
-                "len_max": get_spec_val('clean_長度上限', 0),
-                "len_min": get_spec_val('clean_長度下限', 0)
-            })
-            specs.append({
-                "suffix": suffix_2, 
-                "label": label_2, 
-                "header": header_2,
-                "std": raw_weight_clean[1], 
-                "max": get_spec_val('clean_重量上限', 1),
-                "min": get_spec_val('clean_重量下限', 1),
-                "len_std": get_spec_val('clean_標準長度', 1),
-                "len_max": get_spec_val('clean_長度上限', 1),
-                "len_min": get_spec_val('clean_長度下限', 1)
-            })
-        else:
-            specs.append({
-                "suffix": "", "label": "", "header": "",
-                "std": raw_weight_clean,
-                "max": current_part_data.get('clean_重量上限'),
-                "min": current_part_data.get('clean_重量下限'),
-                "len_std": current_part_data.get('clean_標準長度'),
-                "len_max": current_part_data.get('clean_長度上限'),
-                "len_min": current_part_data.get('clean_長度下限')
-            })
+        current_part_data = part_index.first(selected_part_no, car_model=selected_model)
 
+        # --- Cavity Specs (compiled once per parts-master load, see part_specs.py) ---
+        # [Feature] Custom Cavity Labeling & Dual Mode Enforcement: one CavitySpec per cavity
+        # (suffix, label, header, std, max, min, len_std, len_max, len_min)
+        part_spec = data_manager.load_part_specs().get(selected_part_no, model=selected_model)
+        specs = part_spec.cavities
 
-        
         # [3] Product Image (Standard) - KEEPING as per user habit
         product_img_filename = current_part_data.get('產品圖片')
         if pd.notna(product_img_filename) and str(product_img_filename).strip():
@@ -534,7 +1855,7 @@ if mode == "📝 巡檢輸入":
                     c1, c2, c3 = st.columns([1, 2, 1])
                     with c2:
                         # [Fix] Resize to 4:3 ratio to avoid vertical images taking too much space
-                        display_img = load_and_resize_image_v2(valid_img_path, target_size=(800, 600))
+                        display_img = thumbnails.get_thumbnail(valid_img_path, thumbnails.DETAIL_SIZE)
                         if display_img:
                              st.image(display_img, caption=f"標準圖: {product_img_filename}", use_container_width=True)
                         else:
@@ -574,602 +1895,13 @@ if mode == "📝 巡檢輸入":
         tab1, tab2, tab3 = st.tabs(["📝 輸入作業", "🛡️ 該品變化點", "📊 趨勢與履歷"])
 
         with tab1:
-            # [Design] Removed spacer for cleaner/tighter layout "盡量簡單"
-            
-            # [1] Inputs & Operation
-            # [Feature] Work Mode Selector
-            mode_cols = st.columns([2, 1])
-            with mode_cols[0]:
-                 work_mode = st.radio("作業模式", ["📏 標準巡檢 (量測+異常)", "⚡ 僅記錄變化點"], horizontal=True)
-            quick_log_mode = (work_mode == "⚡ 僅記錄變化點")
-            
-            if quick_log_mode:
-                st.info("ℹ️ 快速模式：將自動填入標準值，僅需記錄異常。")
-                inspection_type = "變更點 (CP)"
-            else:
-                inspection_type = st.radio("巡檢階段", ["首件", "中件", "末件"], horizontal=True)
-
-            # --- Material Check (Moved to Top) ---
-            if not quick_log_mode:
-                mat_name = current_part_data.get('原料名稱')
-                if pd.isna(mat_name) or str(mat_name).strip() == "":
-                    mat_name = current_part_data.get('原料編號', 'N/A')
-                
-                # Combined Label (No Header)
-                material_check = st.radio(f"原料確認 (標準: {mat_name})", ["OK", "NG"], horizontal=True, index=0, key=f"mat_check_radio_{st.session_state['uploader_id']}")
-                
-                # Validation Logic handled at Submit
-                material_ok = (material_check == "OK")
-            else:
-                material_ok = True # Auto pass in Quick Mode
-
-            st.divider()
-
-            user_inputs = {}
-            # Input Loop
-            for idx, sp in enumerate(specs):
-                # [UI Polish] Clean Input Layout
-                with st.container():
-                    # Header for the specific cavity
-                    # [UI Polish] Hide header if single cavity (User Request: "單穴" is ugly)
-                    if sp['suffix']:
-                        # [User Request] Header: PartNo + " " + Suffix (Map _1/_2 to R/L or #1/#2)
-                        display_suffix = sp.get('header', sp['suffix'])
-                        if not display_suffix: # Fallback
-                             display_suffix = "R" if sp['suffix'] == "_1" else "L"
-                        
-                        st.markdown(f"#### {selected_part_no} {display_suffix}")
-                    
-                    # Check if Length Spec exists (Robust)
-                    len_std_val = sp.get('len_std')
-                    has_len_spec = (len_std_val is not None) and (str(len_std_val).lower() != 'nan') and (str(len_std_val).strip() != '')
-
-                    if has_len_spec:
-                        c1, c2 = st.columns(2)
-                    else:
-                        c1 = st.container()
-                        c2 = None
-
-                    # Helper for robust formatting
-                    def safe_fmt(val):
-                        if isinstance(val, (list, tuple)):
-                            val = val[0] if len(val) > 0 else None
-                            
-                        if isinstance(val, (float, int)):
-                            return f"{val:g}"
-                        return str(val)
-
-                    with c1:
-                        # Weight Input
-                        w_std_val = sp.get('std', '-')
-                        w_min = sp.get('min', '-')
-                        w_max = sp.get('max', '-')
-                        
-                        w_label_extra = ""
-                        if w_std_val != '-':
-                             w_str = safe_fmt(w_std_val)
-                             w_label_extra += f" [Std: {w_str}"
-                             if w_min != '-' and w_max != '-':
-                                 w_label_extra += f" | {safe_fmt(w_min)}~{safe_fmt(w_max)}"
-                             w_label_extra += "]"
-
-                        w_label = f"重量 (g){w_label_extra}"
-                        
-                        if quick_log_mode:
-                             w_input = 0.0
-                        else:
-                             w_input = st.number_input(
-                                w_label,
-                                min_value=0.0,
-                                max_value=10000.0,
-                                step=0.01,
-                                format="%.2f",
-                                key=f"w_in_{idx}_{st.session_state['uploader_id']}",
-                                value=None  # [Fix] Default to Empty
-                            )
-
-                    l_input = None
-                    if has_len_spec and c2:
-                        with c2:
-                            # Length Input
-                            l_label = "長度 (mm)"
-                            l_min = sp.get('len_min')
-                            l_max = sp.get('len_max')
-                             
-                            l_str = safe_fmt(len_std_val)
-                            l_extra = f" [Std: {l_str}"
-                            if l_min is not None and l_max is not None:
-                                  l_extra += f" | {safe_fmt(l_min)}~{safe_fmt(l_max)}"
-                            l_extra += "]"
-                            l_label += l_extra
-                            
-                            if quick_log_mode:
-                                l_input = 0.0
-                            else:
-                                l_input = st.number_input(
-                                    l_label,
-                                    min_value=0.0,
-                                    max_value=5000.0,
-                                    step=0.01,
-                                    format="%.2f",
-                                    key=f"l_in_{idx}_{st.session_state['uploader_id']}",
-                                    value=None
-                                )
-
-                    user_inputs[idx] = {'weight': w_input, 'length': l_input}
-
-                    # Validation Msg
-                    if w_input is not None and w_input > 0:
-                         if sp['min'] is not None and sp['max'] is not None:
-                             if not (sp['min'] <= w_input <= sp['max']):
-                                 st.error(f"⚠️ 重量 NG")
-                             else:
-                                 st.success("重量 OK")
-                    
-                    if l_input is not None and l_input > 0 and has_len_spec:
-                          if sp['len_min'] is not None and sp['len_max'] is not None:
-                               if not (sp['len_min'] <= l_input <= sp['len_max']):
-                                   st.error(f"⚠️ 長度 NG")
-                               else:
-                                   st.success("長度 OK")
-                    
-                    st.divider()
-
-            # Material Check (Moved to Top)
-            # Placeholder for deleted block
-
-            st.markdown("##### 📝 變化點說明")
-            
-            # [Design] Simplified to Checkbox
-            is_issue = st.checkbox("⚠️ 回報異常 (Report Issue)", value=quick_log_mode, key=f"issue_checkbox_{st.session_state['uploader_id']}")
-            
-            change_point = ""
-            action_taken = "" # [Feature] New Field
-            if is_issue:
-                change_point = st.text_area("請輸入異常說明", placeholder="例如: 模具損傷、原料更換...", height=100, key=f"cp_input_{st.session_state['uploader_id']}")
-                action_taken = st.text_area("執行對策說明 (Action Taken)", placeholder="例如: 已更換模具、調整參數...", height=100, key=f"action_input_{st.session_state['uploader_id']}")
-                if not change_point.strip():
-                    st.caption("⚠️ 請輸入說明，若空白將視為無異常")
-            else:
-                if not quick_log_mode:
-                    st.markdown("<span style='color: #888; font-size: 0.9em;'>✅ 無變化點 (Standard)</span>", unsafe_allow_html=True)
-
-            # Photo Input
-            input_method = st.radio("影像輸入", ["📸 網頁相機", "📂 上傳照片"], index=1, horizontal=True)
-            img_files = []
-            if input_method == "📸 網頁相機":
-                cam_file = st.camera_input("拍照", key=f"cam_input_{st.session_state['uploader_id']}")
-                if cam_file: img_files = [cam_file]
-            else:
-                uploaded_files = st.file_uploader("上傳照片", type=["jpg", "png", "heic", "heif"], accept_multiple_files=True, key=f"file_uploader_{st.session_state['uploader_id']}")
-                if uploaded_files: img_files = uploaded_files
-
-            # --- Submit Button ---
-            submit_btn = st.button("🚀 提交巡檢報告", use_container_width=True)
-            
-            if submit_btn:
-                any_missing_weight = False
-                if not quick_log_mode:
-                     any_missing_weight = any(user_inputs[i]['weight'] is None for i in user_inputs)
-
-                if (any_missing_weight) and not quick_log_mode:
-                    st.warning("⚠️ 請填寫所有重量數據 (Quick Mode 可跳過)")
-                elif not material_ok:
-                    st.error("❌ 原料狀態異常，請復歸後再提交")
-                else:
-                    with st.spinner("資料上傳中 (Uploading)..."):
-                        try:
-                            # [Fix] Force Asia/Taipei Time for Upload
-                            import pytz
-                            tz_tw = pytz.timezone('Asia/Taipei')
-                            timestamp_str = datetime.datetime.now(tz_tw).strftime("%Y-%m-%d %H:%M:%S")
-                            success_count = 0
-                            
-                            # Log Logic: One row per spec (L/R)
-                            for idx, sp in enumerate(specs):
-                                u_in = user_inputs[idx]
-                                
-                                # Prepare inputs
-                                final_weight = u_in['weight'] if u_in['weight'] is not None else 0.0 # Convert None to 0.0 for backend if needed, or handle as None?
-                                # GAS expects a value. If None, send empty string or 0? 
-                                # Current logic: weight column in sheet is number. 
-                                # If quick mode, weight is 0. If normal mode, we ensured it is not None.
-                                if final_weight is None: final_weight = 0.0
-                                
-                                final_len = u_in['length'] if u_in['length'] is not None else ""
-                                
-                                # Status Determination
-                                final_res = "PASS"
-                                if quick_log_mode:
-                                     final_res = "CP" # Change Point
-                                else:
-                                     # Weight Check
-                                     if sp['min'] is not None and sp['max'] is not None:
-                                         if not (sp['min'] <= final_weight <= sp['max']): final_res = "NG"
-                                     # Length Check
-                                     if sp['len_min'] is not None and sp['len_max'] is not None and final_len != "":
-                                         if not (sp['len_min'] <= final_len <= sp['len_max']): final_res = "NG"
-                                
-                                # CP Status for Manager
-                                initial_status = "未審核" if change_point.strip() else "無異常"
-
-                                row_data = {
-                                    "timestamp": timestamp_str,
-                                    "model": selected_model,
-                                    "part_no": f"{selected_part_no}{sp['suffix']}",
-                                    "part_name": current_part_data.get('品名', ''),
-                                    "inspection_type": inspection_type,
-                                    "material_ok": "OK" if material_ok else "NG", # Fix: Key must match GAS expectation
-                                    "weight": final_weight,
-                                    "width": "", 
-                                    "length": final_len,
-                                    "result": final_res,
-                                    "change_point": change_point, # [Fix] Log CP for ALL parts in batch, not just the first one
-                                    "action_taken": action_taken, # [Feature] New Field
-                                    "status": initial_status,
-                                    "manager_comment": ""
-                                }
-                                
-                                # Fix: Correct argument order for upload_and_append
-                                # Signature: (image_file, filename, row_data)
-                                current_img = None
-                                img_filename = ""
-                                
-                                if idx == 0 and img_files:
-                                    current_img = img_files[0]
-                                    # Safe filename: PartNo_Timestamp.jpg
-                                    safe_ts = row_data['timestamp'].replace(":", "").replace(" ", "_")
-                                    img_filename = f"{row_data['part_no']}_{safe_ts}.jpg"
-
-                                ok = drive_integration.upload_and_append(current_img, img_filename, row_data)
-                                if ok: success_count += 1
-                                
-                            if success_count == len(specs):
-                                st.success("✅ 提交成功!")
-                                st.balloons()
-                                drive_integration.fetch_history.clear()
-                                drive_integration.fetch_all_data.clear()
-                                time.sleep(1)
-                                
-                                # [Fix] Stay on page (User Request) and Clear Inputs
-                                # 1. Clear OLD keys to prevent session state bloat (Optional but good)
-                                # Since we increment uploader_id, the new widgets will have new keys.
-                                # We can just delete keys ending with the CURRENT ID before incrementing.
-                                current_uid_suffix = f"_{st.session_state['uploader_id']}"
-                                keys_to_clear = [k for k in st.session_state.keys() if str(k).endswith(current_uid_suffix)]
-                                for k in keys_to_clear:
-                                    del st.session_state[k]
-                                
-                                # 2. Reset Uploaders by incrementing dynamic ID
-                                st.session_state['uploader_id'] += 1
-                                
-                                # st.session_state['inspection_started'] = False # Removed to stay on page
-                                st.session_state['inspection_started'] = True
-                                st.rerun()
-                            else:
-                                st.error("部份資料上傳失敗，請重試")
-                                
-                        except Exception as e:
-                            st.error(f"系統錯誤: {str(e)}")
+            render_inspection_form(selected_model, selected_part_no, current_part_data, specs)
 
         with tab2:
-            st.subheader(f"🛡️ {selected_part_no} - 變化點記錄")
-            
-            # Fetch and Organize History
-            target_suffixes = [s['suffix'] for s in specs]
-            all_cp_rows = []
-            
-            for s in specs:
-                h_target = f"{selected_part_no}{s['suffix']}"
-                h_data = drive_integration.fetch_history(h_target)
-                
-                # [Debug] Show query status
-                # st.caption(f"🔍 Debug: Querying '{h_target}'... Found {len(h_data) if h_data else 0} records")
-                
-                if h_data:
-                    for r in h_data:
-                        r['part_no'] = h_target # Ensure key
-                        all_cp_rows.append(r)
-            
-            if all_cp_rows:
-                df_local_cp = pd.DataFrame(all_cp_rows)
-                
-                # Filter useful CP
-                if 'change_point' in df_local_cp.columns:
-                    df_local_cp = df_local_cp[df_local_cp['change_point'].ne("") & df_local_cp['change_point'].notna()]
-                
-                if 'timestamp' in df_local_cp.columns:
-                    # [Fix] Force conversion to Taipei Time
-                    if pd.api.types.is_datetime64_any_dtype(df_local_cp['timestamp']):
-                         df_local_cp['timestamp'] = df_local_cp['timestamp'].dt.tz_localize('Asia/Taipei') if df_local_cp['timestamp'].dt.tz is None else df_local_cp['timestamp'].dt.tz_convert('Asia/Taipei')
-                    else:
-                         df_local_cp['timestamp'] = pd.to_datetime(df_local_cp['timestamp'], errors='coerce')
-                         if df_local_cp['timestamp'].dt.tz is None:
-                              df_local_cp['timestamp'] = df_local_cp['timestamp'].dt.tz_localize('Asia/Taipei')
-                         else:
-                              df_local_cp['timestamp'] = df_local_cp['timestamp'].dt.tz_convert('Asia/Taipei')
-                    df_local_cp = df_local_cp.sort_values(by='timestamp', ascending=False)
-                
-                # Split Open / Closed
-                if 'status' not in df_local_cp.columns: df_local_cp['status'] = '未審核'
-                df_local_cp['status'] = df_local_cp['status'].fillna("未審核")
-                
-                open_issues = df_local_cp[~df_local_cp['status'].isin(["結案", "Closed", "無異常"])]
-                closed_issues = df_local_cp[df_local_cp['status'].isin(["結案", "Closed", "無異常"])]
-                
-                # 1. Open Issues Section
-                if not open_issues.empty:
-                    # Group by timestamp AND change_point to deduplicate same event on multiple cavities
-                    grouped_open = open_issues.groupby(['timestamp', 'change_point'], sort=False)
-                    unique_open_count = len(grouped_open)
-                    
-                    st.error(f"⚠️ 尚有 {unique_open_count} 筆未結案異常！")
-                    
-                    for (ts, cp), group in grouped_open:
-                        cavity_count = len(group)
-                        
-                        # Find best row
-                        best_row = group.iloc[0]
-                        rows_with_cmt = group[group['manager_comment'].astype(str).str.strip() != ""]
-                        if not rows_with_cmt.empty:
-                            best_row = rows_with_cmt.iloc[0]
-
-                        row = best_row
-                        stat = row.get('status', '未審核')
-                        s_icon = "🔴" if stat == "未審核" else "🟡"
-                        ts_str = row['timestamp'].strftime('%Y-%m-%d %H:%M') if pd.notna(row['timestamp']) else "N/A"
-                        
-                        part_display = row.get('part_no')
-                        if cavity_count > 1:
-                            part_display = f"{str(part_display).split('_')[0]} (共{cavity_count}穴)"
-
-                        st.markdown(f"#### {s_icon} [{stat}] {cp}")
-                        st.caption(f"📅 {ts_str} | Part: {part_display}")
-                        
-                        # Manager Comment
-                        # [Feature] Show Action Taken
-                        act_taken = row.get('action_taken')
-                        if pd.notna(act_taken) and str(act_taken).strip():
-                             st.info(f"🔧 對策: {str(act_taken).strip()}")
-
-                        # Manager Comment
-                        mgr_cmt = row.get('manager_comment')
-                        if pd.notna(mgr_cmt) and str(mgr_cmt).strip():
-                            st.caption(f"👨‍💼 主管: {str(mgr_cmt).strip()}")
-                            
-                        # [Feature] Image Link
-                        img_link = None
-                        if 'image' in group.columns:
-                            valid_imgs = group['image'].dropna()
-                            valid_imgs = valid_imgs[valid_imgs != ""]
-                            if not valid_imgs.empty:
-                                img_link = valid_imgs.iloc[0]
-                        
-                        if img_link:
-                            st.markdown(f"[📸 查看照片]({img_link})")
-                            
-                        st.divider()
-                else:
-                    st.success("✅ 目前無未結案異常")
-
-                # 2. History Section
-                st.subheader("📜 歷史記錄 (已結案)")
-                if not closed_issues.empty:
-                    with st.expander("查看已結案記錄", expanded=False):
-                        grouped_closed = closed_issues.groupby(['timestamp', 'change_point'], sort=False)
-                        for (ts, cp), group in grouped_closed:
-                            row = group.iloc[0]
-                            cavity_count = len(group)
-                            
-                            stat = row.get('status', '結案')
-                            ts_str = row['timestamp'].strftime('%Y-%m-%d') if pd.notna(row['timestamp']) else "N/A"
-                            
-                            part_display = row.get('part_no')
-                            if cavity_count > 1:
-                                part_display = f"{str(part_display).split('_')[0]} (共{cavity_count}穴)"
-                                
-                            st.markdown(f"🟢 **{cp}**")
-                            st.caption(f"[{stat}] {ts_str} | {part_display}")
-                            
-                            # [Feature] Show Action Taken
-                            act_taken = row.get('action_taken')
-                            if pd.notna(act_taken) and str(act_taken).strip():
-                                 st.caption(f"🔧 對策: {str(act_taken).strip()}")
-
-                            mgr_cmt = row.get('manager_comment')
-                            if pd.notna(mgr_cmt) and str(mgr_cmt).strip():
-                                st.caption(f"👨‍💼 主管: {str(mgr_cmt).strip()}")
-                                
-                            # [Feature] Image Link
-                            img_link = None
-                            if 'image' in group.columns:
-                                valid_imgs = group['image'].dropna()
-                                valid_imgs = valid_imgs[valid_imgs != ""]
-                                if not valid_imgs.empty:
-                                    img_link = valid_imgs.iloc[0]
-                            
-                            if img_link:
-                                st.caption(f"[📸 查看照片]({img_link})")
-                                
-                            st.divider()
-                else:
-                    st.caption("無已結案記錄")
-            else:
-                st.info("無歷史記錄")
-                        
-            
-
-
+            render_part_change_points(selected_part_no, specs)
 
         with tab3:
-            st.subheader(f"📊 {selected_part_no} - 趨勢與履歷")
-            
-            # [Trend Chart Logic]
-            chart_cols = st.columns(len(specs))
-            
-            for idx, sp in enumerate(specs):
-                with chart_cols[idx]:
-                    chart_title = f"{selected_part_no}{sp['label']}"
-                    suffix = sp['suffix']
-                    history_target_no = f"{selected_part_no}{suffix}"
-                    
-                    st.markdown(f"**{chart_title}**")
-                    
-                    # Fetch
-                    history_data = drive_integration.fetch_history(history_target_no)
-                    
-                    # [Debug] Check data
-                    valid_chart_data = False
-                    if history_data:
-                        chart_df = pd.DataFrame(history_data)
-                        
-                        # Data Cleaning
-                        if 'weight' in chart_df.columns and 'timestamp' in chart_df.columns:
-                            chart_df['weight'] = pd.to_numeric(chart_df['weight'], errors='coerce')
-                            chart_df['timestamp'] = pd.to_datetime(chart_df['timestamp'], errors='coerce')
-                            chart_df = chart_df.dropna(subset=['weight', 'timestamp'])
-                            
-                            # Filter: Only show real measurements (>0)
-                            chart_df = chart_df[chart_df['weight'] > 0]
-                            
-                            if not chart_df.empty:
-                                valid_chart_data = True
-                                
-                                # Add Limits
-                                w_max_limit = sp['max']
-                                w_min_limit = sp['min']
-                                
-                                # [Fix] Handle list limits (extract first valid)
-                                if isinstance(w_max_limit, list): 
-                                    w_max_limit = w_max_limit[0] if w_max_limit else None
-                                if isinstance(w_min_limit, list):
-                                    w_min_limit = w_min_limit[0] if w_min_limit else None
-
-                                y_cols = ['weight']
-                                if w_max_limit is not None:
-                                    try:
-                                        chart_df['Limit H'] = float(w_max_limit)
-                                        y_cols.append('Limit H')
-                                    except: pass # Skip if invalid
-                                if w_min_limit is not None:
-                                    try:
-                                        chart_df['Limit L'] = float(w_min_limit)
-                                        y_cols.append('Limit L')
-                                    except: pass
-                                
-                                # Convert to Local Time for Display
-                                # [Fix] Source is Taipei Time string -> Localize to Taipei directly
-                                # Convert to Local Time for Display
-                                # [Fix] Source is Taipei Time string -> Localize to Taipei directly
-                                if chart_df['timestamp'].dt.tz is None:
-                                     chart_df['timestamp'] = chart_df['timestamp'].dt.tz_localize('Asia/Taipei')
-                                else:
-                                     chart_df['timestamp'] = chart_df['timestamp'].dt.tz_convert('Asia/Taipei')
-                                
-                                # [Fix] Sort Newest -> Oldest for Data View
-                                chart_df = chart_df.sort_values(by='timestamp', ascending=False)
-                                
-                                chart_long = chart_df.melt('timestamp', value_vars=y_cols, var_name='MetricType', value_name='Value')
-                                
-                                # Scaling
-                                y_min_val = chart_long['Value'].min()
-                                y_max_val = chart_long['Value'].max()
-                                padding = (y_max_val - y_min_val) * 0.2 if y_max_val != y_min_val else 1.0
-                                
-                                color_domain = ['Limit H', 'Limit L', 'weight']
-                                color_range = ['#FF6C6C', '#FF6C6C', '#457B9D'] 
-                                
-                                base = alt.Chart(chart_long).encode(
-                                    x=alt.X('timestamp', title=None, axis=alt.Axis(format='%m/%d', ticks=False)),
-                                    y=alt.Y('Value', title='g', scale=alt.Scale(domain=[y_min_val - padding, y_max_val + padding])),
-                                    color=alt.Color('MetricType', legend=None, scale=alt.Scale(domain=color_domain, range=color_range)),
-                                    order='timestamp', # [Fix] Ensure lines connect chronologically even if data is sorted Descending
-                                    tooltip=['timestamp', 'Value', 'MetricType']
-                                )
-                                
-                                line_w = base.transform_filter(alt.datum.MetricType == 'weight').mark_line(strokeWidth=3, point=True)
-                                line_limits = base.transform_filter((alt.datum.MetricType == 'Limit H') | (alt.datum.MetricType == 'Limit L')).mark_line(strokeDash=[5, 5], opacity=0.8)
-
-                                st.altair_chart((line_w + line_limits).interactive(), use_container_width=True)
-                    
-                    # [Feature] Length Chart for Inspection Page
-                    if history_data:
-                        chart_df_len = pd.DataFrame(history_data)
-                        if 'length' in chart_df_len.columns:
-                             # Convert
-                             chart_df_len['length'] = pd.to_numeric(chart_df_len['length'], errors='coerce')
-                             chart_df_len['timestamp'] = pd.to_datetime(chart_df_len['timestamp'], errors='coerce')
-                             chart_df_len = chart_df_len.dropna(subset=['length', 'timestamp'])
-                             chart_df_len = chart_df_len[chart_df_len['length'] > 0]
-                             
-                             if not chart_df_len.empty:
-                                 # Convert Time
-                                 if chart_df_len['timestamp'].dt.tz is None:
-                                     chart_df_len['timestamp'] = chart_df_len['timestamp'].dt.tz_localize('Asia/Taipei')
-                                 else:
-                                     chart_df_len['timestamp'] = chart_df_len['timestamp'].dt.tz_convert('Asia/Taipei')
-
-                                 # Limits
-                                 l_max_limit = sp.get('len_max')
-                                 l_min_limit = sp.get('len_min')
-                                 y_cols_l = ['length']
-                                 if l_max_limit is not None:
-                                     chart_df_len['Limit H'] = float(l_max_limit)
-                                     y_cols_l.append('Limit H')
-                                 if l_min_limit is not None:
-                                     chart_df_len['Limit L'] = float(l_min_limit)
-                                     y_cols_l.append('Limit L')
-
-                                 st.markdown(f"**📏 長度 ({suffix})**")
-                                 chart_long_l = chart_df_len.melt('timestamp', value_vars=y_cols_l, var_name='MetricType', value_name='Value')
-                                 
-                                 y_min_l = chart_long_l['Value'].min()
-                                 y_max_l = chart_long_l['Value'].max()
-                                 pad_l = (y_max_l - y_min_l) * 0.1 if y_max_l != y_min_l else 1.0
-                                 
-                                 color_domain_l = ['Limit H', 'Limit L', 'length']
-                                 color_range_l = ['#FF6C6C', '#FF6C6C', '#2A9D8F']
-
-                                 base_l = alt.Chart(chart_long_l).encode(
-                                    x=alt.X('timestamp', title=None, axis=alt.Axis(format='%m/%d', ticks=False)),
-                                    y=alt.Y('Value', title='mm', scale=alt.Scale(domain=[y_min_l - pad_l, y_max_l + pad_l])),
-                                    color=alt.Color('MetricType', legend=None, scale=alt.Scale(domain=color_domain_l, range=color_range_l)),
-                                    tooltip=['timestamp', 'Value', 'MetricType']
-                                 )
-                                 line_l = base_l.transform_filter(alt.datum.MetricType == 'length').mark_line(strokeWidth=3, point=True)
-                                 line_limits_l = base_l.transform_filter((alt.datum.MetricType == 'Limit H') | (alt.datum.MetricType == 'Limit L')).mark_line(strokeDash=[5, 5], opacity=0.8)
-                                 st.altair_chart((line_l + line_limits_l).interactive(), use_container_width=True)
-
-                    if not valid_chart_data and (not history_data): # Update info msg criteria
-                         st.info("尚無有效量測數據 (僅顯示重量 > 0 之記錄)")
-            
-            st.divider()
-            
-            # [Defect Images Logic]
-            st.subheader("⚠️ 過去異常履歷 (Reference)")
-            defect_images = []
-            d1 = current_part_data.get('異常履歷寫真')
-            if pd.notna(d1) and str(d1).strip(): defect_images.append(("1", str(d1).strip()))
-            for i in range(2, 4):
-                col = f"異常履歷寫真{i}"
-                val = current_part_data.get(col)
-                if pd.notna(val) and str(val).strip():
-                    defect_images.append((str(i), str(val).strip()))
-
-            if defect_images:
-                dh_cols = st.columns(5)
-                for idx, (label, fname) in enumerate(defect_images):
-                    col_idx = idx % 5
-                    img_path = os.path.join("quality_images", fname)
-                    valid_img_path = check_image_availability(img_path)
-                    
-                    with dh_cols[col_idx]:
-                        if valid_img_path:
-                            st.image(valid_img_path, caption=f"履歷-{label}", use_container_width=True)
-                        else:
-                            st.caption(f"履歷{label} 讀取失敗")
-            else:
-                st.caption("無異常履歷照片")
+            render_part_trends(selected_part_no, specs, current_part_data)
 
 
 elif mode == "📊 數據戰情室":
@@ -1180,373 +1912,19 @@ elif mode == "📊 數據戰情室":
     dash_page = st.sidebar.radio("功能切換", ["📈 重量趨勢追蹤", "🛡️ 變化點管理中心"], key="dash_nav")
 
     with st.spinner("正在連線至總部資料庫，請稍候..."):
-        raw_data = drive_integration.fetch_all_data()
+        # Normalized frame is built once per synced data version (see load_dashboard_frame)
+        df_dash = load_dashboard_frame(drive_integration.data_version())
 
-    if not raw_data:
+    if df_dash.empty:
         st.warning("目前無數據或無法連線至 Google Sheet (請確認 GAS V4 是否部署成功)。")
     else:
-        df_dash = pd.DataFrame(raw_data)
-        
-        # --- Timezone Fix ---
-        if 'timestamp' in df_dash.columns:
-            # [Fix] Keep raw timestamp string for API matching (GAS string comparison is strict)
-            df_dash['timestamp_orig'] = df_dash['timestamp']
-            
-            df_dash['timestamp'] = pd.to_datetime(df_dash['timestamp'], errors='coerce')
-            # Fix: Assume string is already in Local Time, so just localize to Taipei directly
-            if df_dash['timestamp'].dt.tz is None:
-                 df_dash['timestamp'] = df_dash['timestamp'].dt.tz_localize('Asia/Taipei')
-            else:
-                 df_dash['timestamp'] = df_dash['timestamp'].dt.tz_convert('Asia/Taipei')
-
-        # --- Schema Safety Check (Fix for Cache/Legacy Data) ---
-        if 'status' not in df_dash.columns: df_dash['status'] = "未審核"
-        if 'manager_comment' not in df_dash.columns: df_dash['manager_comment'] = ""
-        df_dash['status'] = df_dash['status'].fillna("未審核")
-        df_dash['manager_comment'] = df_dash['manager_comment'].fillna("")
-        if 'change_point' not in df_dash.columns: df_dash['change_point'] = ""
 
         # ==========================================
         # 1. Weight Trend Tracking
         # ==========================================
         if dash_page == "📈 重量趨勢追蹤":
-            # --- Filters ---
-            col_d1, col_d2, col_d3 = st.columns(3)
-            with col_d1:
-                models_dash = ["全部"] + list(df_dash['model'].unique())
-                filter_model = st.selectbox("篩選車型", models_dash)
-            with col_d2:
-                 if filter_model != "全部":
-                     parts_dash = ["全部"] + list(df_dash[df_dash['model'] == filter_model]['part_no'].unique())
-                 else:
-                     parts_dash = ["全部"] + list(df_dash['part_no'].unique())
-                 
-                 # [Fix] Decoupled State for Interaction
-                 # [Fix] Decoupled State for Interaction
-                 if 'dash_target_part' not in st.session_state:
-                     st.session_state['dash_target_part'] = "全部"
-                 
-                 # [Fix] Dynamic Key for Sidebar Widget
-                 if 'dash_ui_rev' not in st.session_state:
-                     st.session_state['dash_ui_rev'] = 0
-                 
-                 # Calculate Index
-                 current_target = st.session_state['dash_target_part']
-                 try:
-                     f_index = parts_dash.index(current_target)
-                 except ValueError:
-                     f_index = 0
-                 
-                 # Render Widget with Dynamic Key
-                 # This forces widget to reset when dash_ui_rev changes
-                 dynamic_key = f"dash_part_ui_{st.session_state['dash_ui_rev']}"
-                 
-                 # [Feature] Show Part Name
-                 part_name_map_dash = {}
-                 if 'part_no' in df_dash.columns and 'part_name' in df_dash.columns:
-                     part_name_map_dash = dict(zip(df_dash['part_no'], df_dash['part_name']))
-                 
-                 def format_func_dash(option):
-                     if option == "全部": return "全部 (All)"
-                     name = part_name_map_dash.get(option, "")
-                     # Fallback to Master Data if available
-                     if (pd.isna(name) or not str(name).strip()) and 'df' in globals():
-                         match = df[df['品番'] == option]
-                         if not match.empty: name = match.iloc[0]['品名']
-                     
-                     if pd.notna(name) and str(name).strip():
-                         return f"{option} | {name}"
-                     return option
-
-                 filter_part_ui = st.selectbox("篩選品番", parts_dash, index=f_index, key=dynamic_key, format_func=format_func_dash)
-                 
-                 # Sync UI -> State (Only if User Changed Sidebar directly)
-                 if filter_part_ui != st.session_state['dash_target_part']:
-                     # Check if change came from user (rev matches) or just init mismatch
-                     # Actually, if user changes manually, we should update state
-                     st.session_state['dash_target_part'] = filter_part_ui
-                     st.rerun()
-                 
-                 filter_part = filter_part_ui # Local var for legacy use below
-                 
-                 # Show small product image if filtered
-                 # [User Request] Remove Image Display
-                 # if filter_part != "全部":
-                 #     img_path = f"quality_images/{filter_part}_main.jpg"
-                 #     if check_image_availability(img_path):
-                 #         st.image(img_path, width=200, caption=filter_part)
-            with col_d3:
-                 results_dash = ["全部"] + list(df_dash['result'].unique())
-                 filter_result = st.selectbox("篩選結果", results_dash)
-            
-            # Apply filters
-            df_view = df_dash.copy()
-            if filter_model != "全部": df_view = df_view[df_view['model'] == filter_model]
-            if filter_part != "全部": df_view = df_view[df_view['part_no'] == filter_part]
-            if filter_result != "全部": df_view = df_view[df_view['result'] == filter_result]
-            
-            # [Filter] Hide Change Point records (Pure CP has weight=0)
-            # [Refactor] Don't filter global view, only filter for Chart
-            if 'weight' in df_view.columns:
-                 df_view['weight'] = pd.to_numeric(df_view['weight'], errors='coerce')
-                 # df_view = df_view[df_view['weight'] > 0] <--- Removed to show CP in Table
-            
-            # [Double Check] Explicitly hide 'CP' result if any leaked
-            if 'result' in df_view.columns:
-                 # df_view = df_view[df_view['result'] != 'CP'] <--- Removed to show CP in Table
-                 pass
-                 
-            # Sort by Newest
-            if 'timestamp' in df_view.columns:
-                 df_view = df_view.sort_values(by='timestamp', ascending=False)
-            
-            # Process Image Links
-            if 'image' in df_view.columns:
-                def make_drive_link(val):
-                    val_str = str(val).strip().replace('"', '').replace("'", "")
-                    if not val_str or val_str.lower() == 'nan': return None
-                    if val_str.startswith('http'): return val_str
-                    return f"https://drive.google.com/file/d/{val_str}/preview"
-                df_view['image'] = df_view['image'].apply(make_drive_link)
-
-            # [View] Revert to showing all columns (User Request)
-            # [View] Interactive Table with Click-to-Filter
-            st.caption(f"📊 搜尋結果：共 {len(df_view)} 筆資料")
-            event = st.dataframe(
-                df_view, 
-                use_container_width=True,
-                column_config={
-                    "image": st.column_config.LinkColumn("巡檢照片", display_text="📸 查看"),
-                    "timestamp": st.column_config.DatetimeColumn("時間", format="MM/DD HH:mm"),
-                    "part_name": st.column_config.TextColumn("品名", width="medium"), # [Feature] Part Name
-                    "part_no": st.column_config.TextColumn("品番", width="medium"),
-                    "weight": st.column_config.NumberColumn("重量 (g)", format="%.2f")
-                },
-                on_select="rerun",
-                selection_mode="single-row",
-                key="dash_table_v42" # [Fix] Bump key to force re-render
-            )
-            
-            # [Interaction] Click Row to View Chart (WITHOUT Filtering Table)
-            if len(event.selection.rows) > 0:
-                s_idx = event.selection.rows[0]
-                if s_idx < len(df_view):
-                    target_p = df_view.iloc[s_idx]['part_no']
-                    # Only update the CHART target, not the FILTER target
-                    if target_p != st.session_state.get('dash_chart_target'):
-                         st.session_state['dash_chart_target'] = target_p
-                         st.rerun()
-
-            if not df_view.empty:
-                st.subheader("📈 重量趨勢圖")
-                
-                # Determine which part to show in chart
-                # Priority: 1. Clicked Row (dash_chart_target) 2. Sidebar Filter (dash_target_part)
-                chart_part = st.session_state.get('dash_chart_target')
-                filter_part_global = st.session_state.get('dash_target_part', '全部')
-                
-                # If sidebar filter changes, it should override/reset the chart selection
-                # (Logic: If I explicitly filter for Part A, I expect to see Part A's chart)
-                if filter_part_global != "全部" and filter_part_global != chart_part:
-                     chart_part = filter_part_global
-                     st.session_state['dash_chart_target'] = chart_part
-
-                if not chart_part or chart_part == "全部":
-                    st.info("👈 請在左側選單選擇單一品番，或在下方表格點選，以查看趨勢圖。")
-                    chart_df = pd.DataFrame()
-                else:
-                    st.caption(f"📊 目前顯示: **{chart_part}** 的趨勢")
-                    chart_df = df_dash[df_dash['part_no'] == chart_part].copy()
-                    # Filter for Chart Only (Hide 0 weight)
-                    if 'weight' in chart_df.columns:
-                        # [Fix] Ensure weight is numeric (float) to avoid TypeError
-                        chart_df['weight'] = pd.to_numeric(chart_df['weight'], errors='coerce')
-                        chart_df = chart_df.dropna(subset=['weight'])
-                        chart_df = chart_df[chart_df['weight'] > 0]
-                
-                if not chart_df.empty:
-                    y_cols = ['weight']
-                    # [Fix] Fuzzy Match for Suffixes (e.g., Part_1, Part_2)
-                    part_spec = df[df['品番'] == chart_part]
-                    if part_spec.empty:
-                        if '_' in chart_part:
-                            base_part_underscore = chart_part.rsplit('_', 1)[0]
-                            part_spec = df[df['品番'] == base_part_underscore]
-                    if part_spec.empty:
-                         base_part_space = chart_part.split(' ')[0]
-                         part_spec = df[df['品番'] == base_part_space]
-                    
-                    if not part_spec.empty:
-                        spec_row = part_spec.iloc[0]
-                        limit_h = spec_row.get('clean_重量上限')
-                        limit_l = spec_row.get('clean_重量下限')
-                        # Determine index based on suffix
-                        spec_idx = 0
-                        # Check for common 2nd cavity suffixes
-                        if str(chart_part).endswith('_L') or str(chart_part).endswith('_2') or str(chart_part).endswith('#2'):
-                            spec_idx = 1
-                        
-                        limit_h = spec_row.get('clean_重量上限')
-                        limit_l = spec_row.get('clean_重量下限')
-                        
-                        # [Fix] Select correct limit based on cavity index
-                        if isinstance(limit_h, list): 
-                            limit_h = limit_h[spec_idx] if len(limit_h) > spec_idx else limit_h[0]
-                        if isinstance(limit_l, list): 
-                            limit_l = limit_l[spec_idx] if len(limit_l) > spec_idx else limit_l[0]
-
-                        if limit_h is not None:
-                            chart_df['Limit H'] = float(limit_h)
-                            y_cols.append('Limit H')
-                        if limit_l is not None:
-                             chart_df['Limit L'] = float(limit_l)
-                             y_cols.append('Limit L')
-
-                    chart_long = chart_df.melt('timestamp', value_vars=y_cols, var_name='MetricType', value_name='Value')
-                    y_min_val = chart_long['Value'].min(); y_max_val = chart_long['Value'].max()
-                    padding = (y_max_val - y_min_val) * 0.1 if y_max_val != y_min_val else 5
-                    
-                    color_domain = ['Limit H', 'Limit L', 'weight']
-                    color_range = ['#FF6C6C', '#FF6C6C', '#457B9D'] 
-                    
-                    base = alt.Chart(chart_long).encode(
-                        x=alt.X('timestamp', title='時間', axis=alt.Axis(format='%m/%d %H:%M')),
-                        y=alt.Y('Value', title='重量 (g)', scale=alt.Scale(domain=[y_min_val - padding, y_max_val + padding])),
-                        color=alt.Color('MetricType', legend=None, scale=alt.Scale(domain=color_domain, range=color_range)),
-                        tooltip=['timestamp', 'Value', 'MetricType']
-                    )
-                    
-                    line_w = base.transform_filter(alt.datum.MetricType == 'weight').mark_line(point=True)
-                    line_limits = base.transform_filter((alt.datum.MetricType == 'Limit H') | (alt.datum.MetricType == 'Limit L')).mark_line(strokeDash=[5, 5], opacity=0.8)
-                    
-                    st.altair_chart((line_w + line_limits).interactive(), use_container_width=True)
-                else:
-                    if filter_part != "全部":
-                        st.info(f"ℹ️ 產品 [{filter_part}] 目前無「重量數據」。(記錄可能均為快速模式/CP，重量=0)")
-                    else:
-                        pass
+            render_weight_trend()
 
-                # [Feature] Length Trend Chart (User Request)
-                # Re-use df_view but filter for Length
-                if filter_part != "全部" and not df_view.empty and 'length' in df_view.columns:
-                     chart_df_len = df_view.copy()
-                     # Convert to numeric
-                     chart_df_len['length'] = pd.to_numeric(chart_df_len['length'], errors='coerce')
-                     chart_df_len = chart_df_len[chart_df_len['length'] > 0]
-                     
-                     if not chart_df_len.empty:
-                          st.subheader("📏 長度趨勢圖")
-                          y_cols_len = ['length']
-                          
-                          # Spec Limits for Length
-                          if filter_part != "全部":
-                                # Re-fetch spec (logic copied from above)
-                                part_spec = df[df['品番'] == filter_part]
-                                if part_spec.empty:
-                                    if '_' in filter_part:
-                                        base_part_underscore = filter_part.rsplit('_', 1)[0]
-                                        part_spec = df[df['品番'] == base_part_underscore]
-                                if part_spec.empty:
-                                     base_part_space = filter_part.split(' ')[0]
-                                     part_spec = df[df['品番'] == base_part_space]
-                                
-                                if not part_spec.empty:
-                                    spec_row = part_spec.iloc[0]
-                                    l_h = spec_row.get('clean_長度上限')
-                                    l_l = spec_row.get('clean_長度下限')
-                                    
-                                    # Describe index again (re-use logic or check filter_part)
-                                    spec_idx_len = 0
-                                    if str(filter_part).endswith('_L') or str(filter_part).endswith('_2') or str(filter_part).endswith('#2'):
-                                        spec_idx_len = 1
-
-                                    if isinstance(l_h, list): 
-                                        l_h = l_h[spec_idx_len] if len(l_h) > spec_idx_len else l_h[0]
-                                    if isinstance(l_l, list): 
-                                        l_l = l_l[spec_idx_len] if len(l_l) > spec_idx_len else l_l[0]
-                                    
-                                    if l_h is not None:
-                                        chart_df_len['Limit H'] = float(l_h)
-                                        y_cols_len.append('Limit H')
-                                    if l_l is not None:
-                                        chart_df_len['Limit L'] = float(l_l)
-                                        y_cols_len.append('Limit L')
-
-                          # Timezone
-                          if chart_df_len['timestamp'].dt.tz is None:
-                               chart_df_len['timestamp'] = chart_df_len['timestamp'].dt.tz_localize('Asia/Taipei')
-                          else:
-                               chart_df_len['timestamp'] = chart_df_len['timestamp'].dt.tz_convert('Asia/Taipei')
-                          
-                          # [Fix] Sort Newest -> Oldest
-                          chart_df_len = chart_df_len.sort_values(by='timestamp', ascending=False)
-
-                          chart_long_len = chart_df_len.melt('timestamp', value_vars=y_cols_len, var_name='MetricType', value_name='Value')
-                          
-                          y_min_l = chart_long_len['Value'].min()
-                          y_max_l = chart_long_len['Value'].max()
-                          pad_l = (y_max_l - y_min_l) * 0.1 if y_max_l != y_min_l else 1.0
-
-                          color_domain_l = ['Limit H', 'Limit L', 'length']
-                          color_range_l = ['#FF6C6C', '#FF6C6C', '#2A9D8F'] # Green for Length
-
-                          base_l = alt.Chart(chart_long_len).encode(
-                                x=alt.X('timestamp', title=None, axis=alt.Axis(format='%m/%d', ticks=False)),
-                                y=alt.Y('Value', title='mm', scale=alt.Scale(domain=[y_min_l - pad_l, y_max_l + pad_l])),
-                                color=alt.Color('MetricType', legend=None, scale=alt.Scale(domain=color_domain_l, range=color_range_l)),
-                                order='timestamp', # [Fix] Ensure chronological lines
-                                tooltip=['timestamp', 'Value', 'MetricType']
-                          )
-
-                          line_l = base_l.transform_filter(alt.datum.MetricType == 'length').mark_line(strokeWidth=3, point=True)
-                          line_limits_l = base_l.transform_filter((alt.datum.MetricType == 'Limit H') | (alt.datum.MetricType == 'Limit L')).mark_line(strokeDash=[5, 5], opacity=0.8)
-                          
-                          st.altair_chart((line_l + line_limits_l).interactive(), use_container_width=True)
-
-                # [Feature] History Table (Sorted Newest First)
-                # Fix NameError: Define history_data and suffix
-                history_data = df_view.to_dict('records') if 'df_view' in locals() and not df_view.empty else []
-                suffix = filter_part if 'filter_part' in locals() and filter_part != "全部" else "全部"
-                
-                if history_data and suffix != "全部":
-                    st.subheader(f"📋 {suffix} 歷史數據列表")
-                    df_hist_table = pd.DataFrame(history_data)
-                    
-                    # Timezone
-                    if 'timestamp' in df_hist_table.columns:
-                        df_hist_table['timestamp'] = pd.to_datetime(df_hist_table['timestamp'], errors='coerce')
-                        if pd.api.types.is_datetime64_any_dtype(df_hist_table['timestamp']):
-                            if df_hist_table['timestamp'].dt.tz is None:
-                                df_hist_table['timestamp'] = df_hist_table['timestamp'].dt.tz_localize('Asia/Taipei')
-                            else:
-                                df_hist_table['timestamp'] = df_hist_table['timestamp'].dt.tz_convert('Asia/Taipei')
-                            df_hist_table = df_hist_table.sort_values(by='timestamp', ascending=False).reset_index(drop=True)
-
-                    # Columns to Show
-                    cols_to_show = ['timestamp', 'weight', 'result']
-                    if 'length' in df_hist_table.columns: cols_to_show.append('length')
-                    if 'change_point' in df_hist_table.columns: cols_to_show.append('change_point')
-                    if 'action_taken' in df_hist_table.columns: cols_to_show.append('action_taken') # [Feature] Show Action Taken
-                    if 'manager_comment' in df_hist_table.columns: cols_to_show.append('manager_comment')
-
-                    # Filter existing cols
-                    cols_to_show = [c for c in cols_to_show if c in df_hist_table.columns]
-                    
-                    st.dataframe(
-                        df_hist_table[cols_to_show],
-                        use_container_width=True,
-                        column_config={
-                            "timestamp": st.column_config.DatetimeColumn("時間", format="MM/DD HH:mm"),
-                            "weight": st.column_config.NumberColumn("重量", format="%.2f"),
-                            "length": st.column_config.NumberColumn("長度", format="%.2f"),
-                            "result": "結果",
-                            "change_point": "變化點",
-                            "action_taken": "執行對策說明", # [Feature] Column Config
-                            "manager_comment": "主管備註"
-                        },
-                        hide_index=True
-                    )
-        
         # [Legacy/Duplicate Code Removed]
         # Previous versions had a fallback block here that caused "Change Point Board" to appear twice.
         # It has been deleted.
@@ -1555,188 +1933,21 @@ elif mode == "📊 數據戰情室":
         # 2. Change Point Management Center
         # ==========================================
         elif dash_page == "🛡️ 變化點管理中心":
-            st.subheader("🛡️ 變化點管理中心")
-            
-            # Filter Logic
-            df_cp = df_dash[df_dash['change_point'].ne("") & df_dash['change_point'].notna()].copy()
-            df_cp = df_cp.sort_values(by='timestamp', ascending=False)
-            
-            # --- Filters ---
-            st.markdown("##### 🔍 篩選條件")
-            f_col1, f_col2, f_col3, f_col4 = st.columns(4)
-            with f_col1:
-                today = datetime.date.today()
-                start_date = st.date_input("開始日期", today - datetime.timedelta(days=30))
-                end_date = st.date_input("結束日期", today)
-            with f_col2:
-                models_cp = ["全部"] + list(df_cp['model'].unique())
-                filter_cp_model = st.selectbox("車型 (Model)", models_cp, key="cp_model_filter")
-            with f_col3:
-                if filter_cp_model != "全部":
-                    parts_cp = ["全部"] + list(df_cp[df_cp['model'] == filter_cp_model]['part_no'].unique())
-                else:
-                    parts_cp = ["全部"] + list(df_cp['part_no'].unique())
-                # [Fix] Added key for dashboard interaction
-                # [Feature] Show Part Name
-                part_name_map_cp = {}
-                if 'part_no' in df_cp.columns and 'part_name' in df_cp.columns:
-                     part_name_map_cp = dict(zip(df_cp['part_no'], df_cp['part_name']))
-
-                def format_func_cp(option):
-                     if option == "全部": return "全部 (All)"
-                     name = part_name_map_cp.get(option, "")
-                     # Fallback
-                     if (pd.isna(name) or not str(name).strip()) and 'df' in globals():
-                         match = df[df['品番'] == option]
-                         if not match.empty: name = match.iloc[0]['品名']
-                     
-                     if pd.notna(name) and str(name).strip():
-                         return f"{option} | {name}"
-                     return option
-
-                filter_cp_part = st.selectbox("品番 (Part No)", parts_cp, key="cp_part_filter", format_func=format_func_cp)
-            with f_col4:
-                status_opts = ["未審核", "審核中", "結案", "Closed", "無異常"]
-                filter_cp_status = st.multiselect("狀態 (Status)", status_opts, default=["未審核", "審核中"])
-
-            # Apply Filters
-            if 'timestamp' in df_cp.columns:
-                 df_cp['date'] = df_cp['timestamp'].dt.date
-                 df_cp = df_cp[(df_cp['date'] >= start_date) & (df_cp['date'] <= end_date)]
-            if filter_cp_model != "全部": df_cp = df_cp[df_cp['model'] == filter_cp_model]
-            if filter_cp_part != "全部": df_cp = df_cp[df_cp['part_no'] == filter_cp_part]
-            if filter_cp_status: df_cp = df_cp[df_cp['status'].isin(filter_cp_status)]
-            else:
-                st.warning("請選擇至少一種狀態")
-                df_cp = df_cp.iloc[0:0] 
-            
-            # [Feature] Group by Timestamp (Deduplicate Multi-Cavity)
-            # If multiple rows have same timestamp, show only one representative
-            if not df_cp.empty:
-                # Identify duplicates
-                dup_counts = df_cp.groupby('timestamp').size()
-                
-                # Create a display copy, keeping only the first occurrence per timestamp
-                df_display = df_cp.drop_duplicates(subset=['timestamp']).copy()
-                
-                st.info(f"共發現 {len(df_display)} 筆異常事件 (已合併多穴資料)")
-            else:
-                df_display = df_cp # Empty
-            
-            for index, row in df_display.iterrows():
-                # Check if this is a multi-cavity group
-                ts_key = row['timestamp']
-                is_multi = False
-                cavity_count = 1
-                if ts_key in dup_counts:
-                    cavity_count = dup_counts[ts_key]
-                    if cavity_count > 1: is_multi = True
-                
-                stat_color = "red"; stat_icon = "🔴"
-                if row['status'] == "審核中": stat_color = "orange"; stat_icon = "🟡"
-                elif row['status'] in ["結案", "Closed", "無異常"]: stat_color = "green"; stat_icon = "🟢"
-                
-                # Display Title
-                part_display = row['part_no']
-                # [Feature] Show Part Name in Title
-                part_name_cp = part_name_map_cp.get(row['part_no'], "")
-                if not part_name_cp and 'df' in globals():
-                     match = df[df['品番'] == row['part_no']]
-                     if not match.empty: part_name_cp = match.iloc[0]['品名']
-                
-                if part_name_cp:
-                     part_display = f"{part_display} | {part_name_cp}"
-
-                if is_multi:
-                    base_part = row['part_no'].split('_')[0]
-                    part_display = f"{base_part} (共{cavity_count}穴) | {part_name_cp}"
-                
-                with st.expander(f"{stat_icon} :{stat_color}[{row['status']}] {row['timestamp'].strftime('%Y-%m-%d %H:%M')} - {row['model']} {part_display}", expanded=True):
-                    c1, c2 = st.columns([2, 1])
-                    with c1:
-
-                        st.markdown(f"**變化點內容:**")
-                        st.error(row['change_point'])
-                        
-                        # [Feature] Show Action Taken
-                        st.markdown(f"**執行對策說明:**")
-                        act_taken = row.get('action_taken')
-                        if act_taken and str(act_taken).strip():
-                             st.info(act_taken)
-                        else:
-                             st.caption("無對策說明")
-
-                        st.caption(f"巡檢結果: {row['result']}")
-                    with c2:
-                        # [User Request] Removed Product Schematic Image
-                        # prod_img_path = f"quality_images/{row['part_no']}_main.jpg"
-                        # if check_image_availability(prod_img_path): st.image(prod_img_path, width=120, caption="產品示意圖")
-                        
-                        raw_img = str(row.get('image', '')).strip().replace('"', '').replace("'", "")
-                        if raw_img and raw_img.lower() != "nan":
-                             if raw_img.startswith("http"): img_url = raw_img
-                             else: img_url = f"https://drive.google.com/file/d/{raw_img}/preview"
-                             st.markdown(f"📸 [查看巡檢照片]({img_url})")
-                    
-                    st.divider()
-                    
-                    # Manager Actions
-                    m_col1, m_col2, m_col3 = st.columns([1, 2, 1])
-                    u_key = f"{row['timestamp']}_{row['part_no']}"
-                    
-                    with m_col1:
-                        current_stat = row.get('status', '未審核')
-                        if not current_stat: current_stat = '未審核'
-                        target_index = 0
-                        opts = ["未審核", "審核中", "結案", "無異常"]
-                        if current_stat in opts: target_index = opts.index(current_stat)
-                        new_status = st.selectbox("審核狀態", opts, index=target_index, key=f"stat_{u_key}")
-                    
-                    with m_col2:
-                         # [Feature] Change Point Description (Editable) - REMOVED per user request
-                         current_cp_desc = row.get('change_point', '')
-                         if pd.isna(current_cp_desc): current_cp_desc = ""
-                         # new_cp_desc = st.text_input("異常內容 / 變化點", value=str(current_cp_desc), key=f"cp_{u_key}")
-
-                         # [Feature] Manager Comment
-                         current_comment = row.get('manager_comment', '')
-                         if pd.isna(current_comment): current_comment = ""
-                         new_comment = st.text_area("👨‍💼 主管留言 / 處理對策", value=str(current_comment), height=100, key=f"comm_{u_key}")
-                         
-                         # [Feature] Batch Update Checkbox
-                         batch_label = "同步更新同批次 (一模多穴)"
-                         if is_multi: batch_label += f" [偵測到 {cavity_count} 筆關聯資料]"
-                         
-                         apply_batch = st.checkbox(batch_label, value=True, key=f"batch_{u_key}")
-                    
-                    with m_col3:
-                        st.write("") 
-                        if st.button("💾 更新", key=f"btn_upd_{u_key}", use_container_width=True):
-                            # [Fix] Use ORIGINAL string from GAS to ensure exact match (handle '9:00' vs '09:00')
-                            ts_str_for_api = row.get('timestamp_orig', row['timestamp'].strftime('%Y-%m-%d %H:%M:%S'))
-                            target_part = row['part_no']
-                            with st.spinner("更新中..."):
-                                success, msg = drive_integration.update_status_v2(
-                                    ts_str_for_api, 
-                                    new_status, 
-                                    new_comment, 
-                                    target_part, 
-                                    apply_batch,
-                                    current_cp_desc # Pass UNCHANGED Content
-                                )
-                                if success:
-                                    st.success("更新成功!")
-                                    time.sleep(1)
-                                    st.rerun()
-                                else:
-                                    st.error(f"更新失敗: {msg}")
+            render_change_point_center()
 
 # --- Sidebar Footer (Moved to Bottom) ---
 st.sidebar.markdown("---")
+pending_uploads = get_upload_queue().pending_count()
+if pending_uploads:
+    if get_upload_queue().is_offline():
+        st.sidebar.caption(f"📴 離線中，已暫存 {pending_uploads} 筆 (恢復連線後自動上傳)")
+    else:
+        st.sidebar.caption(f"📤 待上傳: {pending_uploads} 筆 (背景處理中)")
 if st.sidebar.button("🔄 手動更新數據 (Refresh)", use_container_width=True):
-    drive_integration.fetch_history.clear()
-    drive_integration.fetch_all_data.clear()
-    data_manager.load_data.clear()
+    # Full re-sync picks up edits made directly in the Sheet (not tracked by the change log)
+    drive_integration.sync_rows(full=True)
+    drive_integration.clear_caches()
+    data_manager.clear_data_cache()
     st.toast("已強制更新與 Google Sheet 同步", icon="✅")
     st.rerun()
 
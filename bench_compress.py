@@ -0,0 +1,81 @@
+import io
+import os
+import sys
+import time
+
+from PIL import Image, ImageOps
+
+import drive_integration
+
+# Microbenchmark: CPU time per image of drive_integration.compress_image vs the old
+# quality-decrement loop. Usage: python bench_compress.py [image files...]
+# (defaults to quality_images/ plus a synthetic 12 MP photo)
+IMG_DIR = "quality_images"
+REPEAT = 3
+
+def legacy_compress(image_bytes, max_size_mb=1.0, quality=85):
+    """
+    The previous compress_image loop (re-encode, quality -10, shrink 0.7x while > 2MB).
+    Returns: (jpeg bytes, encode passes)
+    """
+    img = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes)))
+    if img.mode in ("RGBA", "P"):
+        img = img.convert("RGB")
+    output_buffer = io.BytesIO()
+    img.save(output_buffer, format="JPEG", quality=quality)
+    passes = 1
+    size_mb = output_buffer.tell() / (1024 * 1024)
+    while size_mb > max_size_mb and quality > 30:
+        output_buffer = io.BytesIO()
+        quality -= 10
+        if size_mb > 2.0:
+            width, height = img.size
+            img = img.resize((int(width * 0.7), int(height * 0.7)), Image.Resampling.LANCZOS)
+        img.save(output_buffer, format="JPEG", quality=quality)
+        passes += 1
+        size_mb = output_buffer.tell() / (1024 * 1024)
+    return output_buffer.getvalue(), passes
+
+def synthetic_photo(size=(4032, 3024)):
+    """
+    Noisy 12 MP JPEG (noise is the worst case for the encoder, like a textured part photo).
+    """
+    img = Image.effect_noise(size, 64).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+def cpu_ms(func, *args):
+    best = None
+    for _ in range(REPEAT):
+        start = time.process_time()
+        result = func(*args)
+        elapsed = (time.process_time() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    samples = []
+    paths = sys.argv[1:]
+    if not paths and os.path.isdir(IMG_DIR):
+        paths = [os.path.join(IMG_DIR, f) for f in sorted(os.listdir(IMG_DIR))]
+    for path in paths:
+        with open(path, "rb") as f:
+            samples.append((os.path.basename(path), f.read()))
+    if not sys.argv[1:]:
+        samples.append(("synthetic_12MP.jpg", synthetic_photo()))
+
+    print(f"{'image':<32} {'in KB':>8} | {'old ms':>8} {'KB':>6} {'passes':>6} | {'new ms':>8} {'KB':>6}")
+    total_old = total_new = 0.0
+    for name, data in samples:
+        old_ms, (old_out, old_passes) = cpu_ms(legacy_compress, data)
+        new_ms, new_out = cpu_ms(drive_integration.compress_image, data)
+        total_old += old_ms
+        total_new += new_ms
+        print(f"{name[:32]:<32} {len(data)/1024:>8.0f} | {old_ms:>8.1f} {len(old_out)/1024:>6.0f} {old_passes:>6} | {new_ms:>8.1f} {len(new_out)/1024:>6.0f}")
+
+    if samples:
+        print(f"\nCPU per image: old {total_old/len(samples):.1f} ms, new {total_new/len(samples):.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+import downsample
+import judgement
+import part_specs
+import spc
+import utils
+
+# Microbenchmark: wall time of the vectorized dashboard paths at production scale.
+# These used to be `elapsed < N` asserts in the unit tests; timing depends on the machine,
+# so it lives here. Usage: python bench_dashboard.py
+REPEAT = 3
+
+def best_ms(func, *args):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_spec_parsing():
+    """
+    parse_numeric_series vs clean_numeric_value per cell on a 35k-row parts master column.
+    """
+    values = pd.Series(["93", "130/120", "", "93/", "/95", "1969/1970", None] * 5000)
+    old_ms = best_ms(lambda v: v.map(utils.clean_numeric_value), values)
+    new_ms = best_ms(utils.parse_numeric_series, values)
+    return "spec parsing", len(values), old_ms, new_ms
+
+def bench_bulk_rejudge():
+    """
+    judgement.rejudge over 200k rows spread across every part in the master.
+    """
+    registry = part_specs.SpecRegistry(utils.load_data())
+    parts = list(registry.by_part)
+    n = 200_000
+    rng = np.random.default_rng(0)
+    rows = pd.DataFrame({
+        'part_no': rng.choice(parts, n),
+        'weight': rng.uniform(0, 3000, n),
+        'length': [""] * n,
+        'result': ["PASS"] * n
+    })
+    return "bulk rejudge", n, None, best_ms(judgement.rejudge, rows, registry)
+
+def bench_spc_full_history():
+    """
+    spc.compute (rules, capability, subgroups) over 200k minute readings.
+    """
+    registry = part_specs.SpecRegistry(utils.load_data())
+    parts = list(registry.by_part)
+    n = 200_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'part_no': rng.choice(parts, n),
+        'timestamp': pd.date_range("2024-01-01", periods=n, freq="min", tz="Asia/Taipei"),
+        'weight': rng.normal(500, 2, n),
+        'result': "PASS"
+    })
+    return "SPC full history", n, None, best_ms(spc.compute, df, registry)
+
+def bench_downsample():
+    """
+    downsample.downsample of a 200k-point weight trend to the default chart budget.
+    """
+    n = 200_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'timestamp': pd.date_range("2024-01-01", periods=n, freq="min", tz="Asia/Taipei"),
+        'weight': 100 + rng.normal(0, 0.5, n),
+        'result': "PASS"
+    })
+    return "chart downsample", n, None, best_ms(downsample.downsample, df, 'timestamp', 'weight')
+
+BENCHES = [bench_spec_parsing, bench_bulk_rejudge, bench_spc_full_history, bench_downsample]
+
+def main():
+    print(f"{'benchmark':<24} {'rows':>8} | {'old ms':>8} | {'new ms':>8}")
+    for bench in BENCHES:
+        name, rows, old_ms, new_ms = bench()
+        old = f"{old_ms:>8.1f}" if old_ms is not None else f"{'-':>8}"
+        print(f"{name:<24} {rows:>8} | {old} | {new_ms:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import numpy as np
+
+# Server-side downsampling of trend chart data before it goes to the browser as Vega-Lite inline data.
+# Largest-Triangle-Three-Buckets keeps the visual shape of the series (peaks, dips, steps) with a
+# fixed point budget; out-of-spec / flagged points are always kept on top of that.
+MAX_CHART_POINTS = 500 # Per series; shop tablets stay responsive well below ~1000 SVG points
+
+def lttb_indices(x, y, budget):
+    """
+    Largest-Triangle-Three-Buckets over (x, y) sorted by x.
+    Returns: sorted positions of the selected points (first and last always included).
+    """
+    n = len(x)
+    if budget >= n or n <= 2:
+        return np.arange(n)
+    if budget <= 2:
+        return np.array([0, n - 1])
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    # n - 2 inner points into budget - 2 buckets
+    edges = np.linspace(1, n - 1, budget - 1).astype(np.int64)
+    selected = np.empty(budget, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for b in range(budget - 2):
+        start, end = edges[b], edges[b + 1]
+        # Third vertex: average of the next bucket (or the last point)
+        if b + 2 < len(edges):
+            next_start, next_end = edges[b + 1], edges[b + 2]
+            avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+        bx, by = x[start:end], y[start:end]
+        area = np.abs((x[prev] - avg_x) * (by - y[prev]) - (x[prev] - bx) * (avg_y - y[prev]))
+        prev = start + int(np.argmax(area))
+        selected[b + 1] = prev
+    return selected
+
+def downsample(df, x, y, budget=MAX_CHART_POINTS, low=None, high=None, keep=None):
+    """
+    Rows of df reduced to about `budget` points for a chart of y over x (a datetime or number column).
+    Points outside [low, high] and rows where `keep` (bool Series/array) is True are always included,
+    even beyond the budget. Rows keep their original order.
+    """
+    n = len(df)
+    if n <= budget:
+        return df
+
+    xs = df[x].to_numpy()
+    if np.issubdtype(xs.dtype, np.datetime64) or hasattr(df[x].dtype, "tz"):
+        xs = df[x].astype("int64").to_numpy()
+    ys = df[y].to_numpy(dtype="float64")
+    order = np.argsort(xs, kind="stable")
+
+    must = np.zeros(n, dtype=bool)
+    with np.errstate(invalid="ignore"):
+        if low is not None:
+            must |= ys < float(low)
+        if high is not None:
+            must |= ys > float(high)
+    if keep is not None:
+        must |= np.asarray(keep, dtype=bool)
+
+    picked = order[lttb_indices(xs[order], ys[order], max(budget - int(must.sum()), 2))]
+    rows = np.union1d(picked, np.flatnonzero(must)) # Sorted positions = original row order
+    return df.iloc[rows]
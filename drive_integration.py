@@ -1,10 +1,23 @@
 from PIL import Image, ImageOps
 import io
 import requests
+from requests.adapters import HTTPAdapter
 import base64
+import gzip
+import pandas as pd
 import streamlit as st
 import json
+import threading
+import time
+import os
 import pillow_heif # [Feature] HEIC Support
+import sheet_mirror
+
+try: # Optional: binary Drive uploads (without it, images go base64 through GAS)
+    from google.oauth2 import service_account
+    from google.auth.transport.requests import Request as GoogleAuthRequest
+except ImportError:
+    service_account = None
 
 # Register HEIF opener
 pillow_heif.register_heif_opener()
@@ -12,9 +25,138 @@ pillow_heif.register_heif_opener()
 # Google Apps Script Web App URL
 GAS_URL = "https://script.google.com/macros/s/AKfycbyUXAjO4vOCmhOBWMT6svzpTXJzcVWO-jD4NQeEygB1-dyhCXb1m-gRC8_mkazIesTt/exec"
 
-def compress_image(image_file, max_size_mb=1.0, quality=85):
+# [Perf] Shared HTTP session for all GAS calls: keep-alive pooling, bounded retries, per-action timeouts
+ACTION_TIMEOUTS = { # seconds
+    "upload": 60,
+    "batch_append": 60,
+    "upload_image": 60,
+    "get_all_data": 30,
+    "get_rows_since": 15,
+    "get_history": 10,
+    "update_status": 10,
+    "update_status_bulk": 30
+}
+DEFAULT_TIMEOUT = 15
+MAX_RETRIES = 3
+RETRY_BACKOFF_SEC = 0.5 # 0.5s, 1s, 2s ...
+RETRY_STATUS = {429, 500, 502, 503, 504}
+IDEMPOTENT_ACTIONS = {"get_all_data", "get_rows_since", "get_history", "update_status", "update_status_bulk"}
+
+# Network-level failures (Wi-Fi drop, DNS, timeouts): the request may never have reached GAS
+OFFLINE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+class OfflineError(Exception):
+    """
+    GAS could not be reached. Raised (instead of returned) when the caller asks for it,
+    so it can keep the submission and replay it once the network is back.
+    """
+
+# [Perf] Binary image upload: Drive resumable upload with the service account in secrets,
+# streamed in chunks, so the JPEG never goes through GAS as base64 (~33% larger JSON)
+DRIVE_UPLOAD_URL = "https://www.googleapis.com/upload/drive/v3/files"
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+DRIVE_SCOPES = ["https://www.googleapis.com/auth/drive.file"]
+DRIVE_CHUNK_BYTES = 1024 * 1024 # Must be a multiple of 256 KiB
+DRIVE_TIMEOUT = 30
+
+_session = None
+_session_lock = threading.Lock()
+_drive_creds = None
+_drive_creds_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_http_stats = {} # action -> {"calls", "retries", "errors", "total_ms", "last_ms"}
+
+# [Feature] Incremental Sync into the local SQLite mirror (see sheet_mirror.py)
+SYNC_INTERVAL_SEC = 60 # Background sync period
+COLD_SYNC_RETRY_SEC = 60 # Don't hammer GAS on every call while it is unreachable
+ALL_DATA_PAGE_SIZE = 5000 # Rows per 'get_all_data' page when downloading the whole sheet
+# [Perf] Bulk reads ask for per-column arrays, gzip-compressed (see GAS encodeBulk): no key strings
+# repeated on every row, and the DataFrame is built straight from the column arrays
+BULK_ENCODING = {"format": "columnar", "gzip": True}
+_sync_lock = threading.Lock()
+_last_cold_sync_failure = 0.0
+
+def _get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            # Retries are handled in _post (so they can be counted); the adapter only pools
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def _record_stat(action, elapsed_ms, retried=False, failed=False):
+    with _stats_lock:
+        entry = _http_stats.setdefault(action, {"calls": 0, "retries": 0, "errors": 0, "total_ms": 0.0, "last_ms": 0.0})
+        entry["calls"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["last_ms"] = elapsed_ms
+        if retried: entry["retries"] += 1
+        if failed: entry["errors"] += 1
+
+def get_http_stats():
+    """
+    Per-action HTTP counters: calls, retries, errors, total_ms, last_ms, avg_ms.
+    """
+    with _stats_lock:
+        stats = {a: dict(v) for a, v in _http_stats.items()}
+    for v in stats.values():
+        v["avg_ms"] = v["total_ms"] / v["calls"] if v["calls"] else 0.0
+    return stats
+
+def _post(payload):
+    """
+    POSTs a payload to GAS over the shared session.
+    Retries with exponential backoff on 429/5xx and connection errors. Non-idempotent actions
+    (e.g. upload) are only retried when GAS cannot have run the script (429 / connect timeout),
+    so a retry never appends a duplicate row. A batch_append with dedupe=True is idempotent.
+    Returns the final response, or raises the last connection error.
+    """
+    action = payload.get("action", "upload")
+    timeout = ACTION_TIMEOUTS.get(action, DEFAULT_TIMEOUT)
+    idempotent = action in IDEMPOTENT_ACTIONS or bool(payload.get("dedupe"))
+    session = _get_session()
+
+    for attempt in range(MAX_RETRIES + 1):
+        is_last = attempt == MAX_RETRIES
+        start = time.perf_counter()
+        try:
+            response = session.post(GAS_URL, json=payload, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            safe_to_retry = idempotent or isinstance(e, requests.exceptions.ConnectTimeout)
+            if is_last or not safe_to_retry:
+                _record_stat(action, elapsed_ms, failed=True)
+                raise
+            _record_stat(action, elapsed_ms, retried=True)
+        else:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            retryable = response.status_code == 429 or (idempotent and response.status_code in RETRY_STATUS)
+            if is_last or not retryable:
+                _record_stat(action, elapsed_ms, failed=response.status_code != 200)
+                return response
+            _record_stat(action, elapsed_ms, retried=True)
+        time.sleep(RETRY_BACKOFF_SEC * (2 ** attempt))
+
+# [Perf] Image encoder: decode/downscale once, then binary-search JPEG quality against the byte budget
+MAX_LONG_EDGE = 2048 # px; phone photos (12 MP+) are downscaled before encoding
+MIN_QUALITY = 30
+MAX_ENCODE_PASSES = 6
+
+def _encode_jpeg(img, quality):
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=quality)
+    return buf.getvalue()
+
+def compress_image(image_file, max_size_mb=1.0, quality=85, max_long_edge=MAX_LONG_EDGE, max_passes=MAX_ENCODE_PASSES):
     """
     Compress image to be under max_size_mb.
+    The image is first downscaled to max_long_edge (JPEGs are decoded at the smallest DCT scale
+    that is still at least max_long_edge, LANCZOS does the rest), then encoded at `quality`; if that is over budget, the highest quality that fits is found by
+    binary search. At most max_passes JPEG encodes are done per image.
     """
     try:
         if isinstance(image_file, bytes):
@@ -23,33 +165,48 @@ def compress_image(image_file, max_size_mb=1.0, quality=85):
              # Streamlit UploadedFile or BytesIO
              image_file.seek(0)
              img = Image.open(image_file)
-        
+
+        # --- Downscale at decode time (JPEG DCT scaling: 1/2, 1/4, 1/8; never below the requested size) ---
+        if max_long_edge and max(img.size) > max_long_edge:
+            scale = max_long_edge / max(img.size)
+            img.draft("RGB", (int(img.size[0] * scale), int(img.size[1] * scale)))
+
         # --- Fix Rotation (EXIF) ---
         img = ImageOps.exif_transpose(img)
         
         # Convert to RGB if needed (e.g., RGBA -> JPEG)
-        if img.mode in ("RGBA", "P"):
+        if img.mode != "RGB":
             img = img.convert("RGB")
-            
-        output_buffer = io.BytesIO()
-        
-        # Initial Save
-        img.save(output_buffer, format="JPEG", quality=quality)
-        size_mb = output_buffer.tell() / (1024 * 1024)
-        
-        # Aggressive Resize Loop if still too big
-        while size_mb > max_size_mb and quality > 30:
-            output_buffer = io.BytesIO() # Reset buffer
-            quality -= 10
-            # Also scale down dimensions if huge
-            if size_mb > 2.0: # If > 2MB, resize dimensions
-                width, height = img.size
-                img = img.resize((int(width * 0.7), int(height * 0.7)), Image.Resampling.LANCZOS)
-                
-            img.save(output_buffer, format="JPEG", quality=quality)
-            size_mb = output_buffer.tell() / (1024 * 1024)
-            
-        return output_buffer.getvalue()
+
+        if max_long_edge and max(img.size) > max_long_edge:
+            # reduce() by an integer factor first, then LANCZOS for the remainder
+            img.thumbnail((max_long_edge, max_long_edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+        budget = int(max_size_mb * 1024 * 1024)
+        data = _encode_jpeg(img, quality)
+        passes = 1
+        if len(data) <= budget:
+            return data
+
+        # Binary search the highest quality that fits
+        best, smallest = None, data
+        lo, hi = MIN_QUALITY, quality - 1
+        while lo <= hi and passes < max_passes - 1: # Keep one pass for the fallback below
+            mid = (lo + hi) // 2
+            candidate = _encode_jpeg(img, mid)
+            passes += 1
+            if len(candidate) <= budget:
+                best, lo = candidate, mid + 1
+            else:
+                smallest, hi = candidate, mid - 1
+        if best is not None:
+            return best
+
+        # Still too big at low quality: shrink dimensions in proportion to the overshoot (one pass)
+        ratio = (budget / len(smallest)) ** 0.5 * 0.9
+        width, height = img.size
+        img = img.resize((max(1, int(width * ratio)), max(1, int(height * ratio))), Image.Resampling.LANCZOS)
+        return _encode_jpeg(img, MIN_QUALITY)
     except Exception as e:
         print(f"Compression failed: {e}")
         # Buildin fallback: if compression fails, return original bytes if possible
@@ -60,6 +217,223 @@ def compress_image(image_file, max_size_mb=1.0, quality=85):
         except:
              return b""
 
+def _encode_image(image_file, notify=True, precompressed=False):
+    """
+    Compresses an uploaded image and returns it Base64-encoded ("" if no image).
+    notify=False skips the Streamlit message (e.g. when called from the upload worker thread).
+    precompressed=True sends the bytes as-is (already run through compress_image).
+    """
+    if image_file is None:
+        return ""
+    if precompressed:
+        return base64.b64encode(image_file).decode('utf-8')
+    # Note: image_file from Streamlit is a file-like object
+    compressed_bytes = compress_image(image_file, max_size_mb=1.0)
+
+    # DEBUG: Show Compression Result
+    orig_size = 0
+    if isinstance(image_file, bytes): orig_size = len(image_file)
+    else: 
+        try:
+            image_file.seek(0, 2) # Seek end
+            orig_size = image_file.tell()
+            image_file.seek(0)
+        except:
+            pass
+
+    comp_size = len(compressed_bytes)
+    # Change to st.warning/success for better visibility than toast
+    if notify and comp_size < orig_size:
+        st.success(f"📉 照片已壓縮: {orig_size/1024/1024:.2f}MB ➝ {comp_size/1024/1024:.2f}MB")
+
+    return base64.b64encode(compressed_bytes).decode('utf-8')
+
+def _drive_token():
+    """
+    OAuth token for the service account in secrets, or None if binary uploads are unavailable
+    (google-auth not installed / no service account key).
+    """
+    global _drive_creds
+    if service_account is None:
+        return None
+    with _drive_creds_lock:
+        if _drive_creds is False:
+            return None
+        if _drive_creds is None:
+            try:
+                info = dict(st.secrets["gcp_service_account"])
+                info.pop("drive_folder_id", None)
+                _drive_creds = service_account.Credentials.from_service_account_info(info, scopes=DRIVE_SCOPES)
+            except Exception as e:
+                print(f"Drive binary upload disabled: {e}")
+                _drive_creds = False # Don't retry every upload
+                return None
+        if not _drive_creds.valid:
+            _drive_creds.refresh(GoogleAuthRequest(_get_session()))
+        return _drive_creds.token
+
+class _DriveRefused(Exception):
+    """
+    Drive answered a binary upload step with an error status.
+    """
+    def __init__(self, step, response):
+        super().__init__(f"Drive {step} HTTP {response.status_code}: {response.text[:200]}")
+        self.status_code = response.status_code
+
+def _disable_drive_uploads(reason):
+    # A 4xx is not going to change for the next photo (e.g. service account without storage
+    # quota): go straight to GAS from now on, like missing credentials
+    global _drive_creds
+    with _drive_creds_lock:
+        _drive_creds = False
+    print(f"Drive binary upload disabled: {reason}")
+
+def _delete_drive_file(session, auth, file_id):
+    # Best effort: don't leave an unshared copy behind when falling back to GAS
+    try:
+        session.delete(f"{DRIVE_FILES_URL}/{file_id}", params={"supportsAllDrives": "true"},
+                       headers=auth, timeout=DRIVE_TIMEOUT)
+    except Exception as e:
+        print(f"Could not delete Drive file {file_id}: {e}")
+
+def upload_image_file(path, filename, folder_id):
+    """
+    Uploads a JPEG file to the Drive folder as raw bytes (resumable upload, one chunk in memory
+    at a time) and shares it by link.
+    Returns: the share link (same format GAS writes), or None if the binary path is unavailable
+    or Drive refused the upload (callers then fall back to base64 through GAS). A 4xx refusal
+    turns the binary path off for the rest of the process.
+    Raises: OfflineError if Drive could not be reached.
+    """
+    start = time.perf_counter()
+    session = auth = file_id = None
+    try:
+        token = _drive_token()
+        if token is None:
+            return None
+        session = _get_session()
+        auth = {"Authorization": f"Bearer {token}"}
+        total = os.path.getsize(path)
+
+        # 1. Start a resumable session (metadata only)
+        init = session.post(
+            DRIVE_UPLOAD_URL,
+            params={"uploadType": "resumable", "supportsAllDrives": "true", "fields": "id"},
+            headers=dict(auth, **{"X-Upload-Content-Type": "image/jpeg", "X-Upload-Content-Length": str(total)}),
+            json={"name": filename, "parents": [folder_id]},
+            timeout=DRIVE_TIMEOUT
+        )
+        if init.status_code != 200:
+            raise _DriveRefused("init", init)
+        upload_url = init.headers["Location"]
+
+        # 2. Stream the file in chunks; Drive answers 308 until the last one
+        file_id = None
+        with open(path, "rb") as f:
+            offset = 0
+            while file_id is None:
+                chunk = f.read(DRIVE_CHUNK_BYTES)
+                end = offset + len(chunk) - 1
+                resp = session.put(
+                    upload_url, data=chunk,
+                    headers=dict(auth, **{"Content-Range": f"bytes {offset}-{end}/{total}" if chunk else f"bytes */{total}"}),
+                    timeout=DRIVE_TIMEOUT
+                )
+                if resp.status_code in (200, 201):
+                    file_id = resp.json()["id"]
+                elif resp.status_code == 308:
+                    # Resume from what Drive actually received
+                    received = resp.headers.get("Range")
+                    offset = int(received.rsplit("-", 1)[1]) + 1 if received else 0
+                    f.seek(offset)
+                else:
+                    raise _DriveRefused("upload", resp)
+
+        # 3. Anyone with the link can view (matches GAS saveImage)
+        perm = session.post(
+            f"{DRIVE_FILES_URL}/{file_id}/permissions",
+            params={"supportsAllDrives": "true"},
+            headers=auth,
+            json={"role": "reader", "type": "anyone"},
+            timeout=DRIVE_TIMEOUT
+        )
+        if perm.status_code != 200:
+            raise _DriveRefused("share", perm)
+    except OFFLINE_ERRORS as e:
+        _record_stat("drive_upload", (time.perf_counter() - start) * 1000, failed=True)
+        if file_id:
+            _delete_drive_file(session, auth, file_id)
+        raise OfflineError(str(e)) from e
+    except Exception as e:
+        _record_stat("drive_upload", (time.perf_counter() - start) * 1000, failed=True)
+        print(f"Drive binary upload failed, falling back to GAS: {e}")
+        if file_id:
+            _delete_drive_file(session, auth, file_id)
+        if isinstance(e, _DriveRefused) and 400 <= e.status_code < 500 and e.status_code not in (408, 429):
+            _disable_drive_uploads(e)
+        return None
+
+    _record_stat("drive_upload", (time.perf_counter() - start) * 1000)
+    return f"https://drive.google.com/file/d/{file_id}/view?usp=sharing"
+
+def upload_image(path, filename, folder_id):
+    """
+    Uploads one compressed JPEG on its own, before the rows are appended: binary to Drive when
+    possible, otherwise base64 through GAS 'upload_image'.
+    Returns: (ok, share link or error message). Raises OfflineError if nothing could be reached.
+    """
+    url = upload_image_file(path, filename, folder_id)
+    if url:
+        return True, url
+    with open(path, "rb") as f:
+        image_base64 = base64.b64encode(f.read()).decode('utf-8')
+    try:
+        response = _post({
+            "action": "upload_image",
+            "image_base64": image_base64,
+            "filename": filename,
+            "folder_id": folder_id
+        })
+    except OFFLINE_ERRORS as e:
+        raise OfflineError(str(e)) from e
+    if response.status_code != 200:
+        return False, f"HTTP Error: {response.status_code}"
+    resp_json = response.json()
+    if resp_json.get("status") != "Success":
+        return False, f"GAS Error: {resp_json.get('message', response.text)}"
+    return True, resp_json.get("image_url", "")
+
+def image_links(value):
+    """
+    Photo links stored in a sheet Image cell (one per line; bare Drive ids become preview links).
+    """
+    links = []
+    for token in str(value or "").replace('"', '').replace("'", "").split():
+        if token.lower() == "nan":
+            continue
+        links.append(token if token.startswith("http") else f"https://drive.google.com/file/d/{token}/preview")
+    return links
+
+def _row_fields(row_data):
+    """
+    Flattens row_data into the individual fields expected by GAS.
+    """
+    return {
+        "timestamp": row_data.get("timestamp"),
+        "model": row_data.get("model"),
+        "part_no": row_data.get("part_no"),
+        "part_name": row_data.get("part_name"), # [Feature] Add Part Name
+        "inspection_type": row_data.get("inspection_type"),
+        "weight": row_data.get("weight"),
+        "length": row_data.get("length"),
+        "material_ok": row_data.get("material_ok"),
+        "change_point": row_data.get("change_point"),
+        "action_taken": row_data.get("action_taken"), # [Feature] New Field
+        "result": row_data.get("result"),
+        "status": row_data.get("status"), # [Feature] Explicit status
+        "key_control_status": row_data.get("key_control_status")
+    }
+
 def upload_and_append(image_file, filename, row_data):
     """
     Sends data + image to Google Apps Script.
@@ -68,60 +442,31 @@ def upload_and_append(image_file, filename, row_data):
     If image_file is None, we send empty string for image_base64.
     """
     try:
-        image_base64 = ""
-        if image_file is not None:
-            # 1. Compress & Encode Image to Base64
-            # Note: image_file from Streamlit is a file-like object
-            compressed_bytes = compress_image(image_file, max_size_mb=1.0)
-            
-            # DEBUG: Show Compression Result
-            orig_size = 0
-            if isinstance(image_file, bytes): orig_size = len(image_file)
-            else: 
-                try:
-                    image_file.seek(0, 2) # Seek end
-                    orig_size = image_file.tell()
-                    image_file.seek(0)
-                except:
-                    pass
-                
-            comp_size = len(compressed_bytes)
-            # Change to st.warning/success for better visibility than toast
-            if comp_size < orig_size:
-                st.success(f"📉 照片已壓縮: {orig_size/1024/1024:.2f}MB ➝ {comp_size/1024/1024:.2f}MB")
-            
-            image_base64 = base64.b64encode(compressed_bytes).decode('utf-8')
+        # 1. Compress & Encode Image to Base64
+        image_base64 = _encode_image(image_file)
         
         # 2. Prepare Payload (Clean Version)
         payload = {
             "image_base64": image_base64, # Can be empty
             "filename": filename,
-            # Flatten row_data into individual fields expected by GAS
-            "timestamp": row_data.get("timestamp"),
-            "model": row_data.get("model"),
-            "part_no": row_data.get("part_no"),
-            "part_name": row_data.get("part_name"), # [Feature] Add Part Name
-            "inspection_type": row_data.get("inspection_type"),
-            "weight": row_data.get("weight"),
-            "length": row_data.get("length"),
-            "material_ok": row_data.get("material_ok"),
-            "material_ok": row_data.get("material_ok"),
-            "change_point": row_data.get("change_point"),
-            "action_taken": row_data.get("action_taken"), # [Feature] New Field
-            "result": row_data.get("result"),
-            "status": row_data.get("status"), # [Feature] Explicit status
-            "key_control_status": row_data.get("key_control_status"),
             # Pass Folder ID from secrets
             "folder_id": st.secrets["gcp_service_account"]["drive_folder_id"]
         }
+        payload.update(_row_fields(row_data))
         
         # 3. Post to GAS (Use json=payload)
-        response = requests.post(GAS_URL, json=payload)
+        response = _post(payload)
         
         if response.status_code == 200 and "Success" in response.text:
-            # Clear cache to reflect new data usage immediately
-            fetch_history.clear()
-            fetch_all_data.clear()
+            # Write the new row through to the mirror so it shows immediately
+            try:
+                resp_json = response.json()
+            except ValueError:
+                resp_json = {}
+            _patch_appended(
+                [row_data], [{"index": 0, "status": "Success", "row": resp_json.get("row")}],
+                resp_json.get("image_url", "")
+            )
             return True, "成功"
         else:
             return False, f"GAS Error: {response.text}"
@@ -129,53 +474,283 @@ def upload_and_append(image_file, filename, row_data):
     except Exception as e:
         return False, str(e)
 
-@st.cache_data(ttl=600)
+def batch_append(rows, image_file=None, filename="", folder_id=None, notify=True,
+                 dedupe=False, precompressed=False, raise_offline=False, image_urls=None):
+    """
+    Appends all rows of one inspection (e.g. every cavity R/L or #1/#2) in a single GAS
+    round trip. The optional image is uploaded once and linked from every row.
+    folder_id defaults to the Drive folder in secrets; pass it explicitly (and notify=False)
+    when calling from a background thread.
+    dedupe=True asks GAS to skip rows whose timestamp + part_no already exist, so a replay
+    after a lost response cannot append twice (and may be retried on any network error).
+    precompressed=True sends image_file bytes without re-compressing them.
+    image_urls: links of photos already uploaded (see upload_image); image_file is ignored.
+    raise_offline=True raises OfflineError when GAS is unreachable instead of returning it.
+    Returns: (ok, results) where results is GAS's per-row list
+             [{'index': i, 'status': 'Success'|'Duplicate'|'Error', 'row': sheet_row, 'message': ...}],
+             or (False, error message) if the request itself failed.
+    """
+    try:
+        payload = {
+            "action": "batch_append",
+            "image_base64": "" if image_urls else _encode_image(image_file, notify=notify, precompressed=precompressed),
+            "image_urls": image_urls or [],
+            "filename": filename,
+            "folder_id": folder_id or st.secrets["gcp_service_account"]["drive_folder_id"],
+            "rows": [_row_fields(r) for r in rows]
+        }
+        if dedupe:
+            payload["dedupe"] = True
+        response = _post(payload)
+        if response.status_code != 200:
+            return False, f"HTTP Error: {response.status_code}"
+
+        resp_json = response.json()
+        results = resp_json.get("results")
+        if results is None:
+            return False, f"GAS Error: {resp_json.get('message', response.text)}"
+
+        # Write the new rows through to the mirror so they show immediately
+        _patch_appended(rows, results, resp_json.get("image_url", ""))
+        return all(r.get("status") in ("Success", "Duplicate") for r in results), results
+    except OFFLINE_ERRORS as e:
+        if raise_offline:
+            raise OfflineError(str(e)) from e
+        return False, str(e)
+    except Exception as e:
+        return False, str(e)
+
+def _patch_appended(rows, results, image_url):
+    """
+    [Perf] Writes rows GAS just appended into the local mirror instead of a sync round trip;
+    only the touched rows change version, so dashboard caches patch rather than rebuild.
+    results: GAS per-row results carrying the assigned sheet 'row'. Falls back to a sync
+    when row numbers are missing (older GAS deployment).
+    """
+    records = []
+    for res in results:
+        if res.get("status") != "Success":
+            continue # Duplicates are already in the sheet (the next sync brings them if missing)
+        if res.get("row") is None:
+            sync_rows()
+            return
+        fields = _row_fields(rows[res["index"]])
+        # Same defaults as GAS buildRowValues
+        records.append(dict(
+            fields, row=res["row"], status=fields["status"] or "未審核",
+            manager_comment="", image=image_url or ""
+        ))
+    try:
+        sheet_mirror.patch_rows(records)
+    except Exception as e:
+        print(f"Mirror write-through failed: {e}")
+        sync_rows()
+
 def fetch_history(part_no):
     """
-    Fetches history data for a specific part from GAS.
+    History for a specific part, served from the local mirror (indexed on part_no).
     Returns: DataFrame-ready list of dicts [{'timestamp':..., 'weight':...}]
     """
-    try:
+    _ensure_mirror()
+    return sheet_mirror.query_rows(part_no=part_no)
+
+def decode_bulk(resp_json):
+    """
+    The 'data' of a bulk read response (get_all_data / get_rows_since) as a DataFrame,
+    in whichever encoding GAS sent: records or columnar, optionally gzip + base64.
+    Older deployments ignore BULK_ENCODING and always send records.
+    """
+    data = resp_json.get("data", [])
+    if resp_json.get("encoding") == "gzip":
+        data = json.loads(gzip.decompress(base64.b64decode(data)))
+    if resp_json.get("format") == "columnar":
+        return pd.DataFrame(dict(zip(data["columns"], data["values"])), columns=data["columns"])
+    return pd.DataFrame(data)
+
+def sync_rows(full=False):
+    """
+    Incremental sync of the inspection sheet into the local SQLite mirror.
+    Only rows appended after our cursor, or edited after our change revision, are downloaded.
+    full=True ignores the local cursor and pulls a fresh snapshot.
+    Returns: True on success, False if GAS is unreachable or does not support
+    'get_rows_since' (pre-V6 deployment).
+    """
+    with _sync_lock:
+        meta = sheet_mirror.get_meta()
+        if full:
+            meta = {"cursor": 1, "rev": 0, "anchor_ts": ""}
         payload = {
-            "action": "get_history",
-            "part_no": part_no
+            "action": "get_rows_since",
+            "since_row": meta["cursor"],
+            "since_rev": meta["rev"],
+            "anchor_ts": meta["anchor_ts"],
+            **BULK_ENCODING
         }
-        response = requests.post(GAS_URL, json=payload, timeout=10)
-        
-        if response.status_code == 200:
+        try:
+            response = _post(payload)
+            if response.status_code != 200:
+                return False
             resp_json = response.json()
-            if resp_json.get("status") == "Success":
-                return resp_json.get("data", [])
-            else:
-                return []
-        else:
-            return []
-    except Exception:
-        return []
+            if resp_json.get("status") != "Success":
+                return False
+            rows = decode_bulk(resp_json)
+        except Exception as e:
+            print(f"Incremental sync failed: {e}")
+            return False
+
+        sheet_mirror.apply_delta(
+            rows,
+            last_row=resp_json.get("last_row", meta["cursor"]),
+            rev=resp_json.get("rev", meta["rev"]),
+            reset=full or bool(resp_json.get("reset"))
+        )
+        return True
+
+def _background_sync_loop(interval):
+    while True:
+        time.sleep(interval)
+        sync_rows()
+
+def start_background_sync(interval=SYNC_INTERVAL_SEC):
+    """
+    Starts a daemon thread that keeps the local mirror up to date with the Sheet.
+    Call once per process (app.py wraps it in st.cache_resource).
+    """
+    thread = threading.Thread(target=_background_sync_loop, args=(interval,), daemon=True, name="sheet-sync")
+    thread.start()
+    return thread
+
+def _ensure_mirror():
+    """
+    Makes sure the local mirror holds data, syncing on cold start.
+    If the incremental sync is unavailable (pre-V6 GAS), seeds the mirror from a full
+    'get_all_data' download instead (sheet rows start at 2, in order) and retries the
+    incremental path later.
+    """
+    global _last_cold_sync_failure
+    if sheet_mirror.get_meta()["synced"]:
+        return
+    if time.time() - _last_cold_sync_failure < COLD_SYNC_RETRY_SEC:
+        return
+    if sync_rows():
+        return
+    _last_cold_sync_failure = time.time()
+    rows = _fetch_all_data_remote()
+    if not rows.empty:
+        if "row" not in rows.columns: # Older deployments: sheet order from row 2
+            rows = rows.assign(row=range(2, len(rows) + 2))
+        sheet_mirror.apply_delta(rows, last_row=len(rows) + 1, rev=0, reset=True, synced=False)
+
+def data_version():
+    """
+    Version of the mirrored inspection data (changes whenever a sync brings new or edited rows).
+    Use it as the cache key for anything derived from fetch_all_data().
+    """
+    _ensure_mirror()
+    return sheet_mirror.get_meta()["version"]
+
+def changes_since(version):
+    """
+    Mirror rows written after `version`, for patching derived caches
+    (see sheet_mirror.changes_since). Returns: (records or None = rebuild, current version)
+    """
+    _ensure_mirror()
+    return sheet_mirror.changes_since(version)
+
+def query_rows(with_row=False, **filters):
+    """
+    Indexed local query over the mirror (see sheet_mirror.query_rows for filters).
+    While the mirror holds no data at all (GAS unreachable on cold start), the same filters
+    run server-side instead, so only the matching rows are downloaded.
+    """
+    _ensure_mirror()
+    meta = sheet_mirror.get_meta()
+    if not meta["synced"] and meta["cursor"] <= 1:
+        rows, total = fetch_rows_remote(**filters)
+        # Filtered server-side (failed request: None; older deployments return everything: total None)
+        if rows is not None and total is not None:
+            if not with_row:
+                rows = rows.drop(columns="row", errors="ignore")
+            return rows.to_dict("records")
+    return sheet_mirror.query_rows(with_row=with_row, **filters)
+
+def distinct_values(column, **filters):
+    """
+    Distinct values of a mirror column, for filter dropdowns.
+    """
+    _ensure_mirror()
+    return sheet_mirror.distinct_values(column, **filters)
+
+def clear_caches():
+    """
+    Drops the full-download fallback cache (manual refresh). Writes do not need it: they patch
+    the mirror rows they touched (see _patch_appended, update_status_v2).
+    """
+    _fetch_all_data_remote.clear()
 
-@st.cache_data(ttl=600) # Cache 10min as requested
 def fetch_all_data():
     """
-    Fetches ALL data from GAS for the Dashboard.
+    ALL data for the Dashboard, read from the local mirror
+    (kept current by the incremental background sync).
     Returns: List of dicts.
     """
+    _ensure_mirror()
+    return sheet_mirror.query_rows()
+
+def fetch_rows_remote(part_no=None, model=None, statuses=None, start=None, end=None,
+                      has_change_point=False, columns=None, page=1, limit=None):
+    """
+    'get_all_data' with the filtering, column projection and paging done by GAS.
+    Filters have the same meaning as sheet_mirror.query_rows; all are optional.
+    part_no: one sheet part number or a list. columns: fields to return (default: all + 'row').
+    page is 1-based; limit=None returns every match at once.
+    Returns: (DataFrame, total matches over all pages), or (None, 0) if the request failed.
+    Older GAS deployments ignore filters and paging: every row comes back with total None.
+    """
+    payload = {"action": "get_all_data", "page": int(page), **BULK_ENCODING}
+    if limit:
+        payload["limit"] = int(limit)
+    if part_no:
+        payload["part_nos"] = list(part_no) if isinstance(part_no, (list, tuple, set)) else [part_no]
+    if model:
+        payload["model"] = model
+    if statuses:
+        payload["statuses"] = list(statuses)
+    if start:
+        payload["start"] = str(start)
+    if end:
+        payload["end"] = str(end)
+    if has_change_point:
+        payload["has_change_point"] = True
+    if columns:
+        payload["columns"] = list(columns)
     try:
-        payload = {
-            "action": "get_all_data" 
-        }
-        response = requests.post(GAS_URL, json=payload, timeout=15)
-        
-        if response.status_code == 200:
-            resp_json = response.json()
-            if resp_json.get("status") == "Success":
-                return resp_json.get("data", [])
-            else:
-                return []
-        else:
-            return []
+        response = _post(payload)
+        if response.status_code != 200:
+            return None, 0
+        resp_json = response.json()
+        if resp_json.get("status") != "Success":
+            return None, 0
+        rows = decode_bulk(resp_json)
     except Exception as e:
-        print(f"Error fetching dashboard data: {e}")
-        return []
+        print(f"Error fetching rows: {e}")
+        return None, 0
+    total = resp_json.get("total")
+    return rows, None if total is None else int(total)
+
+@st.cache_data(ttl=600) # Cache 10min as requested
+def _fetch_all_data_remote():
+    # [Perf] Paged, so a large sheet never has to fit into one GAS response
+    pages, fetched, page = [], 0, 1
+    while True:
+        batch, total = fetch_rows_remote(page=page, limit=ALL_DATA_PAGE_SIZE)
+        if batch is None:
+            return pd.DataFrame()
+        pages.append(batch)
+        fetched += len(batch)
+        if total is None or batch.empty or fetched >= total:
+            return pd.concat(pages, ignore_index=True)
+        page += 1
 
 def update_status_v2(timestamp, status, comment, part_no="", apply_all=True, change_point=None):
     """
@@ -194,18 +769,72 @@ def update_status_v2(timestamp, status, comment, part_no="", apply_all=True, cha
         }
         if change_point is not None:
             payload["change_point"] = change_point
-        # Clear cache immediately since we are updating data
-        fetch_history.clear()
-        fetch_all_data.clear()
-        
-        response = requests.post(GAS_URL, json=payload, timeout=10)
+        response = _post(payload)
         if response.status_code == 200:
+            resp_json = response.json()
+            # GAS reports a missing row as HTTP 200 + status Error
+            if resp_json.get("status") != "Success":
+                return False, resp_json.get("message", response.text)
+            # Write the edit through to the mirror rows GAS reports (older deployments: sync)
+            edited = resp_json.get("rows")
+            fields = {"status": status, "manager_comment": comment}
+            if change_point is not None:
+                fields["change_point"] = change_point
+            if edited is None:
+                sync_rows()
+            else:
+                sheet_mirror.patch_fields(edited, fields)
             return True, "Update Success"
         else:
             return False, f"HTTP Error: {response.status_code}"
     except Exception as e:
         return False, str(e)
 
+def update_status_bulk(updates):
+    """
+    Many status updates in one GAS round trip (e.g. closing every open event of a part);
+    GAS writes them grouped per column with RangeList instead of cell by cell.
+    updates: [{'timestamp', 'status', 'manager_comment' (optional), 'part_no' (optional),
+               'apply_all' (default True), 'change_point' (optional)}]
+    An omitted manager_comment / change_point keeps the value already in the sheet.
+    Returns: (ok, results) where results is GAS's per-update list
+             [{'index': i, 'status': 'Success'|'Error', 'rows': [sheet rows], 'message': ...}],
+             or (False, error message) if the request itself failed.
+    """
+    items = []
+    for u in updates:
+        item = {
+            "timestamp": u["timestamp"],
+            "status": u["status"],
+            "part_no": u.get("part_no", ""),
+            "apply_all": u.get("apply_all", True)
+        }
+        if u.get("manager_comment") is not None:
+            item["manager_comment"] = u["manager_comment"]
+        if u.get("change_point") is not None:
+            item["change_point"] = u["change_point"]
+        items.append(item)
+    if not items:
+        return True, []
+    try:
+        response = _post({"action": "update_status_bulk", "updates": items})
+        if response.status_code != 200:
+            return False, f"HTTP Error: {response.status_code}"
+        resp_json = response.json()
+        results = resp_json.get("results")
+        if results is None:
+            return False, f"GAS Error: {resp_json.get('message', response.text)}"
+
+        # Write the edits through to the mirror rows GAS reports
+        for res in results:
+            if res.get("status") == "Success":
+                item = items[res["index"]]
+                fields = {k: item[k] for k in ("status", "manager_comment", "change_point") if k in item}
+                sheet_mirror.patch_fields(res.get("rows", []), fields)
+        return all(r.get("status") == "Success" for r in results), results
+    except Exception as e:
+        return False, str(e)
+
 # --- Deprecated / Unused Legacy Functions (Kept empty/mocked if imports exist somewhere) ---
 # We keep these signatures just in case app.py calls them individually during transition,
 # effectively we should update app.py to call `upload_and_append` instead.
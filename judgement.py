@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+# PASS/NG judgement of weight/length measurements against spec limits, on whole arrays at once.
+# Shared by the inspection submit path (one row per cavity) and the dashboard, which can
+# re-judge historical rows against the current parts_data.csv limits in one pass.
+PASS = "PASS"
+NG = "NG"
+CP = "CP" # Quick log (change point only, no measurement) - never re-judged
+
+def _as_float(values):
+    arr = np.asarray(values)
+    if arr.dtype.kind in "biuf":
+        return arr.astype("float64")
+    # Sheet values: numbers mixed with "" / None / text
+    return pd.to_numeric(pd.Series(arr, dtype=object), errors="coerce").to_numpy(dtype="float64")
+
+def _out_of_range(values, low, high):
+    # A limit pair only applies when both ends are set; a missing measurement is not judged
+    checked = ~np.isnan(low) & ~np.isnan(high) & ~np.isnan(values)
+    with np.errstate(invalid="ignore"):
+        outside = (values < low) | (values > high)
+    return checked & outside
+
+def judge(weights, lengths, w_min, w_max, l_min, l_max):
+    """
+    Vectorized PASS/NG (limits inclusive). All arguments are equal-length arrays;
+    None / NaN / "" means "not measured" or "no limit".
+    Returns: ndarray of "PASS" / "NG".
+    """
+    weights, lengths = _as_float(weights), _as_float(lengths)
+    w_min, w_max, l_min, l_max = (_as_float(v) for v in (w_min, w_max, l_min, l_max))
+    ng = _out_of_range(weights, w_min, w_max) | _out_of_range(lengths, l_min, l_max)
+    return np.where(ng, NG, PASS)
+
+def judge_cavity(cavity, weight, length=None):
+    """
+    Single measurement against a part_specs.CavitySpec (the submit path).
+    """
+    return str(judge([weight], [length], [cavity.min], [cavity.max], [cavity.len_min], [cavity.len_max])[0])
+
+def limits_for(part_nos, registry):
+    """
+    Spec limits for sheet part numbers (with cavity suffix), resolved once per unique part.
+    Returns: (known, w_min, w_max, l_min, l_max) arrays; known is False for parts not in the master.
+    """
+    codes, uniques = pd.factorize(pd.Series(part_nos, dtype=object).astype(str))
+    table = np.full((len(uniques) + 1, 5), np.nan) # Last row: code -1 (missing part_no)
+    for i, part_no in enumerate(uniques):
+        _, cavity = registry.resolve(part_no)
+        if cavity is not None:
+            table[i] = (1.0, *(np.nan if v is None else v for v in (cavity.min, cavity.max, cavity.len_min, cavity.len_max)))
+    rows = table[codes]
+    return ~np.isnan(rows[:, 0]), rows[:, 1], rows[:, 2], rows[:, 3], rows[:, 4]
+
+def rejudge(df, registry):
+    """
+    Re-judges inspection rows (columns part_no, weight, length, result) against the current specs.
+    CP rows and rows of parts no longer in the master keep their stored result.
+    Returns: Series of results aligned with df.
+    """
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    known, w_min, w_max, l_min, l_max = limits_for(df['part_no'], registry)
+    lengths = df['length'] if 'length' in df.columns else np.full(len(df), np.nan)
+    judged = judge(df['weight'], lengths, w_min, w_max, l_min, l_max)
+    stored = df['result'].to_numpy(dtype=object) if 'result' in df.columns else np.full(len(df), None)
+    keep = ~known | (stored == CP)
+    return pd.Series(np.where(keep, stored, judged), index=df.index)
+
+def ng_rates(df, registry, freq="MS", by=None):
+    """
+    NG rate per period (and optionally per column `by`, e.g. 'part_no'): stored result vs. re-judged
+    against the current limits. CP rows are not inspections and are left out.
+    Returns: DataFrame [inspections, ng_stored, ng_rejudged, ng_rate_stored, ng_rate_rejudged].
+    """
+    columns = ['inspections', 'ng_stored', 'ng_rejudged', 'ng_rate_stored', 'ng_rate_rejudged']
+    if df.empty or 'timestamp' not in df.columns:
+        return pd.DataFrame(columns=columns)
+    rows = df[df['result'] != CP]
+    frame = pd.DataFrame({
+        'timestamp': rows['timestamp'],
+        'ng_stored': (rows['result'] == NG).to_numpy(),
+        'ng_rejudged': (rejudge(rows, registry) == NG).to_numpy()
+    }, index=rows.index)
+    keys = [pd.Grouper(key='timestamp', freq=freq)]
+    if by:
+        frame[by] = rows[by]
+        keys.append(by)
+    summary = frame.groupby(keys).agg(
+        inspections=('ng_stored', 'size'), ng_stored=('ng_stored', 'sum'), ng_rejudged=('ng_rejudged', 'sum')
+    )
+    summary = summary[summary['inspections'] > 0]
+    summary['ng_rate_stored'] = summary['ng_stored'] / summary['inspections']
+    summary['ng_rate_rejudged'] = summary['ng_rejudged'] / summary['inspections']
+    return summary
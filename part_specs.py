@@ -0,0 +1,155 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Compiled spec registry: one PartSpec per 品番, built once per parts-master load.
+# Replaces the per-render spec assembly (force_dual / is_dual / get_spec_val / specs list)
+# so the inspection form, the PASS/NG check and the charts look limits up in O(1).
+NUMERIC_COLS = ['重量', '重量上限', '重量下限', '標準長度', '長度上限', '長度下限']
+NUMBERED_CAVITY_CONFIGS = ('1/2', '1,2', '#1/#2') # Also forces dual mode
+SECOND_CAVITY_ENDINGS = ('_L', '_2', '#2')
+
+@dataclass(frozen=True, slots=True)
+class CavitySpec:
+    suffix: str # Appended to 品番 in the sheet ("" for single cavity)
+    label: str # e.g. " (右/R)"
+    header: str # e.g. "R"
+    std: float | None
+    max: float | None
+    min: float | None
+    len_std: float | None
+    len_max: float | None
+    len_min: float | None
+
+    def weight_limits(self):
+        return self.min, self.max
+
+    def length_limits(self):
+        return self.len_min, self.len_max
+
+@dataclass(frozen=True, slots=True)
+class PartSpec:
+    part_no: str
+    model: str
+    name: str
+    cavity_config: str
+    cavities: tuple
+
+    @property
+    def is_dual(self):
+        return len(self.cavities) > 1
+
+    def cavity_for(self, sheet_part_no):
+        """
+        Cavity of a sheet part number (e.g. 'XXX_L', 'XXX_2'); falls back to the first cavity.
+        """
+        text = str(sheet_part_no)
+        for cavity in self.cavities:
+            if cavity.suffix and text.endswith(cavity.suffix):
+                return cavity
+        if len(self.cavities) > 1 and text.endswith(SECOND_CAVITY_ENDINGS):
+            return self.cavities[1]
+        return self.cavities[0]
+
+def _num(val):
+    return None if val is None or np.isnan(val) else float(val)
+
+def _spec_value(values, n, idx):
+    # Per-cavity value from the typed clean_* columns (see utils.parse_numeric_series)
+    if n > 1:
+        return _num(values[idx]) if idx < n and idx < len(values) else None
+    if n == 1:
+        return _num(values[0])
+    return None
+
+def _typed(df, col):
+    value_cols = [f'clean_{col}_{i}' for i in range(8) if f'clean_{col}_{i}' in df.columns]
+    if not value_cols:
+        return np.full((len(df), 1), np.nan), np.zeros(len(df), dtype=int)
+    return df[value_cols].to_numpy(dtype="float64"), df[f'clean_{col}_n'].to_numpy()
+
+def _build_part(row, typed, i):
+    cavity_config = str(row.get('穴號顯示', '')).strip()
+    numbered = cavity_config in NUMBERED_CAVITY_CONFIGS
+    w_values, w_n = typed['重量'][0][i], typed['重量'][1][i]
+    is_dual = w_n > 1 or numbered
+
+    def val(col, idx):
+        values, n = typed[col][0][i], typed[col][1][i]
+        return _spec_value(values, n, idx)
+
+    if is_dual:
+        if numbered:
+            layout = ((" (#1)", "#1", "_1"), (" (#2)", "#2", "_2"))
+        else:
+            layout = ((" (右/R)", "R", "_R"), (" (左/L)", "L", "_L"))
+        # If forced dual but weight is scalar, duplicate it for both cavities
+        cavities = tuple(
+            CavitySpec(
+                suffix=suffix, label=label, header=header,
+                std=val('重量', idx) if w_n > 1 else _spec_value(w_values, w_n, 0),
+                max=val('重量上限', idx), min=val('重量下限', idx),
+                len_std=val('標準長度', idx), len_max=val('長度上限', idx), len_min=val('長度下限', idx)
+            )
+            for idx, (label, header, suffix) in enumerate(layout)
+        )
+    else:
+        # Single cavity: a stray list limit uses its first value (as the trend charts did)
+        cavities = (CavitySpec(
+            suffix="", label="", header="",
+            std=val('重量', 0), max=val('重量上限', 0), min=val('重量下限', 0),
+            len_std=val('標準長度', 0), len_max=val('長度上限', 0), len_min=val('長度下限', 0)
+        ),)
+
+    name = row.get('品名', '')
+    return PartSpec(
+        part_no=row['品番'],
+        model=row.get('車型', ''),
+        name='' if pd.isna(name) else str(name),
+        cavity_config=cavity_config,
+        cavities=cavities
+    )
+
+class SpecRegistry:
+    """
+    PartSpec lookup by 品番 (first row wins, as with df[df['品番'] == x].iloc[0]) or by (車型, 品番).
+    """
+    __slots__ = ("by_part", "by_model_part")
+
+    def __init__(self, df):
+        self.by_part = {}
+        self.by_model_part = {}
+        if df.empty or '品番' not in df.columns:
+            return
+        typed = {col: _typed(df, col) for col in NUMERIC_COLS}
+        records = df.to_dict('records')
+        for i, row in enumerate(records):
+            key = (row.get('車型'), row['品番'])
+            if key in self.by_model_part:
+                continue
+            spec = _build_part(row, typed, i)
+            self.by_model_part[key] = spec
+            self.by_part.setdefault(spec.part_no, spec)
+
+    def get(self, part_no, model=None):
+        if model is not None:
+            spec = self.by_model_part.get((model, part_no))
+            if spec is not None:
+                return spec
+        return self.by_part.get(part_no)
+
+    def resolve(self, sheet_part_no):
+        """
+        PartSpec + CavitySpec for a part number as stored in the sheet (with cavity suffix,
+        e.g. 'XXX_R', 'XXX_2' or 'XXX #2'). Returns (None, None) if unknown.
+        """
+        text = str(sheet_part_no)
+        spec = self.by_part.get(text)
+        if spec is None and '_' in text:
+            spec = self.by_part.get(text.rsplit('_', 1)[0])
+        if spec is None:
+            spec = self.by_part.get(text.split(' ')[0])
+        if spec is None:
+            return None, None
+        return spec, spec.cavity_for(text)
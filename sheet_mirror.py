@@ -0,0 +1,264 @@
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import pandas as pd
+
+# Local SQLite mirror of the inspection Google Sheet.
+# Rows are keyed by their sheet row number (same cursor GAS 'get_rows_since' uses),
+# so new rows insert and edited rows overwrite in place.
+MIRROR_PATH = os.path.join(".sheet_cache", "mirror.db")
+
+# Sheet column order (V6): [Timestamp, Model, PartNo, PartName, Type, Weight, Length, Material,
+#                           ChangePoint, ActionTaken, Status, Comment, Result, Image]
+COLUMNS = [
+    "timestamp", "model", "part_no", "part_name", "inspection_type", "weight", "length",
+    "material_ok", "change_point", "action_taken", "status", "manager_comment", "result", "image"
+]
+
+_write_lock = threading.Lock()
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS rows (
+    row INTEGER PRIMARY KEY,
+    {", ".join(f"{c} TEXT" for c in COLUMNS)},
+    ts_sort TEXT,  -- Normalized 'YYYY-MM-DD HH:MM:SS' for range queries (display strings vary: 9:00 vs 09:00)
+    version INTEGER DEFAULT 0  -- Mirror version that last wrote the row (see changes_since)
+);
+CREATE INDEX IF NOT EXISTS idx_rows_part_no ON rows(part_no);
+CREATE INDEX IF NOT EXISTS idx_rows_ts_sort ON rows(ts_sort);
+CREATE INDEX IF NOT EXISTS idx_rows_status ON rows(status);
+CREATE INDEX IF NOT EXISTS idx_rows_model ON rows(model);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# version: bumped on every delta that changes rows (cache key for derived dashboard data)
+# reset_version: last version that replaced or deleted rows (caches older than it must rebuild)
+_DEFAULT_META = {"cursor": "1", "rev": "0", "anchor_ts": "", "synced": "0", "version": "0", "reset_version": "0"}
+
+def _connect(path=None):
+    path = path or MIRROR_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")  # Readers never block the background sync
+    conn.executescript(_SCHEMA)
+    # [Migration] Mirrors created before per-row versions
+    if "version" not in {r["name"] for r in conn.execute("PRAGMA table_info(rows)")}:
+        conn.execute("ALTER TABLE rows ADD COLUMN version INTEGER DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rows_version ON rows(version)")
+    return conn
+
+def _normalize_timestamps(values):
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), errors="coerce", format="mixed")
+    return [None if pd.isna(t) else t.strftime("%Y-%m-%d %H:%M:%S") for t in parsed]
+
+def get_meta(path=None):
+    """
+    Returns the sync state:
+    {'cursor': int, 'rev': int, 'anchor_ts': str, 'synced': bool, 'version': int, 'reset_version': int}
+    """
+    with closing(_connect(path)) as conn:
+        meta = dict(_DEFAULT_META)
+        meta.update({r["key"]: r["value"] for r in conn.execute("SELECT key, value FROM meta")})
+    return {
+        "cursor": int(meta["cursor"]),
+        "rev": int(meta["rev"]),
+        "anchor_ts": meta["anchor_ts"],
+        "synced": meta["synced"] == "1",
+        "version": int(meta["version"]),
+        "reset_version": int(meta["reset_version"])
+    }
+
+def apply_delta(records, last_row, rev, reset=False, synced=True, path=None):
+    """
+    Merges a 'get_rows_since' response into the mirror in one transaction.
+    records: list of dicts with a 'row' key, or a DataFrame with a 'row' column.
+    reset=True replaces the whole table.
+    synced=False marks the data as a seed (cursor/rev not trusted for incremental sync).
+    """
+    params = _row_params(records)
+    with _write_lock, closing(_connect(path)) as conn:
+        with conn:
+            old = dict(conn.execute("SELECT key, value FROM meta WHERE key IN ('cursor', 'version')").fetchall())
+            version = int(old.get("version", 0))
+            if params or reset or int(old.get("cursor", 1)) != int(last_row):
+                version += 1
+            if reset:
+                conn.execute("DELETE FROM rows")
+            _upsert(conn, params, version)
+            # Rows deleted at the bottom of the sheet. Only when the sheet shrank below our cursor:
+            # rows past it may be write-through appends (patch_rows) newer than this response.
+            deleted = 0
+            if reset or int(last_row) < int(old.get("cursor", 1)):
+                deleted = conn.execute("DELETE FROM rows WHERE row > ?", (int(last_row),)).rowcount
+            anchor = conn.execute("SELECT timestamp FROM rows WHERE row = ?", (int(last_row),)).fetchone()
+            meta = [
+                ("cursor", str(int(last_row))),
+                ("rev", str(int(rev))),
+                ("anchor_ts", anchor["timestamp"] if anchor and anchor["timestamp"] else ""),
+                ("synced", "1" if synced else "0"),
+                ("version", str(version))
+            ]
+            if reset or deleted:
+                meta.append(("reset_version", str(version)))
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", meta)
+
+def _row_params(records):
+    # records: list of dicts, or a DataFrame (columnar bulk read); each with the sheet 'row'
+    if isinstance(records, pd.DataFrame):
+        if records.empty:
+            return []
+        frame = records.reindex(columns=["row"] + COLUMNS, fill_value="")
+        ts_sort = _normalize_timestamps(frame["timestamp"].tolist())
+        columns = [frame[c].tolist() for c in COLUMNS]
+        return [
+            [int(row)] + [_as_text(v) for v in values] + [ts]
+            for row, ts, *values in zip(frame["row"].tolist(), ts_sort, *columns)
+        ]
+    ts_sort = _normalize_timestamps([r.get("timestamp") for r in records])
+    return [
+        [int(r["row"])] + [_as_text(r.get(c)) for c in COLUMNS] + [ts]
+        for r, ts in zip(records, ts_sort)
+    ]
+
+def _upsert(conn, params, version):
+    conn.executemany(
+        f"INSERT OR REPLACE INTO rows (row, {', '.join(COLUMNS)}, ts_sort, version) "
+        f"VALUES ({', '.join('?' * (len(COLUMNS) + 3))})",
+        [p + [version] for p in params]
+    )
+
+def _bump_version(conn):
+    row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    version = int(row["value"] if row else 0) + 1
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(version),))
+    return version
+
+def patch_rows(records, path=None):
+    """
+    Write-through of rows this process just appended to the sheet (records carry the
+    sheet 'row' GAS assigned), so they show without waiting for a sync.
+    Cursor/rev are left alone: the next sync still downloads these rows and overwrites
+    them with the sheet's own values.
+    Returns: the new mirror version (None if there was nothing to write).
+    """
+    params = _row_params(records)
+    if not params:
+        return None
+    with _write_lock, closing(_connect(path)) as conn:
+        with conn:
+            version = _bump_version(conn)
+            _upsert(conn, params, version)
+    return version
+
+def patch_fields(rows, fields, path=None):
+    """
+    Write-through of an in-place edit (e.g. update_status) to the given sheet rows.
+    fields: {column: value}. Returns: the new mirror version (None if no row was touched).
+    """
+    rows = [int(r) for r in rows]
+    unknown = set(fields) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown column: {', '.join(sorted(unknown))}")
+    if not rows or not fields:
+        return None
+    with _write_lock, closing(_connect(path)) as conn:
+        with conn:
+            version = _bump_version(conn)
+            assignments = ", ".join(f"{c} = ?" for c in fields) + ", version = ?"
+            touched = conn.execute(
+                f"UPDATE rows SET {assignments} WHERE row IN ({', '.join('?' * len(rows))})",
+                [_as_text(v) for v in fields.values()] + [version] + rows
+            ).rowcount
+            if not touched:
+                conn.rollback()
+                return None
+    return version
+
+def changes_since(version, path=None):
+    """
+    Rows written after mirror version `version` (for patching caches instead of rebuilding them).
+    Returns: (records with their 'row', current version). records is None when the caller
+    must rebuild from scratch (no base version, or rows were replaced/deleted since).
+    """
+    with closing(_connect(path)) as conn:
+        meta = {r["key"]: r["value"] for r in conn.execute(
+            "SELECT key, value FROM meta WHERE key IN ('version', 'reset_version')"
+        )}
+        current = int(meta.get("version", 0))
+        if version is None or int(version) < int(meta.get("reset_version", 0)):
+            return None, current
+        # Rows written after 'current' are picked up by the next call
+        records = [dict(r) for r in conn.execute(
+            f"SELECT row, {', '.join(COLUMNS)} FROM rows WHERE version > ? AND version <= ? ORDER BY row",
+            (int(version), current)
+        )]
+    return records, current
+
+def _as_text(val):
+    if val is None or (isinstance(val, float) and val != val): # None / NaN (missing in a frame)
+        return ""
+    return str(val)
+
+def query_rows(part_no=None, model=None, statuses=None, start=None, end=None,
+               has_change_point=False, with_row=False, path=None):
+    """
+    Indexed local query. All filters are optional.
+    start/end: datetime.date or 'YYYY-MM-DD' strings (inclusive).
+    Returns: List of dicts in sheet order, same shape as GAS 'get_all_data'
+    (plus the sheet 'row' if with_row=True).
+    """
+    where, args = [], []
+    if part_no:
+        if isinstance(part_no, (list, tuple, set)):
+            where.append(f"part_no IN ({', '.join('?' * len(part_no))})")
+            args.extend(part_no)
+        else:
+            where.append("part_no = ?")
+            args.append(part_no)
+    if model:
+        where.append("model = ?")
+        args.append(model)
+    if statuses:
+        where.append(f"status IN ({', '.join('?' * len(statuses))})")
+        args.extend(statuses)
+    if start:
+        where.append("ts_sort >= ?")
+        args.append(f"{start} 00:00:00")
+    if end:
+        where.append("ts_sort <= ?")
+        args.append(f"{end} 23:59:59")
+    if has_change_point:
+        where.append("change_point != ''")
+
+    sql = f"SELECT {'row, ' if with_row else ''}{', '.join(COLUMNS)} FROM rows"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY row"
+
+    with closing(_connect(path)) as conn:
+        return [dict(r) for r in conn.execute(sql, args)]
+
+def distinct_values(column, has_change_point=False, model=None, path=None):
+    """
+    Distinct values of one column (for filter dropdowns), in first-seen order.
+    """
+    if column not in COLUMNS:
+        raise ValueError(f"Unknown column: {column}")
+    where, args = [], []
+    if has_change_point:
+        where.append("change_point != ''")
+    if model:
+        where.append("model = ?")
+        args.append(model)
+    sql = f"SELECT {column}, MIN(row) AS first_row FROM rows"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" GROUP BY {column} ORDER BY first_row"
+    with closing(_connect(path)) as conn:
+        return [r[column] for r in conn.execute(sql, args)]
@@ -0,0 +1,208 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import judgement
+
+# Statistical process control over the full inspection history, computed for every part/cavity
+# (sheet part_no, e.g. 'XXX_R') in one grouped pass:
+#   - Individuals (I-MR) chart: CL = mean, sigma(within) = MR-bar / d2, UCL/LCL = CL +/- 3 sigma
+#   - X-bar/R chart on consecutive subgroups of SUBGROUP_SIZE
+#   - Rolling mean / sigma, Cp/Cpk (sigma within) and Pp/Ppk (overall sigma) vs. 重量上限/重量下限
+#   - Western Electric / Nelson rules on the individuals chart
+# Pure pandas/NumPy; the dashboard caches the result per data version (see app.py load_spc).
+ROLLING_WINDOW = 20
+SUBGROUP_SIZE = 5
+MIN_POINTS = 2 # Fewer measurements: no chart statistics for the part
+
+# Control chart constants by subgroup size n: (d2, A2, D3, D4)
+CHART_CONSTANTS = {
+    2: (1.128, 1.880, 0.0, 3.267), 3: (1.693, 1.023, 0.0, 2.574), 4: (2.059, 0.729, 0.0, 2.282),
+    5: (2.326, 0.577, 0.0, 2.114), 6: (2.534, 0.483, 0.0, 2.004), 7: (2.704, 0.419, 0.076, 1.924),
+    8: (2.847, 0.373, 0.136, 1.864), 9: (2.970, 0.337, 0.184, 1.816), 10: (3.078, 0.308, 0.223, 1.777)
+}
+
+# Nelson rules (1-4 and 5-8 are also the Western Electric zone/run tests), as bit flags on a point.
+# A run rule flags the last point of the run.
+RULES = {
+    1: "1 點超出 3σ",
+    2: "連續 9 點在中心線同側",
+    3: "連續 6 點遞增或遞減",
+    4: "連續 14 點上下交錯",
+    5: "3 點中 2 點超出 2σ (同側)",
+    6: "5 點中 4 點超出 1σ (同側)",
+    7: "連續 15 點在 1σ 內",
+    8: "連續 8 點在 1σ 外 (兩側)"
+}
+
+@dataclass(frozen=True)
+class SPCResult:
+    points: pd.DataFrame # One row per measurement (sorted by part_no, timestamp)
+    summary: pd.DataFrame # One row per part_no: capability + violation counts
+    subgroups: pd.DataFrame # X-bar/R chart: one row per (part_no, subgroup)
+
+    def part(self, part_no):
+        """
+        (points, summary row or None, subgroups) of one sheet part number.
+        """
+        # Both tables are sorted by part_no: binary search instead of a full scan
+        summary = self.summary.loc[part_no] if part_no in self.summary.index else None
+        return _slice(self.points, part_no), summary, _slice(self.subgroups, part_no)
+
+def _slice(frame, part_no):
+    keys = frame['part_no'].to_numpy()
+    start, end = np.searchsorted(keys, part_no, side='left'), np.searchsorted(keys, part_no, side='right')
+    return frame.iloc[start:end]
+
+def rule_names(mask):
+    return [name for bit, name in RULES.items() if int(mask) & (1 << (bit - 1))]
+
+def _prepare(df):
+    # Measured rows only: CP (quick log) rows and missing / zero weights are not samples
+    frame = pd.DataFrame({
+        'part_no': df['part_no'].astype(str),
+        'timestamp': df['timestamp'],
+        'weight': pd.to_numeric(df['weight'], errors='coerce')
+    })
+    if 'result' in df.columns:
+        frame = frame[df['result'] != judgement.CP]
+    frame = frame[frame['weight'] > 0]
+    # Stable sort keeps sheet order for equal timestamps
+    return frame.sort_values(['part_no', 'timestamp'], kind='stable').reset_index(drop=True)
+
+def _window_count(flags, pos, k):
+    """
+    Number of True flags in the last k points of each group (-1 until the group has k points).
+    One cumulative sum over all groups; windows never cross a group boundary because of pos.
+    """
+    csum = np.concatenate(([0], np.cumsum(flags, dtype=np.int64)))
+    idx = np.arange(len(flags))
+    counts = csum[idx + 1] - csum[np.maximum(idx + 1 - k, 0)]
+    return np.where(pos >= k - 1, counts, -1)
+
+def _rule_mask(z, diff, pos):
+    above, below = z > 0, z < 0
+    mask = np.zeros(len(z), dtype=np.int64)
+
+    def flag(bit, hit):
+        mask[hit] |= 1 << (bit - 1)
+
+    flag(1, np.abs(z) > 3)
+    flag(2, (_window_count(above, pos, 9) == 9) | (_window_count(below, pos, 9) == 9))
+    # 6 points steadily increasing/decreasing = 5 consecutive rises/falls
+    rising, falling = (diff > 0) & (pos >= 1), (diff < 0) & (pos >= 1)
+    flag(3, (_window_count(rising, pos, 5) == 5) | (_window_count(falling, pos, 5) == 5))
+    # 14 points alternating = 12 consecutive direction changes
+    prev_diff = np.concatenate(([np.nan], diff[:-1]))
+    alternating = (diff * prev_diff < 0) & (pos >= 2)
+    flag(4, _window_count(alternating, pos, 12) == 12)
+    flag(5, (_window_count(z > 2, pos, 3) >= 2) | (_window_count(z < -2, pos, 3) >= 2))
+    flag(6, (_window_count(z > 1, pos, 5) >= 4) | (_window_count(z < -1, pos, 5) >= 4))
+    flag(7, _window_count(np.abs(z) < 1, pos, 15) == 15)
+    flag(8, _window_count(np.abs(z) > 1, pos, 8) == 8)
+    return mask
+
+def _capability(summary):
+    usl, lsl = summary['usl'], summary['lsl']
+    mean, within, overall = summary['mean'], summary['sigma_within'], summary['sigma_overall']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        summary['cp'] = (usl - lsl) / (6 * within)
+        summary['pp'] = (usl - lsl) / (6 * overall)
+        # One-sided spec: Cpk/Ppk from the side that exists
+        summary['cpk'] = np.fmin((usl - mean) / (3 * within), (mean - lsl) / (3 * within))
+        summary['ppk'] = np.fmin((usl - mean) / (3 * overall), (mean - lsl) / (3 * overall))
+    for col in ('cp', 'pp', 'cpk', 'ppk'):
+        summary[col] = summary[col].replace([np.inf, -np.inf], np.nan)
+    return summary
+
+def _subgroups(points, size):
+    d2, a2, d3, d4 = CHART_CONSTANTS[size]
+    frame = points[['part_no', 'timestamp', 'weight']].copy()
+    frame['subgroup'] = points['pos'].to_numpy() // size
+    groups = frame.groupby(['part_no', 'subgroup'], sort=False)
+    sub = groups.agg(
+        timestamp=('timestamp', 'last'), n=('weight', 'size'),
+        xbar=('weight', 'mean'), wmax=('weight', 'max'), wmin=('weight', 'min')
+    ).reset_index()
+    sub = sub[sub['n'] == size] # Incomplete last subgroup is left out of the chart
+    sub['range'] = sub['wmax'] - sub['wmin']
+    per_part = sub.groupby('part_no', sort=False)
+    xbarbar = per_part['xbar'].transform('mean')
+    rbar = per_part['range'].transform('mean')
+    sub['xbar_cl'] = xbarbar
+    sub['xbar_ucl'] = xbarbar + a2 * rbar
+    sub['xbar_lcl'] = xbarbar - a2 * rbar
+    sub['r_cl'] = rbar
+    sub['r_ucl'] = d4 * rbar
+    sub['r_lcl'] = d3 * rbar
+    sub['out_of_control'] = (
+        (sub['xbar'] > sub['xbar_ucl']) | (sub['xbar'] < sub['xbar_lcl']) |
+        (sub['range'] > sub['r_ucl']) | (sub['range'] < sub['r_lcl'])
+    )
+    return sub.drop(columns=['wmax', 'wmin']).reset_index(drop=True)
+
+def compute(df, registry, window=ROLLING_WINDOW, subgroup_size=SUBGROUP_SIZE):
+    """
+    SPC for every part/cavity in df (columns part_no, timestamp, weight[, result]).
+    registry: part_specs.SpecRegistry (weight spec limits per cavity).
+    Returns: SPCResult
+    """
+    points = _prepare(df)
+    group = points.groupby('part_no', sort=False)['weight']
+    points['pos'] = group.cumcount().to_numpy()
+    points['n'] = group.transform('size')
+
+    # Individuals chart: MR-bar / d2 per part
+    diff = group.diff().to_numpy()
+    points['mr'] = np.abs(diff)
+    mr_bar = points.groupby('part_no', sort=False)['mr'].transform('mean')
+    points['sigma_within'] = mr_bar / CHART_CONSTANTS[2][0]
+    points['cl'] = group.transform('mean')
+    points['ucl'] = points['cl'] + 3 * points['sigma_within']
+    points['lcl'] = points['cl'] - 3 * points['sigma_within']
+
+    rolling = group.rolling(window, min_periods=MIN_POINTS)
+    points['roll_mean'] = rolling.mean().droplevel(0)
+    points['roll_std'] = rolling.std().droplevel(0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = ((points['weight'] - points['cl']) / points['sigma_within']).to_numpy()
+    z = np.where(np.isfinite(z), z, 0.0)
+    # Constant series (sigma 0) have no control limits to test against
+    enough = ((points['n'] >= MIN_POINTS) & (points['sigma_within'] > 0)).to_numpy()
+    points['rules'] = np.where(enough, _rule_mask(z, np.nan_to_num(diff, nan=0.0), points['pos'].to_numpy()), 0)
+
+    # Capability per part against the current spec limits
+    summary = group.agg(n='size', mean='mean', sigma_overall='std')
+    summary['sigma_within'] = points.groupby('part_no', sort=False)['sigma_within'].first()
+    summary['violations'] = (points['rules'] != 0).groupby(points['part_no'], sort=False).sum()
+    _, w_min, w_max, _, _ = judgement.limits_for(summary.index, registry)
+    summary['usl'], summary['lsl'] = w_max, w_min
+    summary = _capability(summary)
+    summary.loc[summary['n'] < MIN_POINTS, ['sigma_within', 'cp', 'cpk', 'pp', 'ppk']] = np.nan
+
+    return SPCResult(points=points, summary=summary, subgroups=_subgroups(points, subgroup_size))
+
+def update(result, df, registry, part_nos, window=ROLLING_WINDOW, subgroup_size=SUBGROUP_SIZE):
+    """
+    result with the parts in part_nos recomputed from df (full history) and everything else kept.
+    Every statistic is per part, so this equals compute(df, registry) when only those parts changed.
+    Returns: SPCResult
+    """
+    part_nos = {str(p) for p in part_nos}
+    if not part_nos:
+        return result
+    fresh = compute(df[df['part_no'].astype(str).isin(part_nos)], registry, window, subgroup_size)
+
+    def splice(old, new):
+        kept = old[~old['part_no'].isin(part_nos)]
+        # Parts are contiguous blocks: a stable sort on part_no keeps each part's time order
+        return pd.concat([kept, new]).sort_values('part_no', kind='stable').reset_index(drop=True)
+
+    summary = pd.concat([result.summary[~result.summary.index.isin(part_nos)], fresh.summary]).sort_index()
+    return SPCResult(
+        points=splice(result.points, fresh.points),
+        summary=summary,
+        subgroups=splice(result.subgroups, fresh.subgroups)
+    )
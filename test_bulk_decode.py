@@ -0,0 +1,43 @@
+import base64
+import gzip
+import json
+
+import pandas as pd
+
+import drive_integration
+
+# Bulk read decoding (drive_integration.decode_bulk): records, columnar and gzip payloads give the same frame.
+# Run with: python -m pytest test_bulk_decode.py  (or python test_bulk_decode.py)
+
+RECORDS = [
+    {'row': 2, 'timestamp': "2025/1/4 9:00:00", 'part_no': "A_R", 'weight': "93.50", 'status': "未審核"},
+    {'row': 3, 'timestamp': "2025/1/4 9:00:00", 'part_no': "A_L", 'weight': "94.10", 'status': "結案"}
+]
+
+def _columnar(records):
+    columns = list(records[0])
+    return {'columns': columns, 'values': [[r[c] for r in records] for c in columns]}
+
+def _gzip(data):
+    return base64.b64encode(gzip.compress(json.dumps(data).encode("utf-8"))).decode("ascii")
+
+def test_all_encodings_decode_to_the_same_frame():
+    expected = pd.DataFrame(RECORDS)
+    responses = [
+        {'status': "Success", 'data': RECORDS}, # Older deployments
+        {'status': "Success", 'format': "columnar", 'data': _columnar(RECORDS)},
+        {'status': "Success", 'encoding': "gzip", 'data': _gzip(RECORDS)},
+        {'status': "Success", 'format': "columnar", 'encoding': "gzip", 'data': _gzip(_columnar(RECORDS))}
+    ]
+    for resp in responses:
+        pd.testing.assert_frame_equal(drive_integration.decode_bulk(resp), expected)
+
+def test_empty_columnar_payload():
+    frame = drive_integration.decode_bulk({'status': "Success", 'format': "columnar", 'data': {'columns': [], 'values': []}})
+    assert frame.empty
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,40 @@
+import io
+
+from PIL import Image
+
+import drive_integration
+
+# Image encoder (drive_integration.compress_image): downscale to the long-edge limit, stay under the byte budget.
+# Run with: python -m pytest test_compress.py  (or python test_compress.py)
+
+def _jpeg(size, noise=False):
+    img = Image.effect_noise(size, 64).convert("RGB") if noise else Image.linear_gradient("L").resize(size).convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+def _size(data):
+    return Image.open(io.BytesIO(data)).size
+
+def test_large_jpeg_is_downscaled_to_the_limit():
+    # 3417 px: the 1/2 DCT draft (1709 px) would undershoot, so the full decode is resized
+    for size in [(3417, 2561), (2561, 3417), (4096, 3072)]:
+        out = drive_integration.compress_image(_jpeg(size))
+        assert max(_size(out)) == drive_integration.MAX_LONG_EDGE, (size, _size(out))
+
+def test_custom_long_edge():
+    out = drive_integration.compress_image(_jpeg((3032, 2274)), max_long_edge=1000)
+    assert _size(out) == (1000, 750)
+
+def test_small_image_keeps_its_size():
+    assert _size(drive_integration.compress_image(_jpeg((1923, 1444)))) == (1923, 1444)
+
+def test_output_fits_the_budget():
+    out = drive_integration.compress_image(_jpeg((2048, 1536), noise=True), max_size_mb=0.5)
+    assert len(out) <= 0.5 * 1024 * 1024
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
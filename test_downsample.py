@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+import downsample
+
+# Chart downsampling (downsample.py): point budget, out-of-spec points kept, shape preserved.
+# Run with: python -m pytest test_downsample.py  (or python test_downsample.py)
+
+def _series(n=10_000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'timestamp': pd.date_range("2024-01-01", periods=n, freq="min", tz="Asia/Taipei"),
+        'weight': 100 + rng.normal(0, 0.5, n),
+        'result': "PASS"
+    })
+
+def test_small_series_untouched():
+    df = _series(100)
+    assert downsample.downsample(df, 'timestamp', 'weight', budget=500) is df
+
+def test_budget_and_endpoints():
+    df = _series()
+    out = downsample.downsample(df, 'timestamp', 'weight', budget=300)
+    assert len(out) == 300
+    assert out.index[0] == df.index[0] and out.index[-1] == df.index[-1]
+
+def test_out_of_spec_and_flagged_points_always_kept():
+    df = _series()
+    df.loc[[17, 4242, 9001], 'weight'] = [90.0, 110.0, 89.0]
+    df.loc[[123, 5555], 'result'] = "NG"
+    out = downsample.downsample(df, 'timestamp', 'weight', budget=50, low=95, high=105, keep=df['result'] == "NG")
+    for idx in (17, 4242, 9001, 123, 5555):
+        assert idx in out.index
+    assert len(out) <= 50 + 5
+
+def test_original_row_order_is_kept():
+    df = _series().sort_values('timestamp', ascending=False)
+    out = downsample.downsample(df, 'timestamp', 'weight', budget=200)
+    assert out['timestamp'].is_monotonic_decreasing
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(5000)
+    y[2500] = 10.0
+    idx = downsample.lttb_indices(np.arange(5000), y, 100)
+    assert 2500 in idx and len(idx) == 100
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
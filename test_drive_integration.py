@@ -0,0 +1,130 @@
+import os
+import tempfile
+
+import requests
+
+import drive_integration
+import sheet_mirror
+
+# GAS client (drive_integration.py) without a reachable GAS: reads must fall back to the local mirror.
+# Run with: python -m pytest test_drive_integration.py  (or python test_drive_integration.py)
+
+def _offline(payload):
+    raise requests.exceptions.ConnectionError("GAS unreachable")
+
+def test_query_rows_on_offline_cold_start():
+    saved = (drive_integration._post, sheet_mirror.MIRROR_PATH, drive_integration._last_cold_sync_failure)
+    drive_integration._post = _offline
+    sheet_mirror.MIRROR_PATH = os.path.join(tempfile.mkdtemp(), "mirror.db")
+    drive_integration._last_cold_sync_failure = 0
+    drive_integration._fetch_all_data_remote.clear()
+    try:
+        # Empty mirror + failed server-side query: an empty result, not a crash
+        assert drive_integration.query_rows(with_row=True) == []
+        assert drive_integration.query_rows(has_change_point=True, statuses=["未審核"]) == []
+    finally:
+        drive_integration._post, sheet_mirror.MIRROR_PATH, drive_integration._last_cold_sync_failure = saved
+        drive_integration._fetch_all_data_remote.clear()
+
+class _Response:
+    def __init__(self, body, status_code=200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+def test_update_status_reports_a_missing_row():
+    saved = (drive_integration._post, drive_integration.sync_rows)
+    synced = []
+    drive_integration._post = lambda payload: _Response({"status": "Error", "message": "Row not found"})
+    drive_integration.sync_rows = lambda full=False: synced.append(full)
+    try:
+        assert drive_integration.update_status_v2("2025-01-04 09:00:00", "結案", "") == (False, "Row not found")
+        assert synced == [] # No blocking sync for a failed update
+    finally:
+        drive_integration._post, drive_integration.sync_rows = saved
+
+def test_bulk_update_without_a_comment_keeps_the_old_one():
+    saved = (drive_integration._post, sheet_mirror.patch_fields)
+    sent, patched = [], []
+    def post(payload):
+        sent.append(payload)
+        return _Response({"results": [{"index": i, "status": "Success", "rows": [i + 2]} for i in range(len(payload["updates"]))]})
+    drive_integration._post = post
+    sheet_mirror.patch_fields = lambda rows, fields: patched.append((rows, fields))
+    try:
+        ok, _ = drive_integration.update_status_bulk([
+            {"timestamp": "2025-01-04 09:00:00", "status": "結案"},
+            {"timestamp": "2025-01-05 09:00:00", "status": "結案", "manager_comment": "OK"}
+        ])
+        assert ok
+        # No manager_comment key means GAS leaves the comment cell alone; the mirror likewise
+        assert "manager_comment" not in sent[0]["updates"][0]
+        assert sent[0]["updates"][1]["manager_comment"] == "OK"
+        assert patched == [([2], {"status": "結案"}), ([3], {"status": "結案", "manager_comment": "OK"})]
+    finally:
+        drive_integration._post, sheet_mirror.patch_fields = saved
+
+class _Creds:
+    valid = True
+    token = "token"
+
+class _DriveSession:
+    # Stand-in for the Drive REST endpoints: status codes per step
+    def __init__(self, init=200, share=200):
+        self.init, self.share = init, share
+        self.calls = []
+
+    def post(self, url, **kwargs):
+        self.calls.append(("post", url))
+        if url.endswith("/permissions"):
+            return _Response({}, self.share)
+        return _Response({}, self.init, headers={"Location": "https://upload.example/session"})
+
+    def put(self, url, **kwargs):
+        self.calls.append(("put", url))
+        return _Response({"id": "FILE1"}, 200)
+
+    def delete(self, url, **kwargs):
+        self.calls.append(("delete", url))
+        return _Response({}, 204)
+
+def _with_drive(session, func):
+    saved = (drive_integration._get_session, drive_integration._drive_creds)
+    drive_integration._get_session = lambda: session
+    drive_integration._drive_creds = _Creds()
+    try:
+        return func()
+    finally:
+        drive_integration._get_session, drive_integration._drive_creds = saved
+
+def _jpeg_file():
+    path = os.path.join(tempfile.mkdtemp(), "photo.jpg")
+    with open(path, "wb") as f:
+        f.write(b"\xff\xd8" + b"0" * 100)
+    return path
+
+def test_drive_refusal_turns_the_binary_path_off():
+    session = _DriveSession(init=403)
+    path = _jpeg_file()
+
+    def upload_twice():
+        first = drive_integration.upload_image_file(path, "photo.jpg", "folder")
+        second = drive_integration.upload_image_file(path, "photo.jpg", "folder")
+        return first, second
+    assert _with_drive(session, upload_twice) == (None, None)
+    assert len(session.calls) == 1 # The second photo goes straight to GAS
+
+def test_failed_share_deletes_the_uploaded_file():
+    session = _DriveSession(share=500)
+    assert _with_drive(session, lambda: drive_integration.upload_image_file(_jpeg_file(), "photo.jpg", "folder")) is None
+    assert session.calls[-1][0] == "delete" and session.calls[-1][1].endswith("/FILE1")
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
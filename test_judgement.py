@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+import judgement
+import part_specs
+import utils
+from testutils import make_cavity
+
+# Vectorized PASS/NG (judgement.py) must match the per-cavity check the submit loop used.
+# Run with: python -m pytest test_judgement.py  (or python test_judgement.py)
+
+def _legacy_result(sp, weight, length):
+    res = "PASS"
+    if sp.min is not None and sp.max is not None:
+        if not (sp.min <= weight <= sp.max): res = "NG"
+    if sp.len_min is not None and sp.len_max is not None and length != "":
+        if not (sp.len_min <= length <= sp.len_max): res = "NG"
+    return res
+
+def test_judge_cavity_matches_legacy_check():
+    cavities = [
+        make_cavity(min=87.0, max=99.0),
+        make_cavity(min=87.0, max=99.0, len_min=10.0, len_max=12.0),
+        make_cavity(min=87.0), # Half a limit pair is not checked
+        make_cavity()
+    ]
+    for sp in cavities:
+        for weight in (0.0, 86.9, 87.0, 93.0, 99.0, 99.1):
+            for length in ("", 9.0, 10.0, 12.0, 12.5):
+                assert judgement.judge_cavity(sp, weight, length) == _legacy_result(sp, weight, length), (sp, weight, length)
+
+def test_judge_treats_blank_and_text_as_not_measured():
+    result = judgement.judge(["", None, "abc", "100"], [np.nan] * 4, [87] * 4, [99] * 4, [None] * 4, [None] * 4)
+    assert list(result) == ["PASS", "PASS", "PASS", "NG"]
+
+def test_rejudge_uses_current_limits_and_keeps_cp():
+    df = utils.load_data()
+    registry = part_specs.SpecRegistry(df)
+    dual = next(s for s in registry.by_part.values() if s.is_dual)
+    single = next(s for s in registry.by_part.values() if not s.is_dual and s.cavities[0].max is not None)
+    second = dual.cavities[1]
+    rows = pd.DataFrame({
+        'part_no': [single.part_no, single.part_no, f"{dual.part_no}{second.suffix}", single.part_no, "UNKNOWN-PART"],
+        'weight': [single.cavities[0].max, single.cavities[0].max + 1, second.max + 1, 0, 1.0],
+        'length': ["", "", "", "", ""],
+        'result': ["NG", "PASS", "PASS", "CP", "NG"]
+    })
+    assert list(judgement.rejudge(rows, registry)) == ["PASS", "NG", "NG", "CP", "NG"]
+
+def test_ng_rates_per_month():
+    registry = part_specs.SpecRegistry(utils.load_data())
+    spec = next(s for s in registry.by_part.values() if not s.is_dual and s.cavities[0].max is not None)
+    cav = spec.cavities[0]
+    rows = pd.DataFrame({
+        'timestamp': pd.to_datetime(["2025-01-05", "2025-01-20", "2025-02-01", "2025-02-02"]).tz_localize('Asia/Taipei'),
+        'part_no': [spec.part_no] * 4,
+        'weight': [cav.max, cav.max + 1, cav.max, 0],
+        'length': [""] * 4,
+        'result': ["NG", "NG", "PASS", "CP"]
+    })
+    rates = judgement.ng_rates(rows, registry)
+    assert list(rates['inspections']) == [2, 1]
+    assert list(rates['ng_stored']) == [2, 0]
+    assert list(rates['ng_rejudged']) == [1, 0]
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
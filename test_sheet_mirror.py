@@ -0,0 +1,77 @@
+import os
+import tempfile
+
+import pandas as pd
+
+import sheet_mirror
+
+# Local mirror (sheet_mirror.py): write-through patches and per-row versions for cache patching.
+# Run with: python -m pytest test_sheet_mirror.py  (or python test_sheet_mirror.py)
+
+def _mirror():
+    path = os.path.join(tempfile.mkdtemp(), "mirror.db")
+    sheet_mirror.apply_delta([
+        {'row': 2, 'timestamp': "2025-01-01 09:00:00", 'part_no': "A", 'status': "未審核"},
+        {'row': 3, 'timestamp': "2025-01-01 10:00:00", 'part_no': "B", 'status': "未審核"}
+    ], last_row=3, rev=0, reset=True, path=path)
+    return path
+
+def test_changes_since_returns_only_patched_rows():
+    path = _mirror()
+    base = sheet_mirror.get_meta(path)['version']
+    sheet_mirror.patch_rows([{'row': 4, 'timestamp': "2025-01-02 09:00:00", 'part_no': "C", 'weight': 93.5}], path=path)
+    sheet_mirror.patch_fields([2], {'status': "結案", 'manager_comment': "ok"}, path=path)
+    records, version = sheet_mirror.changes_since(base, path=path)
+    assert [r['row'] for r in records] == [2, 4]
+    assert records[0]['status'] == "結案" and records[1]['weight'] == "93.5"
+    assert version == base + 2
+    assert sheet_mirror.changes_since(version, path=path) == ([], version)
+
+def test_patches_leave_the_sync_cursor_alone():
+    path = _mirror()
+    sheet_mirror.patch_rows([{'row': 4, 'timestamp': "2025-01-02 09:00:00", 'part_no': "C"}], path=path)
+    meta = sheet_mirror.get_meta(path)
+    assert meta['cursor'] == 3 and meta['rev'] == 0 # Next sync still downloads row 4
+
+def test_patch_fields_on_missing_rows_is_a_no_op():
+    path = _mirror()
+    version = sheet_mirror.get_meta(path)['version']
+    assert sheet_mirror.patch_fields([99], {'status': "結案"}, path=path) is None
+    assert sheet_mirror.get_meta(path)['version'] == version
+
+def test_reset_or_deleted_rows_force_a_rebuild():
+    path = _mirror()
+    version = sheet_mirror.get_meta(path)['version']
+    assert sheet_mirror.changes_since(None, path=path)[0] is None
+    sheet_mirror.apply_delta([], last_row=2, rev=1, path=path) # Row 3 deleted in the sheet
+    records, current = sheet_mirror.changes_since(version, path=path)
+    assert records is None and current == version + 1
+    assert sheet_mirror.changes_since(current, path=path) == ([], current)
+
+def test_sync_response_older_than_a_write_through_keeps_the_appended_rows():
+    # sync_rows sent cursor 3; batch_append then wrote rows 4-5 through before the response (last_row 3) landed
+    path = _mirror()
+    version = sheet_mirror.get_meta(path)['version']
+    sheet_mirror.patch_rows([
+        {'row': 4, 'timestamp': "2025-01-02 09:00:00", 'part_no': "C"},
+        {'row': 5, 'timestamp': "2025-01-02 09:05:00", 'part_no': "D"}
+    ], path=path)
+    sheet_mirror.apply_delta([], last_row=3, rev=0, path=path)
+    assert [r['row'] for r in sheet_mirror.query_rows(with_row=True, path=path)] == [2, 3, 4, 5]
+    assert sheet_mirror.get_meta(path)['cursor'] == 3 # Next sync still downloads rows 4-5
+    assert sheet_mirror.changes_since(version, path=path)[0] is not None # No forced rebuild
+
+def test_apply_delta_accepts_a_frame():
+    # Columnar bulk reads arrive as a DataFrame
+    path = os.path.join(tempfile.mkdtemp(), "mirror.db")
+    frame = pd.DataFrame({'row': [2, 3], 'timestamp': ["2025/1/4 9:00:00", "2025/1/4 9:05:00"], 'part_no': ["A", None]})
+    sheet_mirror.apply_delta(frame, last_row=3, rev=0, reset=True, path=path)
+    rows = sheet_mirror.query_rows(with_row=True, path=path)
+    assert [r['row'] for r in rows] == [2, 3]
+    assert rows[1]['part_no'] == "" and rows[0]['status'] == "" # Missing / absent columns stored as ""
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+import spc
+from testutils import make_cavity
+
+# SPC engine (spc.py): rule detection on known patterns, capability formulas, grouping.
+# Run with: python -m pytest test_spc.py  (or python test_spc.py)
+
+class _Registry:
+    # Minimal SpecRegistry stand-in: one cavity for every part number
+    def __init__(self, cavity):
+        self.cavity = cavity
+
+    def resolve(self, part_no):
+        return None, self.cavity
+
+def _frame(weights, part_no="P1", start="2025-01-01"):
+    return pd.DataFrame({
+        'part_no': part_no,
+        'timestamp': pd.date_range(start, periods=len(weights), freq="h", tz="Asia/Taipei"),
+        'weight': weights,
+        'result': "PASS"
+    })
+
+def _flags(weights, bit):
+    result = spc.compute(_frame(weights), _Registry(make_cavity(min=0.0, max=200.0)))
+    return list((result.points['rules'].to_numpy() & (1 << (bit - 1))) != 0)
+
+NOISE = [100.0, 101.0, 99.0, 100.5, 99.5, 100.2, 99.8, 101.2, 98.8, 100.0] * 3
+
+def test_rule_1_point_beyond_3_sigma():
+    flags = _flags(NOISE + [130.0], 1)
+    assert flags[-1] and not any(flags[:-1])
+
+def test_rule_3_trend_of_six():
+    flags = _flags(NOISE + [100.0, 100.1, 100.2, 100.3, 100.4, 100.5], 3)
+    assert flags[-1] and not flags[-2]
+
+def test_rule_2_nine_on_one_side():
+    flags = _flags(NOISE + [100.6, 100.8, 100.7, 100.9, 100.6, 100.8, 100.7, 100.9, 100.6], 2)
+    assert flags[-1]
+
+def test_rule_7_needs_spread():
+    # A constant series has no sigma: nothing is flagged
+    result = spc.compute(_frame([100.0] * 30), _Registry(make_cavity(min=90.0, max=110.0)))
+    assert (result.points['rules'] == 0).all()
+
+def test_capability_matches_formulas():
+    weights = np.array(NOISE)
+    result = spc.compute(_frame(weights), _Registry(make_cavity(min=95.0, max=106.0)))
+    row = result.summary.loc["P1"]
+    sigma_within = np.abs(np.diff(weights)).mean() / 1.128
+    sigma_overall = weights.std(ddof=1)
+    mean = weights.mean()
+    assert np.isclose(row['sigma_within'], sigma_within)
+    assert np.isclose(row['cp'], 11.0 / (6 * sigma_within))
+    assert np.isclose(row['cpk'], min(106.0 - mean, mean - 95.0) / (3 * sigma_within))
+    assert np.isclose(row['ppk'], min(106.0 - mean, mean - 95.0) / (3 * sigma_overall))
+
+def test_one_sided_spec_has_cpk_but_no_cp():
+    result = spc.compute(_frame(NOISE), _Registry(make_cavity(max=106.0)))
+    row = result.summary.loc["P1"]
+    assert np.isnan(row['cp']) and row['cpk'] > 0
+
+def test_groups_do_not_leak_into_each_other():
+    # P2's trend starts right after P1's rising tail: windows must not cross parts
+    df = pd.concat([_frame(NOISE[:25] + [100.0, 100.1, 100.2, 100.3], "P1"), _frame([100.4, 99.0, 101.0, 100.0], "P2")])
+    result = spc.compute(df, _Registry(make_cavity(min=90.0, max=110.0)))
+    points, summary, _ = result.part("P2")
+    assert len(points) == 4 and summary['n'] == 4
+    assert (points['rules'] == 0).all()
+    assert points['pos'].tolist() == [0, 1, 2, 3]
+
+def test_cp_rows_and_zero_weights_are_not_samples():
+    df = _frame(NOISE + [0.0, 100.0])
+    df.loc[len(df) - 1, 'result'] = "CP"
+    result = spc.compute(df, _Registry(make_cavity(min=90.0, max=110.0)))
+    assert result.summary.loc["P1", 'n'] == len(NOISE)
+
+def test_xbar_r_subgroups():
+    result = spc.compute(_frame(NOISE + [100.0, 100.0]), _Registry(make_cavity(min=90.0, max=110.0)))
+    sub = result.subgroups
+    assert len(sub) == len(NOISE) // spc.SUBGROUP_SIZE # Incomplete last subgroup dropped
+    first = np.array(NOISE[:spc.SUBGROUP_SIZE])
+    assert np.isclose(sub['xbar'].iloc[0], first.mean())
+    assert np.isclose(sub['range'].iloc[0], first.max() - first.min())
+
+def test_update_matches_full_compute():
+    registry = _Registry(make_cavity(min=95.0, max=105.0))
+    rng = np.random.default_rng(1)
+    df = pd.concat([_frame(list(100 + rng.normal(0, 1, 40)), p) for p in ("A", "B", "C")], ignore_index=True)
+    base = spc.compute(df, registry)
+    # Edit one of A's points, append to B, add a new part D; C is untouched
+    changed = df.copy()
+    changed.loc[3, 'weight'] = 130.0
+    changed = pd.concat([changed, _frame([101.0], "B", "2026-01-01"), _frame([99.0, 100.0, 101.0], "D")], ignore_index=True)
+    patched = spc.update(base, changed, registry, {"A", "B", "D"})
+    full = spc.compute(changed, registry)
+    pd.testing.assert_frame_equal(patched.points, full.points)
+    pd.testing.assert_frame_equal(patched.summary, full.summary)
+    pd.testing.assert_frame_equal(patched.subgroups, full.subgroups)
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+import utils
+
+# Vectorized spec parsing (utils.parse_numeric_series) must match clean_numeric_value exactly.
+# Run with: python -m pytest test_spec_parser.py  (or python test_spec_parser.py)
+
+EDGE_CASES = [
+    "93", " 93 ", "93.5", "93g", "約93.5g", "2430", "",  "   ", None, np.nan,
+    "93/95", "93/", "/95", "/", "//", "93/ ", " /95", "93 / 95", "93/95/", "93//95",
+    "abc", "abc/def", "93/abc", "1.5/2.25", "1969/1970", "99/99/99", 93.0, 0, "0/0"
+]
+
+def _expected_row(val):
+    legacy = utils.clean_numeric_value(val)
+    if legacy is None:
+        return [], 0
+    if isinstance(legacy, list):
+        return legacy, len(legacy)
+    return [legacy], 1
+
+def _assert_matches(values):
+    series = pd.Series(values, dtype=object)
+    parsed = utils.parse_numeric_series(series)
+    objects = utils.parse_spec_column(series)[1]
+    cols = [c for c in parsed.columns if c != "n"]
+    for i, val in enumerate(values):
+        expected, n = _expected_row(val)
+        assert parsed["n"].iloc[i] == n, f"{val!r}: n={parsed['n'].iloc[i]}, expected {n}"
+        got = [parsed[c].iloc[i] for c in cols]
+        for k in range(len(cols)):
+            want = expected[k] if k < len(expected) else None
+            if want is None:
+                assert np.isnan(got[k]), f"{val!r}[{k}]: got {got[k]}, expected NaN"
+            else:
+                assert got[k] == want, f"{val!r}[{k}]: got {got[k]}, expected {want}"
+        assert objects.iloc[i] == utils.clean_numeric_value(val), f"{val!r}: legacy shape mismatch"
+
+def test_edge_cases_match_clean_numeric_value():
+    _assert_matches(EDGE_CASES)
+
+def test_typed_columns_are_float64():
+    parsed = utils.parse_numeric_series(pd.Series(["93/95", "93", None]))
+    for c in parsed.columns:
+        if c != "n":
+            assert parsed[c].dtype == np.float64
+
+def test_trailing_and_leading_slash_are_scalars():
+    parsed = utils.parse_numeric_series(pd.Series(["93/", "/95"]))
+    assert list(parsed["n"]) == [1, 1]
+    assert list(parsed[0]) == [93.0, 95.0]
+    assert parsed[1].isna().all()
+
+def test_parts_master_matches():
+    df = pd.read_csv(utils.DATA_PATH)
+    df.columns = df.columns.str.strip()
+    for col in ['標準重量(g)', '重量上限(g)', '重量下限(g)', '標準長度', '長度上限', '長度下限']:
+        _assert_matches(list(df[col]))
+
+def test_parts_cache_survives_a_failed_signature_refresh():
+    tmp = tempfile.mkdtemp()
+    write = utils._write_parts_cache
+    try:
+        csv_path = os.path.join(tmp, "parts_data.csv")
+        cache_path = os.path.join(tmp, "parts_data" + utils.PARTS_CACHE_SUFFIX)
+        shutil.copy(utils.DATA_PATH, csv_path)
+        meta = dict(utils._csv_signature(csv_path), sha1=utils._file_sha1(csv_path), version=utils.PARTS_CACHE_VERSION)
+        utils._write_parts_cache(utils._parse_parts_csv(csv_path), meta, cache_path)
+        info = os.stat(csv_path)
+        os.utime(csv_path, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9)) # Touched, content unchanged
+
+        def refuse(*args):
+            raise OSError("read-only file system")
+        utils._write_parts_cache = refuse
+        table = utils._read_parts_cache(csv_path, cache_path)
+        assert table is not None and table.num_rows > 0
+    finally:
+        utils._write_parts_cache = write
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,86 @@
+import io
+import os
+import shutil
+import tempfile
+
+from PIL import Image
+
+import thumbnails
+
+# Disk thumbnail cache (thumbnails.py): hits skip the render, a rewritten photo gets a new thumbnail,
+# a missing or broken photo yields None.
+# Run with: python -m pytest test_thumbnails.py  (or python test_thumbnails.py)
+
+SIZE = (80, 60)
+
+def _photo(path, color, size=(400, 200)):
+    Image.new("RGB", size, color).save(path, format="JPEG", quality=95)
+
+def _center(data):
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    return img.size, img.getpixel((SIZE[0] // 2, SIZE[1] // 2))
+
+def _with_dirs(func):
+    tmp = tempfile.mkdtemp()
+    try:
+        img_dir, thumb_dir = os.path.join(tmp, "img"), os.path.join(tmp, "thumbs")
+        os.makedirs(img_dir)
+        func(img_dir, thumb_dir)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def test_cache_hit_skips_the_render():
+    def check(img_dir, thumb_dir):
+        src = os.path.join(img_dir, "a.jpg")
+        _photo(src, (255, 0, 0))
+        first = thumbnails.get_thumbnail(src, SIZE, thumb_dir)
+        assert Image.open(io.BytesIO(first)).format == thumbnails.THUMB_FORMAT
+        size, center = _center(first)
+        assert size == SIZE and center[0] > 200 and center[2] < 50 # Letterboxed, not stretched
+        assert len(os.listdir(thumb_dir)) == 1
+
+        render = thumbnails.render_thumbnail
+        def fail(*args):
+            raise AssertionError("cache hit must not render")
+        thumbnails.render_thumbnail = fail
+        try:
+            assert thumbnails.get_thumbnail(src, SIZE, thumb_dir) == first
+        finally:
+            thumbnails.render_thumbnail = render
+    _with_dirs(check)
+
+def test_rewritten_photo_is_rendered_again():
+    def check(img_dir, thumb_dir):
+        src = os.path.join(img_dir, "a.jpg")
+        _photo(src, (255, 0, 0))
+        old_path = thumbnails._cache_path(src, SIZE, thumb_dir)
+        thumbnails.get_thumbnail(src, SIZE, thumb_dir)
+
+        _photo(src, (0, 0, 255), size=(300, 300))
+        info = os.stat(src)
+        os.utime(src, ns=(info.st_atime_ns, info.st_mtime_ns + 10**9)) # Coarse mtime filesystems
+        assert thumbnails._cache_path(src, SIZE, thumb_dir) != old_path
+        _, center = _center(thumbnails.get_thumbnail(src, SIZE, thumb_dir))
+        assert center[2] > 200 and center[0] < 50
+
+        # The build step prunes the stale one
+        assert thumbnails.build_all(img_dir, [SIZE], thumb_dir) == (0, 1, 0)
+        assert os.listdir(thumb_dir) == [os.path.basename(thumbnails._cache_path(src, SIZE, thumb_dir))]
+    _with_dirs(check)
+
+def test_missing_or_broken_photo():
+    def check(img_dir, thumb_dir):
+        assert thumbnails.get_thumbnail(os.path.join(img_dir, "gone.jpg"), SIZE, thumb_dir) is None
+        broken = os.path.join(img_dir, "broken.jpg")
+        with open(broken, "wb") as f:
+            f.write(b"not an image")
+        assert thumbnails.get_thumbnail(broken, SIZE, thumb_dir) is None
+        assert not os.path.exists(thumb_dir) # Nothing cached for a failed render
+        assert thumbnails.build_all(img_dir, [SIZE], thumb_dir) == (0, 0, 1)
+    _with_dirs(check)
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
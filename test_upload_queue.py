@@ -0,0 +1,119 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import drive_integration
+import sheet_mirror
+import upload_queue
+
+# Offline write-ahead log (upload_queue.py) against a local stand-in for the GAS web app:
+# jobs survive an outage and a restart, and every row reaches the sheet exactly once.
+# Run with: python -m pytest test_upload_queue.py  (or python test_upload_queue.py)
+
+class _StandInGAS(BaseHTTPRequestHandler):
+    # Minimal 'batch_append' with dedupe on timestamp + part_no, like GAS_V6_Full.js
+    sheet = [] # Appended rows (sheet row 2 onward)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if payload.get("action") != "batch_append":
+            return self._reply({"status": "Error", "message": "Unknown action"})
+        existing = {(r["timestamp"], r["part_no"]): i + 2 for i, r in enumerate(self.sheet)}
+        results = []
+        for i, row in enumerate(payload["rows"]):
+            key = (row["timestamp"], row["part_no"])
+            if payload.get("dedupe") and key in existing:
+                results.append({"index": i, "status": "Duplicate", "row": existing[key]})
+                continue
+            self.sheet.append(row)
+            existing[key] = len(self.sheet) + 1
+            results.append({"index": i, "status": "Success", "row": len(self.sheet) + 1})
+        self._reply({"status": "Success", "image_url": "", "results": results})
+
+    def _reply(self, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _rows(part_no):
+    return [{"timestamp": "2025-01-04 09:00:00", "model": "M1", "part_no": f"{part_no}{suffix}",
+             "weight": 93.5, "result": "PASS", "status": "無異常"} for suffix in ("_R", "_L")]
+
+def test_outage_restart_and_replay():
+    port = _free_port()
+    saved = (drive_integration.GAS_URL, drive_integration.RETRY_BACKOFF_SEC,
+             upload_queue.OFFLINE_RETRY_SEC, sheet_mirror.MIRROR_PATH)
+    drive_integration.GAS_URL = f"http://127.0.0.1:{port}/exec"
+    drive_integration.RETRY_BACKOFF_SEC = 0
+    upload_queue.OFFLINE_RETRY_SEC = 0
+    sheet_mirror.MIRROR_PATH = os.path.join(tempfile.mkdtemp(), "mirror.db")
+    queue_dir = tempfile.mkdtemp()
+    _StandInGAS.sheet = []
+    server = None
+    try:
+        # 1. Server down: jobs stay pending and keep all their attempts
+        queue = upload_queue.UploadQueue(queue_dir)
+        ids = [queue.enqueue(_rows("A"), folder_id="test"), queue.enqueue(_rows("B"), folder_id="test")]
+        queue.drain_once()
+        assert queue.is_offline()
+        assert [j["status"] for j in queue.jobs()] == [upload_queue.STATUS_PENDING] * 2
+        assert all(j["attempts"] == 0 for j in queue.jobs())
+
+        # 2. Restart: state comes back from the journal
+        queue = upload_queue.UploadQueue(queue_dir)
+        assert queue.pending_count() == 2
+        assert queue.enqueue(_rows("A"), folder_id="test") == ids[0] # Same rows: same job
+
+        # 3. Server up: everything is appended exactly once
+        server = ThreadingHTTPServer(("127.0.0.1", port), _StandInGAS)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        assert queue.drain_once() == 2
+        assert queue.pending_count() == 0 and not queue.is_offline()
+        assert sorted(r["part_no"] for r in _StandInGAS.sheet) == ["A_L", "A_R", "B_L", "B_R"]
+
+        # 4. A replay (e.g. the response was lost) is reported as Duplicate, not appended again
+        ok, results = drive_integration.batch_append(_rows("A"), folder_id="test", notify=False, dedupe=True, image_urls=[])
+        assert ok and [r["status"] for r in results] == ["Duplicate", "Duplicate"]
+        assert upload_queue.UploadQueue(queue_dir).drain_once() == 0
+        assert len(_StandInGAS.sheet) == 4
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+        (drive_integration.GAS_URL, drive_integration.RETRY_BACKOFF_SEC,
+         upload_queue.OFFLINE_RETRY_SEC, sheet_mirror.MIRROR_PATH) = saved
+
+def test_journal_is_compacted_on_start():
+    queue_dir = tempfile.mkdtemp()
+    queue = upload_queue.UploadQueue(queue_dir)
+    old, recent, pending = (queue.enqueue(_rows(p), folder_id="test") for p in ("A", "B", "C"))
+    queue._log({"op": "sent", "id": old, "at": 0}) # Sent long ago
+    queue._log({"op": "sent", "id": recent, "at": time.time()})
+
+    queue = upload_queue.UploadQueue(queue_dir)
+    with open(queue.journal_path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    assert [e["job"]["id"] for e in entries] == [pending] # Only open work is replayed next time
+    assert {j["id"] for j in queue.jobs()} == {recent, pending} # Recent sends still shown
+    assert upload_queue.UploadQueue(queue_dir).pending_count() == 1
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✅ {name}")
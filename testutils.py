@@ -0,0 +1,12 @@
+import part_specs
+
+# Shared test helpers, imported by the test modules like any other module here
+# (kept out of conftest.py so the tests also run as plain scripts: python test_xxx.py).
+
+def make_cavity(**limits):
+    """
+    CavitySpec with every limit unset except the ones given (e.g. make_cavity(min=87.0, max=99.0)).
+    """
+    base = dict(suffix="", label="", header="", std=None, max=None, min=None, len_std=None, len_max=None, len_min=None)
+    base.update(limits)
+    return part_specs.CavitySpec(**base)
@@ -0,0 +1,134 @@
+import hashlib
+import io
+import os
+import sys
+import threading
+
+from PIL import Image, ImageOps, features
+
+# Precomputed thumbnails of quality_images/ on disk.
+# Each thumbnail is letterboxed to an exact size (black padding, aspect ratio kept) and stored
+# under a name derived from source path + mtime + file size, so replacing a photo invalidates
+# its thumbnails without any bookkeeping. Build them at deploy time with
+#   python thumbnails.py
+# and the app serves pre-sized bytes without opening the full-resolution originals.
+IMG_DIR = "quality_images"
+THUMB_DIR = ".thumb_cache"
+GRID_SIZE = (800, 600) # Landing page product grid (5 columns; same size the grid always rendered)
+DETAIL_SIZE = (800, 600) # Inspection page standard image
+THUMB_SIZES = tuple(dict.fromkeys((GRID_SIZE, DETAIL_SIZE))) # One file per distinct size
+THUMB_FORMAT = "WEBP" if features.check("webp") else "JPEG"
+THUMB_QUALITY = 80
+
+_EXT = {"WEBP": "webp", "JPEG": "jpg"}
+
+def _cache_path(image_path, size, thumb_dir=THUMB_DIR):
+    st = os.stat(image_path)
+    key = f"{os.path.abspath(image_path)}|{st.st_mtime_ns}|{st.st_size}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    return os.path.join(thumb_dir, f"{digest}_{size[0]}x{size[1]}.{_EXT[THUMB_FORMAT]}")
+
+def render_thumbnail(image_path, size):
+    """
+    Loads an image and pads it to fit `size` (Maintain Aspect Ratio).
+    Returns: encoded thumbnail bytes.
+    """
+    target_w, target_h = size
+    img = Image.open(image_path)
+    # JPEG: decode at reduced scale (still >= target), much cheaper than a full decode
+    img.draft("RGB", (target_w, target_h))
+
+    # Handle Orientation (EXIF)
+    try:
+        img = ImageOps.exif_transpose(img)
+    except Exception:
+        pass
+
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    img_w, img_h = img.size
+    scale = min(target_w / img_w, target_h / img_h)
+    new_w = max(1, int(img_w * scale))
+    new_h = max(1, int(img_h * scale))
+    img_resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    canvas = Image.new("RGB", size, (0, 0, 0)) # Black background
+    canvas.paste(img_resized, ((target_w - new_w) // 2, (target_h - new_h) // 2))
+
+    buf = io.BytesIO()
+    canvas.save(buf, format=THUMB_FORMAT, quality=THUMB_QUALITY)
+    return buf.getvalue()
+
+def get_thumbnail(image_path, size=DETAIL_SIZE, thumb_dir=THUMB_DIR):
+    """
+    Thumbnail bytes for image_path, from the disk cache (rendered and stored on a miss).
+    Returns None if the source is missing or cannot be decoded.
+    """
+    try:
+        path = _cache_path(image_path, size, thumb_dir)
+    except OSError:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    try:
+        data = render_thumbnail(image_path, size)
+    except Exception as e:
+        print(f"Error processing image {image_path}: {e}")
+        return None
+
+    os.makedirs(thumb_dir, exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path) # Atomic: concurrent readers never see a partial file
+    return data
+
+def build_all(img_dir=IMG_DIR, sizes=THUMB_SIZES, thumb_dir=THUMB_DIR, prune=True):
+    """
+    Renders every missing thumbnail for img_dir; prune=True deletes thumbnails of
+    replaced or removed photos.
+    Returns: (built, cached, failed) counts.
+    """
+    built = cached = failed = 0
+    keep = set()
+    for name in sorted(os.listdir(img_dir)) if os.path.isdir(img_dir) else []:
+        src = os.path.join(img_dir, name)
+        if not os.path.isfile(src) or os.path.getsize(src) == 0:
+            continue
+        for size in sizes:
+            path = _cache_path(src, size, thumb_dir)
+            keep.add(os.path.basename(path))
+            if os.path.exists(path):
+                cached += 1
+            elif get_thumbnail(src, size, thumb_dir) is not None:
+                built += 1
+            else:
+                failed += 1
+
+    if prune and os.path.isdir(thumb_dir):
+        for name in os.listdir(thumb_dir):
+            if name not in keep and not name.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(thumb_dir, name))
+                except OSError:
+                    pass
+    return built, cached, failed
+
+def start_background_build(img_dir=IMG_DIR):
+    """
+    Warms the cache in a daemon thread (e.g. right after a deploy). Call once per process
+    (app.py wraps it in st.cache_resource).
+    """
+    thread = threading.Thread(target=build_all, args=(img_dir,), kwargs={"prune": False}, daemon=True, name="thumb-build")
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    src_dir = sys.argv[1] if len(sys.argv) > 1 else IMG_DIR
+    built, cached, failed = build_all(src_dir)
+    print(f"Thumbnails: {built} built, {cached} up to date, {failed} failed ({THUMB_FORMAT}, sizes {list(THUMB_SIZES)})")
@@ -0,0 +1,365 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import drive_integration
+
+# Durable background submit queue (doubles as the offline write-ahead log).
+# Submissions are persisted to an append-only journal (+ one image file per job) before the UI
+# returns, and a worker thread drains them to GAS with retries. State is rebuilt by replaying
+# the journal on start, so pending submissions survive an app restart; the journal is then
+# compacted to the jobs that still matter (pending / failed).
+# While the network is down, jobs stay pending without using up their attempts; replays are
+# keyed by timestamp + part_no (locally and on the GAS side), so a row is never appended twice.
+QUEUE_DIR = ".upload_queue"
+JOURNAL_NAME = "journal.jsonl"
+MAX_ATTEMPTS = 5
+RETRY_BACKOFF_SEC = 5 # 5s, 10s, 20s ...
+OFFLINE_RETRY_SEC = 15 # Connectivity probe interval while GAS is unreachable
+POLL_SEC = 2
+SENT_RETENTION_SEC = 24 * 3600 # Sent jobs stay visible (status list, duplicate check) this long
+# Photos of one submission are compressed in parallel (Pillow releases the GIL while
+# decoding HEIC/JPEG, resizing and encoding) and uploaded as each one finishes
+COMPRESS_WORKERS = min(4, os.cpu_count() or 1)
+
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+def job_key(rows):
+    """
+    Idempotency key of a submission: timestamp + part_no of every row.
+    """
+    return "|".join(sorted(f"{r.get('timestamp', '')}#{r.get('part_no', '')}" for r in rows))
+
+class UploadQueue:
+    def __init__(self, queue_dir=QUEUE_DIR):
+        self.queue_dir = queue_dir
+        self.journal_path = os.path.join(queue_dir, JOURNAL_NAME)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._jobs = {} # job_id -> job dict (insertion ordered)
+        self._offline = False
+        self._pool = ThreadPoolExecutor(max_workers=COMPRESS_WORKERS, thread_name_prefix="compress")
+        os.makedirs(queue_dir, exist_ok=True)
+        self._replay()
+        self._compact()
+
+    # --- Journal ---
+    def _replay(self):
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue # Torn last line after a crash
+            self._apply(entry)
+
+    def _apply(self, entry):
+        op = entry.get("op")
+        if op == "enqueue":
+            job = dict(entry["job"])
+            if "images" not in job: # Single-image journal entries
+                image = job.pop("image", None)
+                job["images"] = [{"file": image, "filename": job.get("filename", ""), "compressed": False, "url": ""}] if image else []
+            self._jobs[job["id"]] = job
+        elif entry.get("id") in self._jobs:
+            job = self._jobs[entry["id"]]
+            if op == "sent":
+                job["status"] = STATUS_SENT
+                job["sent_at"] = entry.get("at")
+                job["offline"] = False
+            elif op == "attempt":
+                job["attempts"] = entry["attempts"]
+                job["status"] = entry["status"]
+                job["last_error"] = entry.get("error", "")
+                job["next_try"] = entry.get("next_try", 0)
+                job["offline"] = entry.get("offline", False)
+            elif op == "compressed":
+                image = job["images"][entry.get("index", 0)]
+                image["file"] = entry.get("file", entry.get("image"))
+                image["compressed"] = True
+            elif op == "image_uploaded":
+                job["images"][entry.get("index", 0)]["url"] = entry["url"]
+            elif op == "retry":
+                job["status"] = STATUS_PENDING
+                job["attempts"] = 0
+                job["next_try"] = 0
+
+    def _compact(self):
+        """
+        Rewrites the journal with only pending and failed jobs (one 'enqueue' entry holding each
+        job's current state), so start-up replay stays proportional to the open work.
+        Atomic: a crash leaves either the old or the new journal.
+        """
+        with self._lock:
+            self._forget_sent(time.time())
+            open_jobs = [j for j in self._jobs.values() if j["status"] != STATUS_SENT]
+            tmp = self.journal_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for job in open_jobs:
+                    f.write(json.dumps({"op": "enqueue", "job": job}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.journal_path)
+
+    def _forget_sent(self, now):
+        # Caller holds the lock. Sent jobs past the retention window leave memory.
+        for job_id in [j["id"] for j in self._jobs.values()
+                       if j["status"] == STATUS_SENT and now - (j.get("sent_at") or 0) > SENT_RETENTION_SEC]:
+            del self._jobs[job_id]
+
+    def _log(self, entry):
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._apply(entry)
+
+    # --- Public API ---
+    def enqueue(self, rows, images=(), folder_id="root"):
+        """
+        Persists one submission (all cavity rows + its photos) and wakes the worker.
+        images: list of (image_bytes, filename), linked from every row.
+        Submitting the same rows again (same timestamp + part_no) returns the existing job.
+        Returns: job id.
+        """
+        key = job_key(rows)
+        with self._lock:
+            self._forget_sent(time.time())
+            for job in self._jobs.values():
+                if job.get("key") == key and job["status"] != STATUS_FAILED:
+                    return job["id"]
+
+        job_id = uuid.uuid4().hex
+        spooled = []
+        for n, (image_bytes, filename) in enumerate(images):
+            if not image_bytes:
+                continue
+            image_name = f"{job_id}_{n}.img"
+            with open(os.path.join(self.queue_dir, image_name), "wb") as f:
+                f.write(image_bytes)
+                f.flush()
+                os.fsync(f.fileno())
+            spooled.append({"file": image_name, "filename": filename, "compressed": False, "url": ""})
+
+        job = {
+            "id": job_id,
+            "created": time.time(),
+            "label": f"{rows[0].get('part_no', '')} {rows[0].get('timestamp', '')}" if rows else "",
+            "key": key,
+            "rows": rows,
+            "images": spooled,
+            "folder_id": folder_id,
+            "status": STATUS_PENDING,
+            "attempts": 0,
+            "last_error": "",
+            "next_try": 0
+        }
+        with self._lock:
+            self._log({"op": "enqueue", "job": job})
+        self._wakeup.set()
+        return job_id
+
+    def retry(self, job_id):
+        """
+        Puts a failed job back in the queue.
+        """
+        with self._lock:
+            if job_id in self._jobs:
+                self._log({"op": "retry", "id": job_id})
+        self._wakeup.set()
+
+    def jobs(self, job_ids=None):
+        """
+        Snapshot of jobs (newest first), optionally limited to job_ids.
+        """
+        with self._lock:
+            jobs = [_copy_job(j) for j in self._jobs.values() if job_ids is None or j["id"] in job_ids]
+        return sorted(jobs, key=lambda j: j["created"], reverse=True)
+
+    def pending_count(self):
+        with self._lock:
+            return sum(1 for j in self._jobs.values() if j["status"] == STATUS_PENDING)
+
+    def is_offline(self):
+        """
+        True if the last send attempt could not reach GAS.
+        """
+        return self._offline
+
+    # --- Worker side ---
+    def _due_jobs(self):
+        now = time.time()
+        with self._lock:
+            return [_copy_job(j) for j in self._jobs.values()
+                    if j["status"] == STATUS_PENDING and j.get("next_try", 0) <= now]
+
+    def _compress_image(self, job, index):
+        """
+        Replaces a spooled original with its compressed JPEG (once), so replays after a
+        network drop resend the small file instead of re-compressing the original.
+        Runs on the compression pool. Returns the compressed file name.
+        """
+        src_name = job["images"][index]["file"]
+        src = os.path.join(self.queue_dir, src_name)
+        with open(src, "rb") as f:
+            compressed = drive_integration.compress_image(f.read())
+        image_name = f"{job['id']}_{index}.jpg"
+        tmp = os.path.join(self.queue_dir, image_name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(compressed)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.queue_dir, image_name))
+        with self._lock:
+            self._log({"op": "compressed", "id": job["id"], "index": index, "file": image_name})
+        if image_name != src_name:
+            try:
+                os.remove(src)
+            except OSError:
+                pass
+        return image_name
+
+    def _upload_image(self, job, index, file_name):
+        """
+        Uploads one compressed photo on its own (binary to Drive, or base64 through GAS) and
+        records the link, so a retried append never re-uploads it.
+        """
+        image = job["images"][index]
+        ok, result = drive_integration.upload_image(
+            os.path.join(self.queue_dir, file_name), image.get("filename") or file_name, job.get("folder_id")
+        )
+        if not ok:
+            raise RuntimeError(f"Image upload failed: {result}")
+        with self._lock:
+            self._log({"op": "image_uploaded", "id": job["id"], "index": index, "url": result})
+        return result
+
+    def _prepare_images(self, job):
+        """
+        Compresses the job's photos in parallel and uploads each one as soon as it is ready.
+        Returns: the links of all photos, in submission order.
+        """
+        urls = [image.get("url", "") for image in job["images"]]
+        todo = [i for i, url in enumerate(urls) if not url]
+        ready = [i for i in todo if job["images"][i].get("compressed")]
+        futures = {
+            self._pool.submit(self._compress_image, job, i): i
+            for i in todo if not job["images"][i].get("compressed")
+        }
+        for i in ready:
+            urls[i] = self._upload_image(job, i, job["images"][i]["file"])
+        for future in as_completed(futures):
+            i = futures[future]
+            urls[i] = self._upload_image(job, i, future.result())
+        return urls
+
+    def _send(self, job):
+        image_urls = self._prepare_images(job)
+
+        ok, result = drive_integration.batch_append(
+            job["rows"], folder_id=job.get("folder_id"), notify=False,
+            dedupe=True, raise_offline=True, image_urls=image_urls
+        )
+        self._offline = False
+
+        if ok:
+            with self._lock:
+                self._log({"op": "sent", "id": job["id"], "at": time.time()})
+            with self._lock:
+                images = [dict(image) for image in self._jobs[job["id"]]["images"]]
+            for image in images:
+                try:
+                    os.remove(os.path.join(self.queue_dir, image["file"]))
+                except OSError:
+                    pass
+            return
+
+        # GAS answered with per-row results: the request went through, retrying would duplicate rows
+        if isinstance(result, list):
+            self._record_failure(job, "GAS rejected rows: " + json.dumps(result, ensure_ascii=False), final=True)
+        else:
+            self._record_failure(job, str(result))
+
+    def _record_offline(self, job, error):
+        """
+        GAS unreachable: keep the job pending without using up an attempt.
+        """
+        with self._lock:
+            self._log({
+                "op": "attempt",
+                "id": job["id"],
+                "attempts": job["attempts"],
+                "status": STATUS_PENDING,
+                "error": error,
+                "offline": True,
+                "next_try": time.time() + OFFLINE_RETRY_SEC
+            })
+
+    def _record_failure(self, job, error, final=False):
+        attempts = job["attempts"] + 1
+        status = STATUS_FAILED if final or attempts >= MAX_ATTEMPTS else STATUS_PENDING
+        with self._lock:
+            self._log({
+                "op": "attempt",
+                "id": job["id"],
+                "attempts": attempts,
+                "status": status,
+                "error": error,
+                "next_try": time.time() + RETRY_BACKOFF_SEC * (2 ** (attempts - 1))
+            })
+
+    def drain_once(self):
+        """
+        Sends due jobs in submission order. Stops at the first network failure (the rest
+        would fail too) and leaves them for the next connectivity probe.
+        Returns the number of jobs attempted.
+        """
+        attempted = 0
+        for job in self._due_jobs():
+            attempted += 1
+            try:
+                self._send(job)
+            except drive_integration.OfflineError as e:
+                self._offline = True
+                self._record_offline(job, str(e))
+                self._defer_due_jobs()
+                break
+            except Exception as e:
+                print(f"Upload worker error ({job['id']}): {e}")
+                self._record_failure(job, str(e))
+        return attempted
+
+    def _defer_due_jobs(self):
+        # In-memory only: the journal keeps each job's last real attempt
+        next_try = time.time() + OFFLINE_RETRY_SEC
+        with self._lock:
+            for job in self._jobs.values():
+                if job["status"] == STATUS_PENDING and job.get("next_try", 0) < next_try:
+                    job["next_try"] = next_try
+
+    def run_forever(self):
+        while True:
+            self.drain_once()
+            self._wakeup.wait(POLL_SEC)
+            self._wakeup.clear()
+
+def _copy_job(job):
+    return dict(job, images=[dict(image) for image in job.get("images", [])])
+
+def start_worker(queue):
+    """
+    Starts the daemon thread that drains the queue. Call once per process
+    (app.py wraps queue + worker in st.cache_resource).
+    """
+    thread = threading.Thread(target=queue.run_forever, daemon=True, name="upload-worker")
+    thread.start()
+    return thread
@@ -1,8 +1,22 @@
+import hashlib
+import os
 import pandas as pd
+import numpy as np
 import streamlit as st
 import re
 
+import part_specs
+
+try: # Optional: compiled Arrow cache of the parts master (without it, the CSV is parsed on load)
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+
 DATA_PATH = "parts_data.csv"
+PARTS_CACHE_SUFFIX = ".arrow" # Compiled cache next to the CSV (parts_data.arrow)
+PARTS_CACHE_VERSION = "1" # Bump when the parsed columns change
+NUMBER_PATTERN = r"(\d+(?:\.\d+)?)"
 
 def clean_numeric_value(val):
     """
@@ -70,18 +84,102 @@ def clean_numeric_value(val):
             return None
     return None
 
-@st.cache_data(ttl=60)
-def load_data():
+def _parse_uniques(series):
     """
-    Loads parts data from CSV and cleans numeric columns.
+    Parses each distinct string of `series` once (spec strings repeat a lot).
+    Returns: (codes, values, counts) where row codes[i] of values/counts belongs to series[i];
+    the last row (code -1) stands for missing values.
     """
-    try:
-        df = pd.read_csv(DATA_PATH)
-        # [Fix] Remove potential BOM or whitespace from column headers
-        df.columns = df.columns.str.strip()
-    except FileNotFoundError:
-        st.error(f"Cannot find {DATA_PATH}. Please ensure the file exists.")
-        return pd.DataFrame()
+    codes, uniques = pd.factorize(series.astype(object), use_na_sentinel=True)
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    segments = text.str.split("/", expand=True) # Rows without '/' only fill column 0
+    if len(text):
+        values = np.column_stack([
+            segments[i].str.extract(NUMBER_PATTERN, expand=False).astype("float64").to_numpy()
+            for i in segments.columns
+        ])
+        n_segments = segments.notna().sum(axis=1).to_numpy()
+    else:
+        values = np.empty((0, 1))
+        n_segments = np.empty(0, dtype=int)
+    n_valid = (~np.isnan(values)).sum(axis=1)
+    first_valid = pd.DataFrame(values).bfill(axis=1).to_numpy()[:, 0]
+
+    # One valid number: scalar (trailing/leading slash typo). None: 0. Several: per segment.
+    multi = n_valid > 1
+    parsed = np.where(multi[:, None], values, np.nan)
+    parsed[:, 0] = np.where(multi, values[:, 0], first_valid)
+    counts = np.where(multi, n_segments, np.minimum(n_valid, 1))
+
+    parsed = np.vstack([parsed, np.full((1, parsed.shape[1]), np.nan)])
+    counts = np.append(counts, 0)
+    return codes, parsed, counts
+
+def parse_numeric_series(series):
+    """
+    Vectorized clean_numeric_value for a whole column.
+    Returns a DataFrame (same index) of typed columns:
+      0, 1, ... : float64 value per cavity (NaN if missing)
+      'n'       : number of values (0 = none, 1 = scalar, >1 = one per '/' segment)
+    Same semantics as clean_numeric_value: '93/' and '/95' are scalars (only one number),
+    '93/95' is two cavities, and the first number in each segment is used.
+    """
+    codes, values, counts = _parse_uniques(series)
+    result = pd.DataFrame(values[codes], index=series.index)
+    result["n"] = counts[codes]
+    return result
+
+def spec_objects(values, counts):
+    """
+    Legacy clean_numeric_value shape (float / list with None / None per row) from typed values
+    (2-D float array, one column per cavity) and value counts, e.g. clean_重量_0.. / clean_重量_n.
+    Returns: object ndarray.
+    """
+    values = np.asarray(values, dtype="float64").reshape(len(counts), -1)
+    counts = np.asarray(counts)
+    # Build each distinct row once (NaN -> -1 sentinel; parsed numbers are never negative)
+    keys = np.column_stack([np.nan_to_num(values, nan=-1.0), counts])
+    uniq, inverse = np.unique(keys, axis=0, return_inverse=True)
+    objects = np.empty(len(uniq), dtype=object)
+    for i, row in enumerate(uniq):
+        n = int(row[-1])
+        if n == 1:
+            objects[i] = float(row[0])
+        elif n > 1:
+            objects[i] = [None if v < 0 else float(v) for v in row[:n]]
+    return objects[inverse.ravel()]
+
+def parse_spec_column(series):
+    """
+    parse_numeric_series plus the legacy clean_numeric_value shape, both from one parse.
+    Returns: (typed DataFrame, object Series)
+    """
+    typed = parse_numeric_series(series)
+    objects = spec_objects(typed.drop(columns="n").to_numpy(), typed["n"].to_numpy())
+    return typed, pd.Series(objects, index=series.index, dtype=object)
+
+# Columns that need cleaning
+NUMERIC_COLS = ['重量', '重量上限', '重量下限', '標準長度', '長度上限', '長度下限']
+
+def _csv_signature(path):
+    stat = os.stat(path)
+    return {"mtime_ns": str(stat.st_mtime_ns), "size": str(stat.st_size)}
+
+def _file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _parse_parts_csv(csv_path):
+    """
+    Reads the parts master CSV and adds the typed clean_* columns (no Python objects,
+    so the result can be stored as Arrow).
+    """
+    df = pd.read_csv(csv_path)
+    # [Fix] Remove potential BOM or whitespace from column headers
+    df.columns = df.columns.str.strip()
 
     # Rename columns to match internal logic (User changed CSV headers)
     rename_map = {
@@ -103,25 +201,204 @@ def load_data():
     if '穴號顯示' in df.columns:
         df['穴號顯示'] = df['穴號顯示'].astype(str).str.strip()
     
-    # Columns that need cleaning
-    numeric_cols = ['重量', '重量上限', '重量下限', '標準長度', '長度上限', '長度下限']
-    
     # We want to keep original display strings but also have clean numeric values for logic
-    # Let's create new internal columns for calculation
-    for col in numeric_cols:
+    # Let's create new internal columns for calculation:
+    #   clean_{col}_0, clean_{col}_1 ... : float64 per cavity, clean_{col}_n : value count
+    cavity_counts = []
+    for col in NUMERIC_COLS:
         if col in df.columns:
-            df[f'clean_{col}'] = df[col].apply(clean_numeric_value)
-            
-    # Fill NaN in clean columns with 0 or proper default if needed, 
-    # but for length, 0 or None means "Hidden", so None is good.
-    
+            parsed = parse_numeric_series(df[col])
+            for c in parsed.columns:
+                df[f'clean_{col}_{c}'] = parsed[c]
+            cavity_counts.append(parsed['n'])
+    if cavity_counts:
+        df['clean_穴數'] = np.maximum(pd.concat(cavity_counts, axis=1).max(axis=1).to_numpy(), 1)
     return df
 
+def _write_parts_cache(table_or_df, meta, cache_path):
+    table = table_or_df if pa is not None and isinstance(table_or_df, pa.Table) else pa.Table.from_pandas(table_or_df, preserve_index=False)
+    table = table.replace_schema_metadata({k.encode(): v.encode() for k, v in meta.items()})
+    tmp = f"{cache_path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp, "wb") as sink:
+        with pa_ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp, cache_path) # Workers still mapping the old file keep a valid inode
+
+def _read_parts_cache(csv_path, cache_path):
+    """
+    Memory-maps the compiled cache if it was built from the current CSV (same mtime + size,
+    or same content hash after e.g. a fresh checkout). Returns an Arrow Table or None.
+    """
+    if pa is None or not os.path.exists(cache_path):
+        return None
+    try:
+        table = pa_ipc.open_file(pa.memory_map(cache_path, "r")).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None
+    meta = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+    if meta.get("version") != PARTS_CACHE_VERSION:
+        return None
+    sig = _csv_signature(csv_path)
+    if meta.get("mtime_ns") == sig["mtime_ns"] and meta.get("size") == sig["size"]:
+        return table
+    if meta.get("sha1") == _file_sha1(csv_path):
+        # Touched but unchanged: refresh the stored signature only (a read-only dir just re-hashes next time)
+        try:
+            _write_parts_cache(table, dict(meta, **sig), cache_path)
+        except (OSError, pa.ArrowException) as e:
+            print(f"Parts cache signature not refreshed: {e}")
+        return table
+    return None
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _load_parts(csv_path, mtime_ns, size):
+    """
+    Parsed parts master for one version of the CSV (mtime_ns/size are the cache key).
+    Served from the Arrow IPC cache next to the CSV, which is rebuilt only when the CSV changes.
+    """
+    cache_path = os.path.splitext(csv_path)[0] + PARTS_CACHE_SUFFIX
+    table = _read_parts_cache(csv_path, cache_path)
+    if table is not None:
+        df = table.to_pandas(split_blocks=True) # Zero-copy where possible (pages shared via mmap)
+    else:
+        df = _parse_parts_csv(csv_path)
+        if pa is not None:
+            meta = dict(_csv_signature(csv_path), sha1=_file_sha1(csv_path), version=PARTS_CACHE_VERSION)
+            try:
+                _write_parts_cache(df, meta, cache_path)
+            except (OSError, pa.ArrowException) as e:
+                print(f"Parts cache not written: {e}")
+
+    # Legacy clean_{col}: scalar / list per row (see clean_numeric_value)
+    for col in NUMERIC_COLS:
+        if f'clean_{col}_n' in df.columns:
+            value_cols = sorted((c for c in df.columns if re.fullmatch(rf"clean_{re.escape(col)}_\d+", c)),
+                                key=lambda c: int(c.rsplit('_', 1)[1]))
+            df[f'clean_{col}'] = spec_objects(df[value_cols].to_numpy(), df[f'clean_{col}_n'].to_numpy())
+    return df
+
+def load_data():
+    """
+    Loads parts data from CSV and cleans numeric columns.
+    Re-parsed only when the CSV changes; the result is shared by all sessions (read-only).
+    """
+    try:
+        sig = _csv_signature(DATA_PATH)
+    except FileNotFoundError:
+        st.error(f"Cannot find {DATA_PATH}. Please ensure the file exists.")
+        return pd.DataFrame()
+    return _load_parts(DATA_PATH, sig["mtime_ns"], sig["size"])
+
+def parts_version():
+    """
+    Version key of the parts master (changes when parts_data.csv is replaced or edited).
+    """
+    try:
+        sig = _csv_signature(DATA_PATH)
+    except FileNotFoundError:
+        return ""
+    return f"{sig['mtime_ns']}:{sig['size']}"
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _load_part_specs(csv_path, mtime_ns, size):
+    return part_specs.SpecRegistry(_load_parts(csv_path, mtime_ns, size))
+
+def load_part_specs():
+    """
+    Compiled PartSpec registry for the current parts master (built once per CSV version).
+    """
+    try:
+        sig = _csv_signature(DATA_PATH)
+    except FileNotFoundError:
+        return part_specs.SpecRegistry(pd.DataFrame())
+    return _load_part_specs(DATA_PATH, sig["mtime_ns"], sig["size"])
+
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+class PartIndex:
+    """
+    Row positions of the parts master grouped by 車型, 品番 and (車型, 品番), built once per load.
+    Lookups take only the matching rows (df.iloc) instead of copying and scanning the whole frame.
+    """
+    __slots__ = ("df", "by_model", "by_part", "by_model_part", "names")
+
+    def __init__(self, df):
+        self.df = df
+        self.by_model = {}
+        self.by_part = {}
+        self.by_model_part = {}
+        self.names = {}
+        if df.empty or '品番' not in df.columns:
+            return
+        self.by_part = df.groupby('品番', sort=False).indices
+        if '車型' in df.columns:
+            self.by_model = df.groupby('車型', sort=False).indices
+            self.by_model_part = df.groupby(['車型', '品番'], sort=False).indices
+        if '品名' in df.columns:
+            names = df['品名'].to_numpy()
+            for part_no, positions in self.by_part.items():
+                name = names[positions[0]]
+                self.names[part_no] = '' if pd.isna(name) else name
+
+    def positions(self, car_model=None, part_number=None):
+        if car_model and part_number:
+            return self.by_model_part.get((car_model, part_number), _NO_ROWS)
+        if car_model:
+            return self.by_model.get(car_model, _NO_ROWS)
+        if part_number:
+            return self.by_part.get(part_number, _NO_ROWS)
+        return None
+
+    def rows(self, car_model=None, part_number=None):
+        positions = self.positions(car_model, part_number)
+        if positions is None:
+            return self.df
+        return self.df.iloc[positions]
+
+    def first(self, part_number, car_model=None):
+        """
+        First master row (Series) of a part, or None.
+        """
+        positions = self.positions(car_model, part_number)
+        if not len(positions):
+            return None
+        return self.df.iloc[positions[0]]
+
+    def part_name(self, part_number):
+        return self.names.get(part_number, '')
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _load_part_index(csv_path, mtime_ns, size):
+    return PartIndex(_load_parts(csv_path, mtime_ns, size))
+
+def load_part_index():
+    """
+    PartIndex over the current parts master (same frame as load_data()).
+    """
+    try:
+        sig = _csv_signature(DATA_PATH)
+    except FileNotFoundError:
+        return PartIndex(pd.DataFrame())
+    return _load_part_index(DATA_PATH, sig["mtime_ns"], sig["size"])
+
+def clear_data_cache():
+    """
+    Drops the in-memory parts master, spec registry and part index
+    (the Arrow cache is still reused if the CSV is unchanged).
+    """
+    _load_parts.clear()
+    _load_part_specs.clear()
+    _load_part_index.clear()
+
 def get_filtered_data(df, car_model=None, part_number=None):
     """
     Filters dataframe based on selection.
+    The loaded parts master goes through the PartIndex (no full copy / scan).
     """
-    filtered = df.copy()
+    index = load_part_index()
+    if index.df is df:
+        return index.rows(car_model, part_number)
+    filtered = df
     if car_model:
         filtered = filtered[filtered['車型'] == car_model]
     if part_number: